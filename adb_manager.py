@@ -5,16 +5,68 @@ ADB管理模块 - 封装ADB操作
 
 import subprocess
 import os
-from config import ADB_PATH, DEVICE_ADDRESS
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from adb_protocol import AdbClient, AdbProtocolError
+from config import (ADB_PATH, ADB_BACKEND, DEVICE_ADDRESS, DEVICE_TEMP_DIR, USE_SHELL_SESSION, SHELL_SESSION_TIMEOUT,
+                    PULL_OUTPUT_TAIL_LINES)
+from progress import TransferProgress, LocalTreeSampler
+from shell_session import ShellSession, ShellSessionError
+from tar_stream import extract_tar_stream
+from tracing import tracer
+
+# 需要su提权才能访问的路径
+PROTECTED_PATHS = ['/data/app/', '/data/data/', '/data/user/']
+
+# 设备端批量哈希时单条命令中文件名的总字符数上限
+HASH_BATCH_CHARS = 32 * 1024
+
+
+def quote_path(path):
+    """
+    用双引号转义设备端路径（外层可能还有 su -c '...' 的单引号）
+    :param path: 路径
+    :return: str 转义后的路径
+    """
+    for ch in ('\\', '"', '$', '`'):
+        path = path.replace(ch, '\\' + ch)
+    return f'"{path}"'
 
 
 class ADBManager:
     """ADB管理器类"""
 
-    def __init__(self):
+    def __init__(self, device_address=None, backend=ADB_BACKEND, progress=None):
+        """
+        初始化ADB管理器
+        :param device_address: 设备序列号或地址，默认使用配置中的 DEVICE_ADDRESS
+        :param backend: "exe" 启动adb进程，"socket" 直接连接adb server
+        :param progress: 传输进度回调，参数为进度事件dict（格式见 progress.py），None表示不报告进度
+        """
         self.adb_path = ADB_PATH
-        self.device_address = DEVICE_ADDRESS
+        self.device_address = device_address or DEVICE_ADDRESS
+        self.backend = backend
+        self.progress = progress
         self._connected = False
+        self._session = None
+        # 并发类别共用一个会话：创建、执行和关闭都需持有此锁（可重入，出错时在锁内关闭会话）
+        self._session_lock = threading.RLock()
+        self._use_session = USE_SHELL_SESSION
+        self._client = None
+        if backend == "socket":
+            self._client = AdbClient(self.device_address)
+            # 每条命令只是一次TCP请求，无需常驻会话
+            self._use_session = False
+        # 由 list_packages 批量解析得到的 {包名: 安装目录}
+        self._app_paths = {}
+        # measure_throughput 测得的链路吞吐量（字节/秒）
+        self._throughput = None
+        self._throughput_lock = threading.Lock()
 
     def connect(self):
         """
@@ -22,6 +74,13 @@ class ADBManager:
         :return: (bool, str) 成功标志和消息
         """
         try:
+            # USB设备或 emulator-xxxx 序列号无需 adb connect，在线即可使用
+            if ":" not in self.device_address:
+                if self.device_address in self.list_devices():
+                    self._connected = True
+                    return True, f"设备在线: {self.device_address}"
+                return False, f"设备不在线: {self.device_address}"
+
             # 执行连接命令
             result = self._run_adb_command(["connect", self.device_address])
 
@@ -40,6 +99,9 @@ class ADBManager:
         :return: (bool, str) 成功标志和消息
         """
         try:
+            self._close_session()
+            if self._client is not None:
+                self._client.close()
             result = self._run_adb_command(["disconnect", self.device_address])
             self._connected = False
             return True, f"已断开连接: {result}"
@@ -58,6 +120,23 @@ class ADBManager:
         except:
             return False
 
+    def list_devices(self):
+        """
+        列出adb server中处于在线状态的设备
+        :return: list 设备序列号列表
+        """
+        try:
+            result = self._run_adb_command(["devices"])
+        except Exception:
+            return []
+
+        serials = []
+        for line in result.splitlines()[1:]:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1] == "device":
+                serials.append(parts[0])
+        return serials
+
     def run_command(self, cmd):
         """
         在设备上执行shell命令
@@ -66,17 +145,10 @@ class ADBManager:
         """
         try:
             if isinstance(cmd, str):
-                # 对于访问受保护路径的命令，使用su提权
-                if any(path in cmd for path in ['/data/app/', '/data/data/', '/data/user/']):
-                    # 整个su命令作为一个shell参数
-                    full_cmd = f"su -c '{cmd}'"
-                    shell_cmd = ["shell", full_cmd]
-                else:
-                    shell_cmd = ["shell", cmd]
+                # 字符串命令走常驻会话，受保护路径自动提权
+                result = self._shell(cmd)
             else:
-                shell_cmd = ["shell"] + cmd
-
-            result = self._run_adb_command(shell_cmd)
+                result = self._run_adb_command(["shell"] + cmd)
             return True, result
         except Exception as e:
             return False, f"命令执行失败: {str(e)}"
@@ -84,6 +156,7 @@ class ADBManager:
     def pull(self, remote_path, local_path):
         """
         从设备拉取文件或目录
+        adb输出边运行边读取，只保留最后几行；是否成功以adb的返回码判断
         :param remote_path: 设备上的路径
         :param local_path: 本地保存路径
         :return: (bool, str) 成功标志和消息
@@ -93,35 +166,34 @@ class ADBManager:
             os.makedirs(os.path.dirname(local_path), exist_ok=True)
 
             # 检查是否是受保护路径（需要root权限）
-            is_protected = any(p in remote_path for p in ['/data/app/', '/data/data/', '/data/user/'])
-
-            if is_protected:
+            if self._is_protected(remote_path):
                 # 使用临时目录中转
-                import time
-                temp_name = f"adb_temp_{int(time.time())}"
+                # 并发类别和逐文件重试可能同时中转，临时名需唯一
+                temp_name = f"adb_temp_{int(time.time())}_{uuid.uuid4().hex[:8]}"
                 temp_path = f"/sdcard/{temp_name}"
 
                 # 1. 用su复制到临时目录
                 self.run_command(f"rm -rf {temp_path}")  # 清理可能存在的旧文件
-                self.run_command(f"cp -r {remote_path} {temp_path}")
+                with tracer.span("su staging copy", "phase", remote_path=remote_path):
+                    self.run_command(f"cp -r {quote_path(remote_path)} {temp_path}")
 
                 # 2. 拉取临时目录
-                result = self._run_adb_command(["pull", temp_path, local_path])
+                returncode, result = self._run_pull(temp_path, local_path, remote_path)
 
                 # 3. 清理临时文件
                 self.run_command(f"rm -rf {temp_path}")
 
                 # 检查结果
-                if "pulled" in result.lower() or "file pulled" in result.lower():
+                if returncode == 0:
                     return True, f"拉取成功: {remote_path} -> {local_path}"
                 else:
                     return False, f"拉取失败: {result}"
             else:
                 # 直接拉取
-                result = self._run_adb_command(["pull", remote_path, local_path])
+                returncode, result = self._run_pull(remote_path, local_path, remote_path)
 
                 # 检查是否成功
-                if "pulled" in result.lower() or "file pulled" in result.lower():
+                if returncode == 0:
                     return True, f"拉取成功: {remote_path} -> {local_path}"
                 elif "does not exist" in result.lower() or "no such file" in result.lower():
                     return False, f"路径不存在: {remote_path}"
@@ -130,6 +202,242 @@ class ADBManager:
         except Exception as e:
             return False, f"拉取异常: {str(e)}"
 
+    def pull_stream(self, remote_path, local_path, compress=False, on_file=None, remap=None, sink=None):
+        """
+        以tar流方式拉取目录，设备端不产生中转副本
+        通过 adb exec-out 执行 su -c tar，主机端边接收边解包
+        :param remote_path: 设备上的目录路径
+        :param local_path: 本地保存路径（目录内容直接解包到此处）
+        :param compress: 是否在设备端gzip压缩后传输
+        :param on_file: 每个文件落地后的回调，参数为本地文件路径
+        :param remap: 路径映射函数，见 tar_stream.extract_tar_stream
+        :param sink: 打包导出时的 ArchiveSink，见 tar_stream.extract_tar_stream
+        :return: (bool, str) 成功标志和消息
+        """
+        remote_dir = remote_path.rstrip('/') or '/'
+        progress = self.progress_tracker(remote_path)
+        if progress is not None:
+            self._estimate_size(progress, remote_path)
+        success, message, _ = self._pull_tar(remote_path, f'tar -cf - -C "{remote_dir}" .', local_path, compress,
+                                             on_file, remap, sink, progress)
+        return success, message
+
+    def pull_files(self, remote_path, rel_paths, local_path, compress=False, on_file=None, remap=None, sink=None):
+        """
+        以tar流方式只拉取目录下的指定文件
+        文件清单先推送到设备临时文件，再由 tar -T 读取
+        :param remote_path: 设备上的目录路径
+        :param rel_paths: 相对于remote_path的文件路径列表
+        :param local_path: 本地保存路径
+        :param compress: 是否在设备端gzip压缩后传输
+        :param on_file: 每个文件落地后的回调，参数为本地文件路径
+        :param remap: 路径映射函数，见 tar_stream.extract_tar_stream
+        :param sink: 打包导出时的 ArchiveSink，见 tar_stream.extract_tar_stream
+        :return: (bool, str, list) 是否全部成功、消息、未能落地的相对路径（可单独重试）
+        """
+        if not rel_paths:
+            return True, f"无需拉取: {remote_path}", []
+
+        try:
+            with self._push_list(rel_paths) as remote_list:
+                remote_dir = remote_path.rstrip('/') or '/'
+                return self._pull_listed(remote_path, f'tar -cf - -C "{remote_dir}" -T {remote_list}', rel_paths,
+                                         local_path, compress, on_file, remap, sink)
+        except Exception as e:
+            return False, f"流式拉取异常: {str(e)}", list(rel_paths)
+
+    def pull_files_staged(self, remote_path, rel_paths, local_path, compress=False, on_file=None, remap=None,
+                          sink=None):
+        """
+        经/sdcard中转只拉取受保护目录下的指定文件（su tar流无法直接输出时使用）
+        设备端先用su按文件列表把文件连同相对路径复制到/sdcard临时目录，再按同一列表流式拉取
+        :param remote_path: 设备上的目录路径
+        :param rel_paths: 相对于remote_path的文件路径列表
+        :param local_path: 本地保存路径
+        :param compress: 是否在设备端gzip压缩后传输
+        :param on_file: 每个文件落地后的回调，参数为本地文件路径
+        :param remap: 路径映射函数，见 tar_stream.extract_tar_stream
+        :param sink: 打包导出时的 ArchiveSink，见 tar_stream.extract_tar_stream
+        :return: (bool, str, list) 是否全部成功、消息、未能落地的相对路径
+        """
+        if not rel_paths:
+            return True, f"无需拉取: {remote_path}", []
+
+        # 并发类别可能同时中转，临时名需唯一
+        temp_path = f"/sdcard/adb_temp_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        try:
+            with self._push_list(rel_paths) as remote_list:
+                remote_dir = remote_path.rstrip('/') or '/'
+                # 复制失败的文件不会出现在中转目录中，拉取时按文件列表核对后记为失败
+                with tracer.span("su staging copy", "phase", remote_path=remote_path, files=len(rel_paths)):
+                    self._shell(f"mkdir -p {temp_path} && cd {quote_path(remote_dir)} && "
+                                f"tar -cf - -T {remote_list} | tar -xf - -C {temp_path}")
+                return self._pull_listed(temp_path, f'tar -cf - -C "{temp_path}" -T {remote_list}', rel_paths,
+                                         local_path, compress, on_file, remap, sink)
+        except Exception as e:
+            return False, f"中转拉取异常: {str(e)}", list(rel_paths)
+        finally:
+            self._shell(f"rm -rf {temp_path}")
+
+    @contextmanager
+    def _push_list(self, rel_paths):
+        """
+        把文件清单推送到设备临时文件，供 tar -T 读取，退出时删除
+        :param rel_paths: 相对路径列表
+        :return: str 设备上的清单路径
+        """
+        list_name = f"adb_list_{uuid.uuid4().hex}.txt"
+        remote_list = f"{DEVICE_TEMP_DIR}/{list_name}"
+        local_list = os.path.join(tempfile.gettempdir(), list_name)
+        try:
+            with open(local_list, 'w', encoding='utf-8', newline='\n') as f:
+                f.write("\n".join(rel_paths) + "\n")
+            self._run_adb_command(["push", local_list, remote_list])
+            yield remote_list
+        finally:
+            if os.path.exists(local_list):
+                os.remove(local_list)
+            self._shell(f"rm -f {remote_list}")
+
+    def _pull_listed(self, remote_path, tar_cmd, rel_paths, local_path, compress, on_file, remap, sink):
+        """
+        执行按文件列表打包的tar命令并核对到达的文件，参数见 pull_files
+        :return: (bool, str, list) 是否全部成功、消息、未能落地的相对路径
+        """
+        success, message, failed = self._pull_tar(remote_path, tar_cmd, local_path, compress, on_file, remap, sink,
+                                                  self.progress_tracker(remote_path, total_files=len(rel_paths)),
+                                                  expected=rel_paths)
+        if not success:
+            return False, message, list(rel_paths)
+        if failed:
+            return False, f"部分文件拉取失败 ({len(failed)}/{len(rel_paths)}): {message}", failed
+        return True, message, []
+
+    def hash_files(self, remote_path, rel_paths=None, algorithm="sha1"):
+        """
+        在设备端批量计算文件哈希（toybox md5sum/sha1sum）
+        :param remote_path: 设备上的目录路径
+        :param rel_paths: 相对路径列表，为None时对目录下所有文件执行一次 find -exec
+        :param algorithm: "md5" 或 "sha1"
+        :return: (bool, dict|str) 成功标志和 {相对路径: 十六进制哈希}
+        """
+        try:
+            remote_dir = remote_path.rstrip('/') or '/'
+            tool = f"{algorithm}sum"
+
+            if rel_paths is None:
+                commands = [f'cd {quote_path(remote_dir)} && find . -type f -exec {tool} {{}} + 2>/dev/null']
+            else:
+                # 按命令行长度分批，避免超出设备端参数长度限制
+                commands, batch, batch_len = [], [], 0
+                for rel_path in rel_paths:
+                    quoted = quote_path(rel_path)
+                    if batch and batch_len + len(quoted) > HASH_BATCH_CHARS:
+                        commands.append(f"cd {quote_path(remote_dir)} && {tool} -- {' '.join(batch)} 2>/dev/null")
+                        batch, batch_len = [], 0
+                    batch.append(quoted)
+                    batch_len += len(quoted) + 1
+                if batch:
+                    commands.append(f"cd {quote_path(remote_dir)} && {tool} -- {' '.join(batch)} 2>/dev/null")
+
+            digests = {}
+            for cmd in commands:
+                for line in self._shell(cmd).splitlines():
+                    parts = line.split(None, 1)
+                    if len(parts) != 2 or len(parts[0]) < 32:
+                        continue
+                    rel_path = parts[1]
+                    if rel_path.startswith("./"):
+                        rel_path = rel_path[2:]
+                    digests[rel_path] = parts[0].lower()
+            return True, digests
+        except Exception as e:
+            return False, f"计算哈希异常: {str(e)}"
+
+    def list_files(self, remote_path, find_expression="-type f"):
+        """
+        一次性列出目录下所有文件的大小和修改时间
+        设备端单次 find + stat，输出格式为 "大小 修改时间 路径"
+        :param remote_path: 设备上的目录路径
+        :param find_expression: 筛选文件的 find 表达式（见 filters.build_find_expression）
+        :return: (bool, dict|str) 成功标志和 {相对路径: (大小, 修改时间)}
+        """
+        try:
+            remote_dir = remote_path.rstrip('/') or '/'
+            result = self._shell(
+                f'find "{remote_dir}" {find_expression} -exec stat -c "%s %Y %n" {{}} + 2>/dev/null'
+            )
+
+            files = {}
+            prefix = remote_dir.rstrip('/') + '/'
+            for line in result.splitlines():
+                parts = line.split(' ', 2)
+                if len(parts) != 3 or not parts[0].isdigit() or not parts[1].isdigit():
+                    continue
+                if not parts[2].startswith(prefix):
+                    continue
+                rel_path = parts[2][len(prefix):].lstrip('/')
+                files[rel_path] = (int(parts[0]), int(parts[1]))
+            return True, files
+        except Exception as e:
+            return False, f"列出文件异常: {str(e)}"
+
+    def exec_out(self, cmd_str):
+        """
+        通过 adb exec-out 执行命令并返回原始二进制输出，受保护路径自动su提权
+        :param cmd_str: shell命令字符串
+        :return: (bool, bytes|str) 成功标志和输出
+        """
+        try:
+            if self._is_protected(cmd_str):
+                cmd_str = f"su -c '{cmd_str}'"
+            with tracer.span("adb exec-out", "adb", device=self.device_address, cmd=cmd_str[:200]) as info:
+                with self._exec_out_stream(cmd_str) as (stream, status):
+                    data = stream.read()
+                info["exit_code"] = status["returncode"]
+                info["bytes"] = len(data)
+            return True, data
+        except Exception as e:
+            return False, f"命令执行失败: {str(e)}"
+
+    def read_range(self, remote_path, offset, length):
+        """
+        按字节偏移读取设备文件的一段数据
+        :param remote_path: 设备文件路径
+        :param offset: 起始偏移
+        :param length: 字节数
+        :return: (bool, bytes|str) 成功标志和数据
+        """
+        return self.exec_out(
+            f"dd if={quote_path(remote_path)} iflag=skip_bytes,count_bytes skip={offset} count={length} "
+            f"bs=1048576 2>/dev/null"
+        )
+
+    def measure_throughput(self, probe_bytes=4 * 1024 * 1024):
+        """
+        测量adb链路吞吐量（字节/秒），结果缓存在实例上
+        分别读取少量和大量 /dev/zero，用两次耗时之差扣除进程启动开销
+        :param probe_bytes: 大探测块的字节数
+        :return: float 字节/秒，测量失败返回0
+        """
+        # 多个类别并发时只测量一次
+        with self._throughput_lock:
+            if self._throughput is not None:
+                return self._throughput
+
+            small_bytes = 64 * 1024
+            timings = []
+            for size in (small_bytes, probe_bytes):
+                start_time = time.time()
+                success, data = self.exec_out(f"head -c {size} /dev/zero")
+                if not success or len(data) != size:
+                    return 0.0
+                timings.append(time.time() - start_time)
+
+            elapsed = max(timings[1] - timings[0], 1e-3)
+            self._throughput = (probe_bytes - small_bytes) / elapsed
+            return self._throughput
+
     def find_app_path(self, package_name):
         """
         查找应用在 /data/app/ 中的实际路径
@@ -138,14 +446,14 @@ class ADBManager:
         :param package_name: 应用包名
         :return: (bool, str) 成功标志和实际路径
         """
+        # 优先使用批量查询的结果，避免每个包都扫描一次 /data/app
+        if package_name in self._app_paths:
+            return True, self._app_paths[package_name]
+
         try:
             # 构造find命令
             cmd_str = f'find /data/app/ -maxdepth 2 -type d -name "{package_name}*" 2>/dev/null'
-            # 整个su命令作为一个shell参数
-            full_cmd = f"su -c '{cmd_str}'"
-            shell_cmd = ["shell", full_cmd]
-
-            result = self._run_adb_command(shell_cmd)
+            result = self._shell(cmd_str)
 
             if result.strip():
                 # 取第一个匹配的路径
@@ -157,6 +465,47 @@ class ADBManager:
         except Exception as e:
             return False, f"查找路径异常: {str(e)}"
 
+    def list_packages(self):
+        """
+        通过一次 pm list packages -f 批量解析所有已安装包的安装目录
+        结果会缓存，后续 find_app_path 直接命中
+        输出格式: package:/data/app/~~xxx==/{包名}-xxx==/base.apk={包名}
+        :return: (bool, dict|str) 成功标志和 {包名: 安装目录}
+        """
+        try:
+            result = self._shell("pm list packages -f")
+
+            app_paths = {}
+            for line in result.splitlines():
+                line = line.strip()
+                if not line.startswith("package:") or "=" not in line:
+                    continue
+                # 安装路径本身可能含有 "=="，包名在最后一个 "=" 之后
+                apk_path, package_name = line[len("package:"):].rsplit("=", 1)
+                app_paths[package_name] = apk_path.rsplit("/", 1)[0]
+
+            if not app_paths:
+                return False, f"无法获取包列表: {result}"
+            self._app_paths = app_paths
+            return True, app_paths
+        except Exception as e:
+            return False, f"获取包列表异常: {str(e)}"
+
+    def get_version_code(self, package_name):
+        """
+        读取已安装包的版本号（dumpsys package 中的 versionCode）
+        :param package_name: 包名
+        :return: (bool, int|str) 成功标志和版本号
+        """
+        try:
+            result = self._shell(f"dumpsys package {package_name} | grep -m 1 versionCode")
+            match = re.search(r"versionCode=(\d+)", result)
+            if match:
+                return True, int(match.group(1))
+            return False, f"无法获取版本号: {package_name}"
+        except Exception as e:
+            return False, f"获取版本号异常: {str(e)}"
+
     def path_exists(self, remote_path):
         """
         检查设备上的路径是否存在
@@ -164,43 +513,293 @@ class ADBManager:
         :return: bool 是否存在
         """
         try:
-            # 根据路径类型选择命令
-            if any(p in remote_path for p in ['/data/app/', '/data/data/', '/data/user/']):
-                # 受保护路径，使用su
-                cmd_str = f'ls {remote_path} 2>/dev/null'
-                full_cmd = f"su -c '{cmd_str}'"
-                result = self._run_adb_command(["shell", full_cmd])
-            else:
-                # 普通路径
-                result = self._run_adb_command(["shell", f"ls {remote_path} 2>/dev/null"])
-
+            result = self._shell(f"ls {remote_path} 2>/dev/null")
             return result.strip() != ""
         except:
             return False
 
+    def _pull_tar(self, remote_path, tar_cmd, local_path, compress=False, on_file=None, remap=None, sink=None,
+                  progress=None, expected=None):
+        """
+        执行设备端tar命令并在主机端流式解包
+        :param remote_path: 设备上的目录路径（用于判断是否需要提权及生成消息）
+        :param tar_cmd: 输出tar流到stdout的设备端命令
+        :param local_path: 本地保存路径
+        :param compress: 是否在设备端经gzip压缩后传输
+        :param on_file: 每个文件落地后的回调
+        :param remap: 路径映射函数，见 tar_stream.extract_tar_stream
+        :param sink: 打包导出时的 ArchiveSink，见 tar_stream.extract_tar_stream
+        :param progress: 本次传输的 TransferProgress，None表示不报告进度
+        :param expected: 应当到达的文件相对路径，见 tar_stream.extract_tar_stream
+        :return: (bool, str, list) 成功标志、消息、写入失败或未到达的文件（相对路径）
+        """
+        stats = None
+        try:
+            os.makedirs(local_path, exist_ok=True)
+
+            if compress:
+                # 压缩级别1：设备CPU开销最小，文本类数据仍有数倍压缩比
+                tar_cmd = f"{tar_cmd} | gzip -1"
+
+            if self._is_protected(remote_path):
+                tar_cmd = f"su -c '{tar_cmd}'"
+
+            with tracer.span("adb exec-out tar", "adb", device=self.device_address,
+                             cmd=tar_cmd[:200], compress=compress) as info:
+                with self._exec_out_stream(tar_cmd) as (stream, status):
+                    stats = extract_tar_stream(stream, local_path, compress, on_file, remap, sink, progress,
+                                               expected)
+                info.update(bytes=stats["bytes"], files=stats["files"], exit_code=status["returncode"])
+
+            # 返回码为None（socket 模式）时无法判断tar是否出错，只能依据到达的文件：
+            # 什么都没有收到视为失败，按文件列表拉取时缺少的文件记入失败列表
+            returncode = status["returncode"]
+            if stats["files"] == 0 and stats["dirs"] == 0 and returncode != 0:
+                return False, f"流式拉取失败: {status['stderr'] or '未收到任何文件'}", []
+
+            message = f"拉取成功: {remote_path} -> {local_path} ({stats['files']} 个文件, {stats['bytes']} 字节)"
+            if stats["errors"] or stats["missing"] or returncode not in (0, None):
+                message += (f" [警告: {len(stats['errors'])} 个文件写入失败, {len(stats['missing'])} 个文件未传输, "
+                            f"tar返回码 {returncode}]")
+            return True, message, stats["failed"] + stats["missing"]
+        except Exception as e:
+            return False, f"流式拉取异常: {str(e)}", []
+        finally:
+            if progress is not None:
+                progress.finish(stats is not None and not stats["errors"])
+
+    def progress_tracker(self, label, total_files=None, total_bytes=None):
+        """
+        为一次传输创建进度计数，未设置进度回调时返回None
+        :param label: 传输名称
+        :param total_files: 总文件数
+        :param total_bytes: 总字节数
+        :return: TransferProgress或None
+        """
+        if self.progress is None:
+            return None
+        return TransferProgress(label, self.progress, total_files, total_bytes)
+
+    def _estimate_size(self, progress, remote_path):
+        """
+        后台用 du 查询设备目录的大小作为进度的总字节数，不推迟传输开始
+        :param progress: TransferProgress实例
+        :param remote_path: 设备上的路径
+        """
+        def query():
+            try:
+                output = self._shell(f"du -sk {quote_path(remote_path)} 2>/dev/null")
+            except Exception:
+                return
+            parts = output.split()
+            if parts and parts[0].isdigit():
+                progress.total_bytes = int(parts[0]) * 1024
+
+        threading.Thread(target=query, daemon=True).start()
+
+    def _shell(self, cmd_str):
+        """
+        执行设备shell命令的内部方法
+        优先复用常驻会话；会话不可用时每条命令单独启动adb进程，受保护路径用su提权
+        :param cmd_str: shell命令字符串
+        :return: str 命令输出
+        """
+        protected = self._is_protected(cmd_str)
+
+        if self._use_session and self._connected:
+            with self._session_lock:
+                try:
+                    if self._session is None:
+                        self._session = ShellSession(self._build_command, SHELL_SESSION_TIMEOUT)
+                    # 会话未能提权时，受保护路径的命令仍需单独su执行
+                    if self._session.start() or not protected:
+                        with tracer.span("session " + cmd_str.split(None, 1)[0], "session",
+                                         device=self.device_address, cmd=cmd_str[:200]) as info:
+                            exit_code, output = self._session.run(cmd_str)
+                            info["exit_code"] = exit_code
+                            info["bytes"] = len(output)
+                        return output.strip()
+                except ShellSessionError as e:
+                    if e.command_sent:
+                        # 命令已在会话中执行（超时或中途断开），不再用单次进程重复执行；会话下次使用时重建
+                        raise
+                    # 会话无法建立，本实例后续改用单次进程
+                    self._close_session()
+                    self._use_session = False
+
+        if protected:
+            # 整个su命令作为一个shell参数
+            return self._run_adb_command(["shell", f"su -c '{cmd_str}'"])
+        return self._run_adb_command(["shell", cmd_str])
+
+    @contextmanager
+    def _exec_out_stream(self, cmd_str):
+        """
+        以 exec-out 执行设备命令并返回其二进制输出流
+        退出时在 status 中填入返回码和错误输出
+        socket 模式的 exec 服务不回传退出状态，返回码为None（未知），调用方需自行核对输出（如按文件列表核对到达的文件）
+        :param cmd_str: 设备端命令
+        :return: (文件对象, dict) 输出流和 {"returncode": int|None, "stderr": str}
+        """
+        status = {"returncode": None, "stderr": ""}
+        if self._client is not None:
+            with self._client.open_stream(f"exec:{cmd_str}") as stream:
+                yield stream, status
+            return
+
+        # stderr写入临时文件，避免管道写满阻塞输出流
+        with tempfile.TemporaryFile() as err_file:
+            proc = subprocess.Popen(
+                self._build_command(["exec-out", cmd_str]),
+                stdout=subprocess.PIPE,
+                stderr=err_file
+            )
+            try:
+                yield proc.stdout, status
+            finally:
+                proc.stdout.close()
+                proc.wait()
+                status["returncode"] = proc.returncode
+                err_file.seek(0)
+                status["stderr"] = err_file.read().decode('utf-8', errors='ignore').strip()
+
+    def _close_session(self):
+        """关闭常驻shell会话"""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    @staticmethod
+    def _is_protected(path):
+        """
+        判断路径（或命令）是否涉及需要root权限的目录
+        :param path: 设备路径或命令字符串
+        :return: bool
+        """
+        return any(p in path for p in PROTECTED_PATHS)
+
     def _run_adb_command(self, args):
         """
         执行ADB命令的内部方法
         :param args: 命令参数列表
         :return: str 命令输出
         """
+        with tracer.span(f"adb {args[0]}" if args else "adb", "adb",
+                         device=self.device_address, cmd=" ".join(args)[:200]) as info:
+            if self._client is not None:
+                output, info["exit_code"] = self._run_socket_command(args)
+            else:
+                result = subprocess.run(
+                    self._build_command(args),
+                    capture_output=True,
+                    text=True,
+                    encoding='utf-8',
+                    errors='ignore'
+                )
+                info["exit_code"] = result.returncode
+                # 返回标准输出或标准错误
+                output = result.stdout if result.stdout else result.stderr
+
+            # adb pull/push 的输出末尾带有 "(12345 bytes in 0.1s)"
+            transferred = re.search(r"\((\d+) bytes", output or "")
+            info["bytes"] = int(transferred.group(1)) if transferred else len(output or "")
+
+        return output.strip()
+
+    def _run_pull(self, remote_path, local_path, label):
+        """
+        执行 adb pull，输出边运行边读取，只保留最后 PULL_OUTPUT_TAIL_LINES 行
+        adb的输出不是终端时不打印逐文件进度，启用进度回调时由后台采样本地目录得到进度
+        :param remote_path: 设备上的路径
+        :param local_path: 本地保存路径
+        :param label: 进度事件中的传输名称
+        :return: (int, str) 返回码和输出的最后几行
+        """
+        args = ["pull", remote_path, local_path]
+        progress = self.progress_tracker(label)
+        if progress is not None:
+            self._estimate_size(progress, remote_path)
+        tail = deque(maxlen=PULL_OUTPUT_TAIL_LINES)
+        try:
+            with tracer.span("adb pull", "adb", device=self.device_address, cmd=" ".join(args)[:200]) as info, \
+                    (LocalTreeSampler(progress, local_path) if progress is not None else nullcontext()):
+                if self._client is not None:
+                    output, returncode = self._run_socket_command(args)
+                    tail.extend(output.splitlines())
+                else:
+                    proc = subprocess.Popen(
+                        self._build_command(args),
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.STDOUT,
+                        text=True,
+                        encoding='utf-8',
+                        errors='ignore'
+                    )
+                    with proc:
+                        for line in proc.stdout:
+                            line = line.strip()
+                            if line:
+                                tail.append(line)
+                    returncode = proc.returncode
+
+                # 结尾汇总形如 "x: 12 files pulled, 0 skipped. 3.1 MB/s (12345 bytes in 0.1s)"
+                output = "\n".join(tail)
+                files = re.search(r"(\d+) files? pulled", output)
+                transferred = re.search(r"\((\d+) bytes", output)
+                info.update(exit_code=returncode, bytes=int(transferred.group(1)) if transferred else 0)
+        except BaseException:
+            if progress is not None:
+                progress.finish(False)
+            raise
+
+        if progress is not None:
+            progress.finish(returncode == 0, int(files.group(1)) if files else None,
+                            int(transferred.group(1)) if transferred else None)
+        return returncode, output
+
+    def _run_socket_command(self, args):
+        """
+        通过adb server协议执行命令，输出格式与adb可执行文件保持一致，便于上层统一解析
+        :param args: 命令参数列表
+        :return: (str, int) 命令输出和返回码
+        """
+        command = args[0] if args else ""
+        try:
+            if command == "devices":
+                return "List of devices attached\n" + self._client.host_command("host:devices"), 0
+            if command in ("connect", "disconnect"):
+                target = args[1] if len(args) > 1 else ""
+                return self._client.host_command(f"host:{command}:{target}"), 0
+            if command == "shell":
+                output = self._client.shell(" ".join(args[1:]))
+                return output.decode('utf-8', errors='ignore'), 0
+            if command == "pull":
+                start_time = time.time()
+                files, total = self._client.pull(args[1], args[2])
+                return (f"{args[1]}: {files} files pulled, 0 skipped. "
+                        f"({total} bytes in {time.time() - start_time:.3f}s)"), 0
+            if command == "push":
+                start_time = time.time()
+                total = self._client.push(args[1], args[2])
+                return (f"{args[1]}: 1 file pushed, 0 skipped. "
+                        f"({total} bytes in {time.time() - start_time:.3f}s)"), 0
+        except AdbProtocolError as e:
+            return f"adb: error: {str(e)}", 1
+        except OSError as e:
+            return f"adb: error: 无法连接adb server ({str(e)})", 1
+        return f"adb: error: socket 模式不支持命令 {command}", 1
+
+    def _build_command(self, args):
+        """
+        构建完整的ADB命令行
+        :param args: 命令参数列表
+        :return: list 命令行参数
+        """
         # 需要指定设备的命令（除了 connect/disconnect/devices）
         needs_device = args and args[0] not in ['connect', 'disconnect', 'devices']
 
         # 构建命令：adb [-s 设备] 命令
         if needs_device and self._connected:
-            cmd = [self.adb_path, '-s', self.device_address] + args
-        else:
-            cmd = [self.adb_path] + args
-
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='ignore'
-        )
-
-        # 返回标准输出或标准错误
-        output = result.stdout if result.stdout else result.stderr
-        return output.strip()
+            return [self.adb_path, '-s', self.device_address] + args
+        return [self.adb_path] + args
@@ -0,0 +1,335 @@
+"""
+ADB协议模块 - 直接通过TCP与adb server通信，不再为每次操作启动adb进程
+实现 host 服务（devices/connect/disconnect/transport）、shell:/exec: 服务，
+以及用于文件传输的 sync: 协议（STAT/LIST/RECV/SEND）
+"""
+
+import os
+import queue
+import socket
+import stat
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from config import ADB_SERVER_HOST, ADB_SERVER_PORT, ADB_SOCKET_POOL_SIZE
+from temp_names import temp_name
+
+# sync 协议单个 DATA 包的最大负载
+SYNC_DATA_MAX = 64 * 1024
+
+# 读取流的块大小
+RECV_CHUNK_SIZE = 256 * 1024
+
+
+class AdbProtocolError(Exception):
+    """adb server 返回 FAIL 或连接异常"""
+
+
+def _recv_exact(sock, size):
+    """
+    从套接字读取指定字节数
+    :param sock: 套接字
+    :param size: 字节数
+    :return: bytes
+    """
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise AdbProtocolError("adb server 连接意外关闭")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+class AdbClient:
+    """adb server 协议客户端类"""
+
+    def __init__(self, serial=None, host=ADB_SERVER_HOST, port=ADB_SERVER_PORT, pool_size=ADB_SOCKET_POOL_SIZE):
+        """
+        初始化客户端
+        :param serial: 设备序列号，为None时使用唯一在线的设备
+        :param host: adb server 地址
+        :param port: adb server 端口
+        :param pool_size: 保持打开的 sync 连接数上限
+        """
+        self.serial = serial
+        self.host = host
+        self.port = port
+        # 空闲的 sync 连接：sync 会话可连续处理多个请求，复用可省去建连和切换设备的往返
+        self._sync_pool = queue.LifoQueue(maxsize=max(1, pool_size))
+        self._closed = threading.Event()
+
+    def host_command(self, service):
+        """
+        执行 host 服务并读取带长度前缀的响应
+        :param service: 如 "host:devices"、"host:connect:127.0.0.1:7555"
+        :return: str 响应内容
+        """
+        with self._open(service) as sock:
+            length = int(_recv_exact(sock, 4), 16)
+            return _recv_exact(sock, length).decode('utf-8', errors='ignore')
+
+    def shell(self, cmd):
+        """
+        执行shell命令并读取全部输出
+        :param cmd: shell命令字符串
+        :return: bytes 命令输出
+        """
+        with self.open_stream(f"shell:{cmd}") as stream:
+            return stream.read()
+
+    @contextmanager
+    def open_stream(self, service):
+        """
+        打开设备服务（shell:/exec:）并以二进制文件对象返回其输出流，可边读边处理
+        :param service: 设备服务字符串，如 "exec:tar -cf - ..."
+        :return: 文件对象
+        """
+        with self._open_device(service) as sock:
+            stream = sock.makefile('rb', buffering=RECV_CHUNK_SIZE)
+            try:
+                yield stream
+            finally:
+                stream.close()
+
+    def stat(self, remote_path):
+        """
+        查询设备文件的模式、大小、修改时间
+        :param remote_path: 设备路径
+        :return: (int, int, int) mode、size、mtime，路径不存在时 mode 为0
+        """
+        with self._sync() as sock:
+            self._sync_send(sock, b"STAT", remote_path.encode('utf-8'))
+            reply = _recv_exact(sock, 16)
+            if reply[:4] != b"STAT":
+                raise AdbProtocolError(f"STAT 响应异常: {reply[:4]!r}")
+            return struct.unpack("<III", reply[4:])
+
+    def list_dir(self, remote_path):
+        """
+        列出设备目录的直接子项
+        :param remote_path: 设备目录路径
+        :return: list [(名称, mode, size, mtime)]，不含 . 和 ..
+        """
+        entries = []
+        with self._sync() as sock:
+            self._sync_send(sock, b"LIST", remote_path.encode('utf-8'))
+            while True:
+                header = _recv_exact(sock, 20)
+                if header[:4] == b"DONE":
+                    break
+                if header[:4] != b"DENT":
+                    raise AdbProtocolError(f"LIST 响应异常: {header[:4]!r}")
+                mode, size, mtime, name_len = struct.unpack("<IIII", header[4:])
+                name = _recv_exact(sock, name_len).decode('utf-8', errors='ignore')
+                if name not in (".", ".."):
+                    entries.append((name, mode, size, mtime))
+        return entries
+
+    def recv_file(self, remote_path, local_file, mtime=None):
+        """
+        通过 sync RECV 拉取单个文件，先写入临时文件再替换
+        :param remote_path: 设备文件路径
+        :param local_file: 本地文件路径
+        :param mtime: 设备端修改时间，写入本地文件
+        :return: int 字节数
+        """
+        part_path = temp_name(local_file)
+        total = 0
+        try:
+            with self._sync() as sock, open(part_path, 'wb') as f:
+                self._sync_send(sock, b"RECV", remote_path.encode('utf-8'))
+                while True:
+                    header = _recv_exact(sock, 8)
+                    kind, length = header[:4], struct.unpack("<I", header[4:])[0]
+                    if kind == b"DONE":
+                        break
+                    if kind == b"FAIL":
+                        message = _recv_exact(sock, length).decode('utf-8', errors='ignore')
+                        raise AdbProtocolError(f"{remote_path}: {message}")
+                    if kind != b"DATA":
+                        raise AdbProtocolError(f"RECV 响应异常: {kind!r}")
+                    f.write(_recv_exact(sock, length))
+                    total += length
+            if mtime:
+                os.utime(part_path, (mtime, mtime))
+            os.replace(part_path, local_file)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        return total
+
+    def pull(self, remote_path, local_path):
+        """
+        拉取设备文件或目录，语义同 adb pull（本地目录已存在时放入同名子目录）
+        :param remote_path: 设备路径
+        :param local_path: 本地路径
+        :return: (int, int) 文件数、字节数
+        """
+        remote_path = remote_path.rstrip('/') or '/'
+        mode, size, mtime = self.stat(remote_path)
+        if mode == 0:
+            raise AdbProtocolError(f"remote object '{remote_path}' does not exist")
+        if os.path.isdir(local_path):
+            local_path = os.path.join(local_path, os.path.basename(remote_path))
+
+        if not stat.S_ISDIR(mode):
+            return 1, self.recv_file(remote_path, local_path, mtime)
+
+        files, total = 0, 0
+        pending = [(remote_path, local_path)]
+        while pending:
+            remote_dir, local_dir = pending.pop()
+            os.makedirs(local_dir, exist_ok=True)
+            for name, mode, size, mtime in self.list_dir(remote_dir):
+                remote_child = f"{remote_dir.rstrip('/')}/{name}"
+                local_child = os.path.join(local_dir, name)
+                if stat.S_ISDIR(mode):
+                    pending.append((remote_child, local_child))
+                elif stat.S_ISREG(mode):
+                    total += self.recv_file(remote_child, local_child, mtime)
+                    files += 1
+        return files, total
+
+    def push(self, local_file, remote_path, mode=0o644):
+        """
+        通过 sync SEND 推送单个文件
+        :param local_file: 本地文件路径
+        :param remote_path: 设备文件路径
+        :param mode: 设备端文件权限
+        :return: int 字节数
+        """
+        total = 0
+        with self._sync() as sock, open(local_file, 'rb') as f:
+            self._sync_send(sock, b"SEND", f"{remote_path},{stat.S_IFREG | mode}".encode('utf-8'))
+            for chunk in iter(lambda: f.read(SYNC_DATA_MAX), b""):
+                self._sync_send(sock, b"DATA", chunk)
+                total += len(chunk)
+            sock.sendall(b"DONE" + struct.pack("<I", int(time.time())))
+            header = _recv_exact(sock, 8)
+            length = struct.unpack("<I", header[4:])[0]
+            if header[:4] == b"FAIL":
+                message = _recv_exact(sock, length).decode('utf-8', errors='ignore')
+                raise AdbProtocolError(f"{remote_path}: {message}")
+            if header[:4] != b"OKAY":
+                raise AdbProtocolError(f"SEND 响应异常: {header[:4]!r}")
+        return total
+
+    def close(self):
+        """关闭所有空闲的 sync 连接"""
+        self._closed.set()
+        while True:
+            try:
+                sock = self._sync_pool.get_nowait()
+            except queue.Empty:
+                break
+            self._quit_sync(sock)
+
+    @contextmanager
+    def _open(self, service):
+        """
+        连接adb server并发送一个服务请求
+        :param service: 服务字符串
+        :return: 已收到 OKAY 的套接字
+        """
+        sock = socket.create_connection((self.host, self.port))
+        try:
+            self._request(sock, service)
+            yield sock
+        finally:
+            sock.close()
+
+    @contextmanager
+    def _open_device(self, service):
+        """
+        连接adb server，切换到目标设备后发送设备服务请求
+        :param service: 设备服务字符串
+        :return: 已收到 OKAY 的套接字
+        """
+        sock = self._connect_device()
+        try:
+            self._request(sock, service)
+            yield sock
+        finally:
+            sock.close()
+
+    def _connect_device(self):
+        """
+        建立切换到目标设备的连接
+        :return: 套接字
+        """
+        sock = socket.create_connection((self.host, self.port))
+        try:
+            transport = f"host:transport:{self.serial}" if self.serial else "host:transport-any"
+            self._request(sock, transport)
+        except Exception:
+            sock.close()
+            raise
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    @contextmanager
+    def _sync(self):
+        """
+        从连接池取出一个 sync 连接，用完放回；出错的连接直接关闭
+        :return: 处于 sync 模式的套接字
+        """
+        try:
+            sock = self._sync_pool.get_nowait()
+        except queue.Empty:
+            sock = self._connect_device()
+            try:
+                self._request(sock, "sync:")
+            except Exception:
+                sock.close()
+                raise
+
+        try:
+            yield sock
+        except BaseException:
+            # 设备端回复 FAIL 后会结束 sync 会话，其余异常下连接状态也不可信
+            sock.close()
+            raise
+        self._release_sync(sock)
+
+    def _release_sync(self, sock):
+        """将 sync 连接放回连接池，池满或已关闭时断开"""
+        if self._closed.is_set():
+            self._quit_sync(sock)
+            return
+        try:
+            self._sync_pool.put_nowait(sock)
+        except queue.Full:
+            self._quit_sync(sock)
+
+    @staticmethod
+    def _quit_sync(sock):
+        """发送 QUIT 后关闭 sync 连接"""
+        try:
+            sock.sendall(b"QUIT" + struct.pack("<I", 0))
+        except OSError:
+            pass
+        sock.close()
+
+    @staticmethod
+    def _request(sock, service):
+        """
+        发送带4位十六进制长度前缀的请求并检查 OKAY/FAIL
+        :param sock: 套接字
+        :param service: 服务字符串
+        """
+        payload = service.encode('utf-8')
+        sock.sendall(f"{len(payload):04x}".encode('ascii') + payload)
+        status = _recv_exact(sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            length = int(_recv_exact(sock, 4), 16)
+            raise AdbProtocolError(_recv_exact(sock, length).decode('utf-8', errors='ignore'))
+        raise AdbProtocolError(f"adb server 响应异常: {status!r}")
+
+    @staticmethod
+    def _sync_send(sock, kind, payload):
+        """发送 sync 请求：4字节ID + 小端长度 + 负载"""
+        sock.sendall(kind + struct.pack("<I", len(payload)) + payload)
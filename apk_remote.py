@@ -0,0 +1,260 @@
+"""
+远程APK选择性提取模块 - 不拉取整个APK，只读取需要的ZIP条目
+先按偏移读取设备上APK末尾的中央目录结束记录(EOCD)和中央目录，列出全部条目，
+再只读取匹配通配符的条目数据并在主机端解压；相邻条目合并为一次读取
+"""
+
+import fnmatch
+import os
+import struct
+import zlib
+from tar_stream import safe_relpath
+from temp_names import temp_name
+
+# EOCD 固定部分22字节，其后注释最长 65535 字节
+EOCD_SIZE = 22
+EOCD_SEARCH_BYTES = EOCD_SIZE + 65535
+ZIP64_LOCATOR_SIZE = 20
+ZIP64_EOCD_SIZE = 56
+
+# 中央目录条目、本地文件头的固定部分长度
+CENTRAL_HEADER_SIZE = 46
+LOCAL_HEADER_SIZE = 30
+
+# 相邻条目合并读取时单次读取的最大字节数，超过的单个条目分段读取
+RANGE_MAX_BYTES = 32 * 1024 * 1024
+
+
+class ApkFormatError(Exception):
+    """APK(ZIP)结构无法解析"""
+
+
+def match_globs(name, globs):
+    """
+    判断条目名是否匹配任一通配符，"**/" 可匹配零层或多层目录
+    :param name: 条目名，如 assets/textures/a.ktx2
+    :param globs: 通配符列表，如 ["assets/**/*.ktx2", "lib/arm64-v8a/*.so"]
+    :return: bool
+    """
+    for pattern in globs:
+        if fnmatch.fnmatchcase(name, pattern):
+            return True
+        if "**/" in pattern and fnmatch.fnmatchcase(name, pattern.replace("**/", "")):
+            return True
+    return False
+
+
+class RemoteApk:
+    """设备上的APK文件"""
+
+    def __init__(self, adb_manager, remote_file, size):
+        """
+        初始化
+        :param adb_manager: ADBManager实例
+        :param remote_file: 设备上的APK路径
+        :param size: APK大小（字节）
+        """
+        self.adb = adb_manager
+        self.remote_file = remote_file
+        self.size = size
+        self.bytes_read = 0
+
+    def entries(self):
+        """
+        读取中央目录，列出所有条目（按本地文件头偏移排序）
+        :return: list [{"name", "method", "crc", "compressed_size", "size", "offset"}]
+        """
+        cd_offset, cd_size, total = self._read_eocd()
+        data = self._read(cd_offset, cd_size)
+
+        entries = []
+        pos = 0
+        for _ in range(total):
+            if data[pos:pos + 4] != b"PK\x01\x02":
+                raise ApkFormatError(f"中央目录条目签名错误 (偏移 {cd_offset + pos})")
+            (flags, method, crc, compressed_size, size, name_len, extra_len, comment_len,
+             offset) = struct.unpack("<8xHH4xIIIHHH8xI", data[pos:pos + CENTRAL_HEADER_SIZE])
+            name_start = pos + CENTRAL_HEADER_SIZE
+            name = data[name_start:name_start + name_len].decode('utf-8' if flags & 0x800 else 'cp437')
+            extra = data[name_start + name_len:name_start + name_len + extra_len]
+            size, compressed_size, offset = self._apply_zip64(extra, size, compressed_size, offset)
+
+            entries.append({"name": name, "method": method, "crc": crc,
+                            "compressed_size": compressed_size, "size": size, "offset": offset})
+            pos = name_start + name_len + extra_len + comment_len
+
+        entries.sort(key=lambda entry: entry["offset"])
+        # 每个条目在文件中的结束位置：下一个条目的本地文件头，最后一个条目到中央目录为止
+        for entry, following in zip(entries, entries[1:] + [None]):
+            entry["end"] = following["offset"] if following else cd_offset
+        return entries
+
+    def extract(self, globs, local_dir):
+        """
+        提取匹配通配符的条目到本地目录
+        :param globs: 通配符列表
+        :param local_dir: 本地保存目录
+        :return: dict 统计信息 entries/matched/files/bytes/bytes_read/errors
+        """
+        entries = self.entries()
+        selected = [entry for entry in entries
+                    if not entry["name"].endswith("/") and match_globs(entry["name"], globs)]
+        stats = {"entries": len(entries), "matched": len(selected), "files": 0, "bytes": 0, "errors": []}
+
+        for group in self._group_ranges(selected):
+            if len(group) == 1 and group[0]["end"] - group[0]["offset"] > RANGE_MAX_BYTES:
+                self._extract_large(group[0], local_dir, stats)
+                continue
+
+            start = group[0]["offset"]
+            data = self._read(start, group[-1]["end"] - start)
+            for entry in group:
+                try:
+                    header = data[entry["offset"] - start:]
+                    data_offset = self._data_offset(header)
+                    compressed = header[data_offset:data_offset + entry["compressed_size"]]
+                    self._write_entry(entry, [compressed], local_dir, stats)
+                except (ApkFormatError, OSError, zlib.error) as e:
+                    stats["errors"].append(f"{entry['name']}: {str(e)}")
+
+        stats["bytes_read"] = self.bytes_read
+        return stats
+
+    def _read_eocd(self):
+        """
+        定位并解析EOCD（必要时解析ZIP64 EOCD）
+        :return: (int, int, int) 中央目录偏移、中央目录大小、条目总数
+        """
+        tail_size = min(self.size, EOCD_SEARCH_BYTES + ZIP64_LOCATOR_SIZE)
+        tail_offset = self.size - tail_size
+        tail = self._read(tail_offset, tail_size)
+
+        pos = tail.rfind(b"PK\x05\x06")
+        if pos < 0 or pos + EOCD_SIZE > len(tail):
+            raise ApkFormatError(f"未找到ZIP中央目录: {self.remote_file}")
+        total, cd_size, cd_offset = struct.unpack("<10xHII", tail[pos:pos + EOCD_SIZE - 2])
+
+        if total == 0xFFFF or cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+            locator = tail[pos - ZIP64_LOCATOR_SIZE:pos]
+            if pos < ZIP64_LOCATOR_SIZE or locator[:4] != b"PK\x06\x07":
+                raise ApkFormatError(f"ZIP64定位记录缺失: {self.remote_file}")
+            zip64_offset = struct.unpack("<8xQ4x", locator)[0]
+            record = self._read(zip64_offset, ZIP64_EOCD_SIZE)
+            if record[:4] != b"PK\x06\x06":
+                raise ApkFormatError(f"ZIP64中央目录结束记录签名错误: {self.remote_file}")
+            total, cd_size, cd_offset = struct.unpack("<32xQQQ", record)
+        return cd_offset, cd_size, total
+
+    @staticmethod
+    def _apply_zip64(extra, size, compressed_size, offset):
+        """从ZIP64扩展字段(0x0001)中取出被置为0xFFFFFFFF的大小和偏移"""
+        pos = 0
+        while pos + 4 <= len(extra):
+            header_id, length = struct.unpack("<HH", extra[pos:pos + 4])
+            if header_id == 0x0001:
+                values = extra[pos + 4:pos + 4 + length]
+                index = 0
+                fields = []
+                for value in (size, compressed_size, offset):
+                    if value == 0xFFFFFFFF and index + 8 <= len(values):
+                        value = struct.unpack("<Q", values[index:index + 8])[0]
+                        index += 8
+                    fields.append(value)
+                return tuple(fields)
+            pos += 4 + length
+        return size, compressed_size, offset
+
+    @staticmethod
+    def _group_ranges(entries):
+        """
+        将文件中相邻的条目合并为读取组，每组跨度不超过 RANGE_MAX_BYTES
+        :param entries: 按偏移排序的条目
+        :return: list 条目分组
+        """
+        groups = []
+        for entry in entries:
+            if groups and groups[-1][-1]["end"] == entry["offset"] \
+                    and entry["end"] - groups[-1][0]["offset"] <= RANGE_MAX_BYTES:
+                groups[-1].append(entry)
+            else:
+                groups.append([entry])
+        return groups
+
+    def _extract_large(self, entry, local_dir, stats):
+        """分段读取超过单次读取上限的条目，边读边解压"""
+        try:
+            header = self._read(entry["offset"], LOCAL_HEADER_SIZE)
+            name_len, extra_len = struct.unpack("<HH", header[26:30])
+            if header[:4] != b"PK\x03\x04":
+                raise ApkFormatError("本地文件头签名错误")
+            data_start = entry["offset"] + LOCAL_HEADER_SIZE + name_len + extra_len
+            data_end = data_start + entry["compressed_size"]
+
+            chunks = (self._read(pos, min(RANGE_MAX_BYTES, data_end - pos))
+                      for pos in range(data_start, data_end, RANGE_MAX_BYTES))
+            self._write_entry(entry, chunks, local_dir, stats)
+        except (ApkFormatError, OSError, zlib.error) as e:
+            stats["errors"].append(f"{entry['name']}: {str(e)}")
+
+    @staticmethod
+    def _data_offset(header):
+        """
+        解析本地文件头，返回条目数据相对于文件头的偏移
+        本地文件头的扩展字段长度可能与中央目录不同（如zipalign填充），必须以本地为准
+        """
+        if header[:4] != b"PK\x03\x04":
+            raise ApkFormatError("本地文件头签名错误")
+        name_len, extra_len = struct.unpack("<HH", header[26:30])
+        return LOCAL_HEADER_SIZE + name_len + extra_len
+
+    @staticmethod
+    def _write_entry(entry, chunks, local_dir, stats):
+        """
+        解压（或直接写出）条目数据并校验CRC32，先写临时文件再替换
+        :param entry: 条目信息
+        :param chunks: 压缩数据块的可迭代对象
+        :param local_dir: 本地保存目录
+        :param stats: 统计信息
+        """
+        rel_path = safe_relpath(entry["name"])
+        if rel_path is None:
+            raise ApkFormatError("非法条目路径")
+        if entry["method"] not in (0, 8):
+            raise ApkFormatError(f"不支持的压缩方式 {entry['method']}")
+
+        target = os.path.join(local_dir, rel_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_target = temp_name(target)
+        decompressor = zlib.decompressobj(-15) if entry["method"] == 8 else None
+        crc, written = 0, 0
+        try:
+            with open(temp_target, 'wb') as f:
+                for chunk in chunks:
+                    data = decompressor.decompress(chunk) if decompressor else chunk
+                    crc = zlib.crc32(data, crc)
+                    written += len(data)
+                    f.write(data)
+                if decompressor:
+                    data = decompressor.flush()
+                    crc = zlib.crc32(data, crc)
+                    written += len(data)
+                    f.write(data)
+            if written != entry["size"] or crc != entry["crc"]:
+                raise ApkFormatError(f"CRC校验失败 ({written}/{entry['size']} 字节)")
+            os.replace(temp_target, target)
+        finally:
+            if os.path.exists(temp_target):
+                os.remove(temp_target)
+
+        stats["files"] += 1
+        stats["bytes"] += written
+
+    def _read(self, offset, length):
+        """按偏移读取设备文件的一段"""
+        success, data = self.adb.read_range(self.remote_file, offset, length)
+        if not success:
+            raise ApkFormatError(data)
+        if len(data) != length:
+            raise ApkFormatError(f"读取不完整: 偏移 {offset}, {len(data)}/{length} 字节")
+        self.bytes_read += length
+        return data
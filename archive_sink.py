@@ -0,0 +1,251 @@
+"""
+打包导出模块 - 每个类别写入一个不压缩的ZIP，而不是成千上万个小文件
+tar流中的文件直接写入ZIP成员，不在本地落地；读取时用mmap按路径随机访问，不需要先解包
+
+导出结构: export/{包名}/{类别}.zip（如 data.zip、organized.zip），成员路径相对于类别目录
+"""
+
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zipfile
+from apk_remote import match_globs
+from tar_stream import COPY_BUFFER_SIZE, safe_relpath
+from temp_names import is_temp_name
+
+ARCHIVE_SUFFIX = ".zip"
+# 打包模式下非流式传输的文件（分块传输的大文件、整体拉取等）先落地到此目录，结束时移入ZIP
+STAGING_DIR = ".archive_staging"
+
+# ZIP本地文件头固定部分长度
+LOCAL_HEADER_SIZE = 30
+# ZIP时间戳不能早于1980年
+MIN_ZIP_TIME = 315532800
+# 流式成员先缓存再写入ZIP，不超过该大小时缓存在内存中，否则落到暂存目录的临时文件
+SPOOL_MEMORY_BYTES = 8 * 1024 * 1024
+
+
+class ArchiveSink:
+    """把一个包的导出文件写入各类别的ZIP"""
+
+    def __init__(self, staging_dir, output_dir):
+        """
+        初始化
+        :param staging_dir: 暂存根目录，文件的本地路径按相对于它的第一级目录归入对应类别的ZIP
+        :param output_dir: ZIP输出目录（包导出目录）
+        """
+        self.staging_dir = staging_dir
+        self.output_dir = output_dir
+        # {类别: (ZipFile, 锁)}
+        self._archives = {}
+        self._lock = threading.Lock()
+        self.stats = {"files": 0, "bytes": 0, "archives": {}}
+
+    def add(self, target, fileobj, mtime):
+        """
+        将文件内容写入ZIP成员
+        先在锁外把流读完（缓存到内存或临时文件），只在写ZIP时持有该类别的锁，
+        同一类别的多个分片不会因为等待网络数据而互相阻塞
+        :param target: 文件原本的本地路径（位于暂存目录下）
+        :param fileobj: 可读的二进制流
+        :param mtime: 修改时间
+        :return: int 写入字节数
+        """
+        os.makedirs(self.staging_dir, exist_ok=True)
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES, dir=self.staging_dir) as spool:
+            shutil.copyfileobj(fileobj, spool, COPY_BUFFER_SIZE)
+            spool.seek(0)
+            return self._write(target, spool, mtime)
+
+    def _write(self, target, fileobj, mtime):
+        """
+        持有类别的锁，把本地数据写入ZIP成员
+        :param target: 文件原本的本地路径（位于暂存目录下）
+        :param fileobj: 可读的二进制流（本地文件或缓存）
+        :param mtime: 修改时间
+        :return: int 写入字节数
+        """
+        name, member = self._locate(target)
+        archive, lock = self._archive(name)
+        info = zipfile.ZipInfo(member, time.localtime(max(mtime, MIN_ZIP_TIME))[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        size = 0
+        with lock:
+            # 大小未知，按ZIP64写入，超过4GB的成员也能容纳
+            with archive.open(info, 'w', force_zip64=True) as f:
+                while True:
+                    chunk = fileobj.read(COPY_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    size += len(chunk)
+            self.stats["files"] += 1
+            self.stats["bytes"] += size
+            self.stats["archives"][name] = self.stats["archives"].get(name, 0) + 1
+        return size
+
+    def absorb(self):
+        """
+        把暂存目录中已落地的文件移入ZIP并删除
+        :return: int 移入的文件数
+        """
+        count = 0
+        for dirpath, _, filenames in os.walk(self.staging_dir):
+            for filename in filenames:
+                if is_temp_name(filename):
+                    continue
+                path = os.path.join(dirpath, filename)
+                if os.path.dirname(path) == self.staging_dir:
+                    continue
+                with open(path, 'rb') as f:
+                    self._write(path, f, os.path.getmtime(path))
+                os.remove(path)
+                count += 1
+        return count
+
+    def close(self):
+        """
+        完成所有ZIP（写入中央目录）并删除暂存目录
+        :return: dict 统计信息 files/bytes/archives
+        """
+        with self._lock:
+            for name, (archive, _) in self._archives.items():
+                archive.close()
+                path = os.path.join(self.output_dir, name + ARCHIVE_SUFFIX)
+                os.replace(path + ".part", path)
+            self._archives = {}
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        return self.stats
+
+    def _locate(self, target):
+        """
+        :param target: 暂存目录下的本地路径
+        :return: (str, str) 类别名和成员路径
+        """
+        rel_path = os.path.relpath(target, self.staging_dir).replace(os.sep, '/')
+        name, _, member = rel_path.partition('/')
+        if not member or name == "..":
+            raise ValueError(f"路径不在导出目录中: {target}")
+        return name, member
+
+    def _archive(self, name):
+        """取得（必要时创建）类别的ZIP，先写 .part，close() 时再替换"""
+        with self._lock:
+            if name not in self._archives:
+                path = os.path.join(self.output_dir, name + ARCHIVE_SUFFIX + ".part")
+                os.makedirs(self.output_dir, exist_ok=True)
+                archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True)
+                self._archives[name] = (archive, threading.Lock())
+            return self._archives[name]
+
+
+class ArchiveReader:
+    """按路径随机访问导出的ZIP，不压缩的成员直接返回mmap上的内存视图"""
+
+    def __init__(self, path):
+        """
+        打开ZIP并建立路径索引（只读取中央目录）
+        :param path: ZIP路径
+        """
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = {info.filename: info for info in self._zip.infolist() if not info.is_dir()}
+        # 已返回给调用方的内存视图，关闭mmap前需先释放
+        self._views = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def names(self):
+        """
+        :return: list 所有成员路径
+        """
+        return list(self._index)
+
+    def info(self, name):
+        """
+        :param name: 成员路径
+        :return: dict {"size", "mtime"}
+        """
+        info = self._index[name]
+        return {"size": info.file_size, "mtime": time.mktime(info.date_time + (0, 0, -1))}
+
+    def view(self, name):
+        """
+        取得成员内容的内存视图（不复制），压缩的成员会先解压
+        视图在 close() 时失效，之后需要的数据应先用 bytes() 复制
+        :param name: 成员路径
+        :return: memoryview
+        """
+        data = self._view(name)
+        self._views.append(data)
+        return data
+
+    def _view(self, name):
+        """
+        :param name: 成员路径
+        :return: memoryview 未登记的视图，调用方用完后自行释放
+        """
+        info = self._index[name]
+        if info.compress_type != zipfile.ZIP_STORED:
+            return memoryview(self._zip.read(name))
+        offset = info.header_offset
+        name_len, extra_len = struct.unpack("<HH", self._mmap[offset + 26:offset + LOCAL_HEADER_SIZE])
+        start = offset + LOCAL_HEADER_SIZE + name_len + extra_len
+        with memoryview(self._mmap) as whole:
+            return whole[start:start + info.file_size]
+
+    def read(self, name):
+        """
+        :param name: 成员路径
+        :return: bytes 成员内容
+        """
+        with self._view(name) as data:
+            return bytes(data)
+
+    def unpack(self, dest_dir, globs=None):
+        """
+        解包成员到目录
+        :param dest_dir: 目标目录
+        :param globs: 通配符列表（语法同 --apk-glob），为空时解包全部
+        :return: dict 统计信息 files/bytes/skipped
+        """
+        stats = {"files": 0, "bytes": 0, "skipped": 0}
+        for name in self._index:
+            rel_path = safe_relpath(name)
+            if rel_path is None or (globs and not match_globs(name, globs)):
+                stats["skipped"] += 1
+                continue
+            target = os.path.join(dest_dir, rel_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with self._view(name) as data, open(target, 'wb') as f:
+                f.write(data)
+                stats["bytes"] += len(data)
+            mtime = self.info(name)["mtime"]
+            os.utime(target, (mtime, mtime))
+            stats["files"] += 1
+        return stats
+
+    def close(self):
+        """释放已返回的内存视图，关闭mmap和文件"""
+        for data in self._views:
+            data.release()
+        self._views = []
+        self._mmap.close()
+        self._file.close()
+        self._zip.close()
@@ -0,0 +1,385 @@
+"""
+异步ADB管理模块 - ADBManager 的 asyncio 版本
+每个操作是一个 asyncio 子进程，不占用线程；同时运行的adb进程数由信号量限制，
+多个设备的管理器可以共用同一个信号量，由一个事件循环驱动大量设备和并发操作。
+任务被取消时对应的adb进程会被结束，不会遗留在后台
+"""
+
+import asyncio
+import os
+import re
+import tarfile
+import time
+from adb_manager import PROTECTED_PATHS
+from config import ADB_PATH, DEVICE_ADDRESS, ASYNC_MAX_CONCURRENT
+from tar_stream import extract_tar_stream
+from tracing import tracer
+
+# 流式解包时每次从adb输出读取的字节数
+STREAM_READ_SIZE = 1024 * 1024
+
+
+class _BlockingReader:
+    """把 asyncio.StreamReader 包装成可在工作线程中阻塞读取的文件对象（供 tarfile 使用）"""
+
+    def __init__(self, reader, loop):
+        self._reader = reader
+        self._loop = loop
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = STREAM_READ_SIZE
+        return asyncio.run_coroutine_threadsafe(self._reader.read(size), self._loop).result()
+
+
+class AsyncADBManager:
+    """异步ADB管理器类"""
+
+    def __init__(self, device_address=None, max_concurrent=ASYNC_MAX_CONCURRENT, semaphore=None):
+        """
+        初始化异步ADB管理器
+        :param device_address: 设备序列号或地址，默认使用配置中的 DEVICE_ADDRESS
+        :param max_concurrent: 本管理器同时运行的adb进程数上限
+        :param semaphore: 共用的 asyncio.Semaphore，多设备时用于限制所有设备的总并发数（优先于max_concurrent）
+        """
+        self.adb_path = ADB_PATH
+        self.device_address = device_address or DEVICE_ADDRESS
+        self._connected = False
+        self._semaphore = semaphore or asyncio.Semaphore(max_concurrent)
+        # 由 list_packages 批量解析得到的 {包名: 安装目录}
+        self._app_paths = {}
+        # measure_throughput 测得的链路吞吐量（字节/秒）
+        self._throughput = None
+        self._throughput_lock = asyncio.Lock()
+
+    async def connect(self):
+        """
+        连接ADB设备
+        :return: (bool, str) 成功标志和消息
+        """
+        try:
+            # USB设备或 emulator-xxxx 序列号无需 adb connect，在线即可使用
+            if ":" not in self.device_address:
+                if self.device_address in await self.list_devices():
+                    self._connected = True
+                    return True, f"设备在线: {self.device_address}"
+                return False, f"设备不在线: {self.device_address}"
+
+            result = await self._run_adb_command(["connect", self.device_address])
+            if "connected" in result.lower():
+                self._connected = True
+                return True, f"连接成功: {self.device_address}"
+            return False, f"连接失败: {result}"
+        except OSError as e:
+            return False, f"连接异常: {str(e)}"
+
+    async def disconnect(self):
+        """
+        断开ADB连接
+        :return: (bool, str) 成功标志和消息
+        """
+        try:
+            result = await self._run_adb_command(["disconnect", self.device_address])
+            self._connected = False
+            return True, f"已断开连接: {result}"
+        except OSError as e:
+            return False, f"断开连接异常: {str(e)}"
+
+    async def list_devices(self):
+        """
+        列出adb server中处于在线状态的设备
+        :return: list 设备序列号列表
+        """
+        try:
+            result = await self._run_adb_command(["devices"])
+        except OSError:
+            return []
+
+        serials = []
+        for line in result.splitlines()[1:]:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1] == "device":
+                serials.append(parts[0])
+        return serials
+
+    async def is_connected(self):
+        """
+        检查设备连接状态
+        :return: bool 是否已连接
+        """
+        return self.device_address in await self.list_devices()
+
+    async def run_command(self, cmd):
+        """
+        在设备上执行shell命令
+        :param cmd: shell命令字符串（受保护路径自动提权）或参数列表
+        :return: (bool, str) 成功标志和命令输出
+        """
+        try:
+            if isinstance(cmd, str):
+                result = await self._shell(cmd)
+            else:
+                result = await self._run_adb_command(["shell"] + cmd)
+            return True, result
+        except OSError as e:
+            return False, f"命令执行失败: {str(e)}"
+
+    async def path_exists(self, remote_path):
+        """
+        检查设备上的路径是否存在
+        :param remote_path: 设备路径
+        :return: bool 是否存在
+        """
+        try:
+            result = await self._shell(f"ls {remote_path} 2>/dev/null")
+            return result.strip() != ""
+        except OSError:
+            return False
+
+    async def find_app_path(self, package_name):
+        """
+        查找应用在 /data/app/ 中的实际路径（同 ADBManager.find_app_path）
+        :param package_name: 应用包名
+        :return: (bool, str) 成功标志和实际路径
+        """
+        if package_name in self._app_paths:
+            return True, self._app_paths[package_name]
+
+        try:
+            result = await self._shell(f'find /data/app/ -maxdepth 2 -type d -name "{package_name}*" 2>/dev/null')
+            if result.strip():
+                return True, result.strip().split('\n')[0].strip()
+            return False, f"未找到应用: {package_name}"
+        except OSError as e:
+            return False, f"查找路径异常: {str(e)}"
+
+    async def list_packages(self):
+        """
+        通过一次 pm list packages -f 批量解析所有已安装包的安装目录，结果会缓存
+        :return: (bool, dict|str) 成功标志和 {包名: 安装目录}
+        """
+        try:
+            result = await self._shell("pm list packages -f")
+        except OSError as e:
+            return False, f"获取包列表异常: {str(e)}"
+
+        app_paths = {}
+        for line in result.splitlines():
+            line = line.strip()
+            if not line.startswith("package:") or "=" not in line:
+                continue
+            apk_path, package_name = line[len("package:"):].rsplit("=", 1)
+            app_paths[package_name] = apk_path.rsplit("/", 1)[0]
+
+        if not app_paths:
+            return False, f"无法获取包列表: {result}"
+        self._app_paths = app_paths
+        return True, app_paths
+
+    async def exec_out(self, cmd_str):
+        """
+        通过 adb exec-out 执行命令并返回原始二进制输出，受保护路径自动su提权
+        :param cmd_str: shell命令字符串
+        :return: (bool, bytes|str) 成功标志和输出
+        """
+        if self._is_protected(cmd_str):
+            cmd_str = f"su -c '{cmd_str}'"
+        try:
+            _, stdout, _ = await self._run_process(["exec-out", cmd_str])
+            return True, stdout
+        except OSError as e:
+            return False, f"命令执行失败: {str(e)}"
+
+    async def measure_throughput(self, probe_bytes=4 * 1024 * 1024):
+        """
+        测量adb链路吞吐量（字节/秒），结果缓存在实例上，方法同 ADBManager.measure_throughput
+        :param probe_bytes: 大探测块的字节数
+        :return: float 字节/秒，测量失败返回0
+        """
+        # 多个类别并发时只测量一次
+        async with self._throughput_lock:
+            if self._throughput is not None:
+                return self._throughput
+
+            small_bytes = 64 * 1024
+            timings = []
+            for size in (small_bytes, probe_bytes):
+                start_time = time.time()
+                success, data = await self.exec_out(f"head -c {size} /dev/zero")
+                if not success or len(data) != size:
+                    return 0.0
+                timings.append(time.time() - start_time)
+
+            elapsed = max(timings[1] - timings[0], 1e-3)
+            self._throughput = (probe_bytes - small_bytes) / elapsed
+            return self._throughput
+
+    async def pull(self, remote_path, local_path):
+        """
+        从设备拉取文件或目录（同 ADBManager.pull，受保护路径经 /sdcard 中转）
+        :param remote_path: 设备上的路径
+        :param local_path: 本地保存路径
+        :return: (bool, str) 成功标志和消息
+        """
+        try:
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+
+            if not self._is_protected(remote_path):
+                returncode, result = await self._run_pull(remote_path, local_path)
+                if returncode == 0:
+                    return True, f"拉取成功: {remote_path} -> {local_path}"
+                if "does not exist" in result.lower() or "no such file" in result.lower():
+                    return False, f"路径不存在: {remote_path}"
+                return False, f"拉取失败: {result}"
+
+            temp_path = f"/sdcard/adb_temp_{int(time.time() * 1000)}"
+            await self._shell(f"rm -rf {temp_path}")
+            try:
+                with tracer.span("su staging copy", "phase", remote_path=remote_path):
+                    await self._shell(f"cp -r {remote_path} {temp_path}")
+                returncode, result = await self._run_pull(temp_path, local_path)
+            finally:
+                # 被取消时同样清理中转目录
+                await asyncio.shield(self._shell(f"rm -rf {temp_path}"))
+
+            if returncode == 0:
+                return True, f"拉取成功: {remote_path} -> {local_path}"
+            return False, f"拉取失败: {result}"
+        except OSError as e:
+            return False, f"拉取异常: {str(e)}"
+
+    async def pull_stream(self, remote_path, local_path, compress=False):
+        """
+        以tar流方式拉取目录（同 ADBManager.pull_stream），解包在工作线程中进行，不阻塞事件循环
+        :param remote_path: 设备上的目录路径
+        :param local_path: 本地保存路径
+        :param compress: 是否在设备端gzip压缩后传输
+        :return: (bool, str) 成功标志和消息
+        """
+        remote_dir = remote_path.rstrip('/') or '/'
+        tar_cmd = f'tar -cf - -C "{remote_dir}" .'
+        if compress:
+            tar_cmd = f"{tar_cmd} | gzip -1"
+        if self._is_protected(remote_path):
+            tar_cmd = f"su -c '{tar_cmd}'"
+
+        try:
+            os.makedirs(local_path, exist_ok=True)
+            async with self._semaphore:
+                with tracer.span("adb exec-out tar", "adb", device=self.device_address,
+                                 cmd=tar_cmd[:200], compress=compress) as info:
+                    proc = await asyncio.create_subprocess_exec(
+                        *self._build_command(["exec-out", tar_cmd]),
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE
+                    )
+                    stderr_task = asyncio.ensure_future(proc.stderr.read())
+                    reader = _BlockingReader(proc.stdout, asyncio.get_running_loop())
+                    extract = asyncio.ensure_future(
+                        asyncio.to_thread(extract_tar_stream, reader, local_path, compress))
+                    try:
+                        # 取消只作用于等待本身，解包线程由下面结束adb进程后等待其退出
+                        stats = await asyncio.shield(extract)
+                        stderr = (await stderr_task).decode('utf-8', errors='ignore').strip()
+                        returncode = await proc.wait()
+                    except BaseException:
+                        # 取消或解包失败时结束adb进程，工作线程随即读到流结束；
+                        # 等它退出后再返回，之后不会再有文件写入本地目录
+                        stderr_task.cancel()
+                        await self._kill(proc)
+                        await asyncio.gather(extract, return_exceptions=True)
+                        raise
+                    info.update(bytes=stats["bytes"], files=stats["files"], exit_code=returncode)
+        except (OSError, EOFError, tarfile.TarError) as e:
+            return False, f"流式拉取异常: {str(e)}"
+
+        if stats["files"] == 0 and stats["dirs"] == 0 and returncode != 0:
+            return False, f"流式拉取失败: {stderr}"
+        message = f"拉取成功: {remote_path} -> {local_path} ({stats['files']} 个文件, {stats['bytes']} 字节)"
+        if stats["errors"] or returncode != 0:
+            message += f" [警告: {len(stats['errors'])} 个文件写入失败, tar返回码 {returncode}]"
+        return True, message
+
+    async def _shell(self, cmd_str):
+        """
+        执行设备shell命令，受保护路径用su提权
+        :param cmd_str: 命令字符串
+        :return: str 命令输出
+        """
+        if self._is_protected(cmd_str):
+            return await self._run_adb_command(["shell", f"su -c '{cmd_str}'"])
+        return await self._run_adb_command(["shell", cmd_str])
+
+    async def _run_adb_command(self, args):
+        """
+        执行ADB命令
+        :param args: 命令参数列表
+        :return: str 命令输出（标准输出为空时返回标准错误）
+        """
+        _, stdout, stderr = await self._run_process(args)
+        output = (stdout or stderr).decode('utf-8', errors='ignore')
+        return output.strip()
+
+    async def _run_pull(self, remote_path, local_path):
+        """
+        执行 adb pull（同 ADBManager._run_pull，以返回码判断成败）
+        :param remote_path: 设备上的路径
+        :param local_path: 本地保存路径
+        :return: (int, str) 返回码和输出（标准输出为空时为标准错误）
+        """
+        returncode, stdout, stderr = await self._run_process(["pull", remote_path, local_path])
+        return returncode, (stdout or stderr).decode('utf-8', errors='ignore').strip()
+
+    async def _run_process(self, args):
+        """
+        在信号量限制下运行一个adb进程并收集输出，任务被取消时结束进程
+        :param args: 命令参数列表
+        :return: (int, bytes, bytes) 返回码、标准输出、标准错误
+        """
+        async with self._semaphore:
+            with tracer.span(f"adb {args[0]}" if args else "adb", "adb",
+                             device=self.device_address, cmd=" ".join(args)[:200]) as info:
+                proc = await asyncio.create_subprocess_exec(
+                    *self._build_command(args),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                try:
+                    stdout, stderr = await proc.communicate()
+                except asyncio.CancelledError:
+                    await self._kill(proc)
+                    raise
+                info["exit_code"] = proc.returncode
+                transferred = re.search(rb"\((\d+) bytes", stdout)
+                info["bytes"] = int(transferred.group(1)) if transferred else len(stdout)
+        return proc.returncode, stdout, stderr
+
+    @staticmethod
+    async def _kill(proc):
+        """结束子进程并等待其退出"""
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+    @staticmethod
+    def _is_protected(path):
+        """
+        判断路径（或命令）是否涉及需要root权限的目录
+        :param path: 设备路径或命令字符串
+        :return: bool
+        """
+        return any(p in path for p in PROTECTED_PATHS)
+
+    def _build_command(self, args):
+        """
+        构建完整的ADB命令行
+        :param args: 命令参数列表
+        :return: list 命令行参数
+        """
+        needs_device = args and args[0] not in ['connect', 'disconnect', 'devices']
+        if needs_device and self._connected:
+            return [self.adb_path, '-s', self.device_address] + args
+        return [self.adb_path] + args
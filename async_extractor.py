@@ -0,0 +1,92 @@
+"""
+异步资源提取模块 - ResourceExtractor 的 asyncio 版本
+四个类别作为并发任务执行，adb进程数由 AsyncADBManager 的信号量限制；
+取消 extract_package 的任务会取消所有类别并结束正在运行的adb进程。
+
+只实现整目录提取（受保护路径按 PROTECTED_PULL_MODE 流式拉取或中转），
+增量、去重、过滤、后处理等功能请使用同步的 ResourceExtractor
+"""
+
+import asyncio
+import os
+from compression import link_wants_compression
+from config import EXPORT_DIR, PATHS, EXPORT_SUBDIRS, PROTECTED_PULL_MODE, TRANSFER_COMPRESSION
+from tracing import tracer
+
+
+class AsyncResourceExtractor:
+    """异步资源提取器类"""
+
+    def __init__(self, adb_manager, compression=TRANSFER_COMPRESSION):
+        """
+        初始化提取器
+        :param adb_manager: AsyncADBManager实例
+        :param compression: 流式拉取的压缩模式 "off"/"on"/"auto"（auto 按实测链路吞吐量决定）
+        """
+        self.adb = adb_manager
+        self.export_dir = EXPORT_DIR
+        self.compression = compression
+
+    async def extract_package(self, package_name):
+        """
+        提取指定包名的所有资源
+        :param package_name: 应用包名
+        :return: (bool, dict) 成功标志和提取结果详情（格式同 ResourceExtractor.extract_package）
+        """
+        print(f"\n[{self.adb.device_address}] 开始提取应用资源: {package_name}")
+
+        pkg_export_dir = os.path.join(self.export_dir, package_name)
+        os.makedirs(pkg_export_dir, exist_ok=True)
+
+        categories = ("app", "data", "sdcard_data", "obb")
+        outcomes = await asyncio.gather(*(self._run_category(key, package_name, pkg_export_dir)
+                                          for key in categories))
+
+        results = {"package": package_name, "export_dir": pkg_export_dir}
+        results.update(zip(categories, outcomes))
+        success_count = sum(1 for key in categories if results[key]["success"])
+        print(f"[{self.adb.device_address}] 提取完成: {package_name} {success_count}/{len(categories)} 项成功")
+        return success_count > 0, results
+
+    async def _run_category(self, key, package_name, export_dir):
+        """
+        执行单个类别的提取并记录耗时
+        :param key: 类别名
+        :param package_name: 包名
+        :param export_dir: 包导出目录
+        :return: dict 提取结果
+        """
+        with tracer.span(f"category {key}", "phase", package=package_name) as info:
+            if key == "app":
+                success, remote_path = await self.adb.find_app_path(package_name)
+                if not success:
+                    result = {"success": False, "message": remote_path}
+                    info["exit_code"] = 1
+                    return result
+            else:
+                remote_path = PATHS[key].format(pkg=package_name)
+                if not await self.adb.path_exists(remote_path):
+                    info["exit_code"] = 1
+                    return {"success": False, "message": f"路径不存在: {remote_path}"}
+
+            local_path = os.path.join(export_dir, EXPORT_SUBDIRS[key])
+            success, message = await self._pull(key, remote_path, local_path)
+            info["exit_code"] = 0 if success else 1
+            return {"success": success, "message": f"成功: {remote_path}" if success else message}
+
+    async def _pull(self, category, remote_path, local_path):
+        """
+        拉取一个类别的目录，受保护路径优先流式拉取，失败时回退到中转方式
+        :param category: 提取类别
+        :param remote_path: 设备上的路径
+        :param local_path: 本地保存路径
+        :return: (bool, str) 成功标志和消息
+        """
+        if category in ("app", "data") and PROTECTED_PULL_MODE == "stream":
+            throughput = await self.adb.measure_throughput() if self.compression == "auto" else None
+            success, message = await self.adb.pull_stream(remote_path, local_path,
+                                                          link_wants_compression(self.compression, throughput))
+            if success:
+                return success, message
+            print(f"  流式拉取失败，回退到中转方式: {message}")
+        return await self.adb.pull(remote_path, local_path)
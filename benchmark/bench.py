@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提取性能基准测试 - 使用模拟adb，无需模拟器
+生成合成的设备文件系统（大量小文件 + 少量大OBB），按不同传输模式运行
+ResourceExtractor.extract_package，报告耗时、adb调用次数、实际传输的字节数及速率、导出目录规模
+
+用法:
+  python benchmark/bench.py --profile small --latency 0.02 --bandwidth 50M
+  python benchmark/bench.py --modes sequential,concurrent --json bench.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import extractor as extractor_module  # noqa: E402
+from adb_manager import ADBManager  # noqa: E402
+from adb_protocol import AdbClient  # noqa: E402
+from dedup_store import ObjectStore  # noqa: E402
+from extractor import ResourceExtractor  # noqa: E402
+
+PACKAGE_NAME = "com.bench.game"
+
+# 合成文件系统规模：小文件数量及大小范围、中等文件、OBB、APK
+PROFILES = {
+    "tiny": {"small_files": 200, "small_size": (64, 4096), "medium_files": 5,
+             "medium_size": (64 * 1024, 512 * 1024), "obb_files": 1, "obb_size": 8 * 1024 * 1024,
+             "apk_size": 4 * 1024 * 1024, "so_files": 2},
+    "small": {"small_files": 2000, "small_size": (64, 4096), "medium_files": 50,
+              "medium_size": (64 * 1024, 2 * 1024 * 1024), "obb_files": 1, "obb_size": 64 * 1024 * 1024,
+              "apk_size": 16 * 1024 * 1024, "so_files": 4},
+    "large": {"small_files": 20000, "small_size": (64, 8192), "medium_files": 200,
+              "medium_size": (64 * 1024, 4 * 1024 * 1024), "obb_files": 2, "obb_size": 512 * 1024 * 1024,
+              "apk_size": 128 * 1024 * 1024, "so_files": 8}
+}
+
+# 传输模式 -> 提取器参数及ADBManager设置
+MODES = {
+    "sequential": {"extractor": {"max_concurrent": 1}},
+    "concurrent": {"extractor": {"max_concurrent": 4}},
+    "no-session": {"extractor": {"max_concurrent": 4}, "use_session": False},
+    "staging": {"extractor": {"max_concurrent": 1}, "pull_mode": "staging"},
+    "compress": {"extractor": {"max_concurrent": 4, "compression": "on"}},
+    "incremental": {"extractor": {"max_concurrent": 4, "incremental": True}, "rerun": True},
+    "device-hash": {"extractor": {"max_concurrent": 4, "device_hash": True}, "rerun": True, "fresh_export": True},
+    "socket": {"extractor": {"max_concurrent": 4}, "backend": "socket"}
+}
+
+RANDOM_BLOCK_SIZE = 1024 * 1024
+
+
+def parse_size(text):
+    """解析带单位的大小，如 50M、512K"""
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+
+def write_random_file(path, size, block):
+    """用重复的随机块写入指定大小的文件（gzip窗口内不可压缩）"""
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            chunk = block[:min(remaining, len(block))]
+            f.write(chunk)
+            remaining -= len(chunk)
+
+
+def write_text_file(path, size, rng):
+    """写入可压缩的类JSON文本文件"""
+    words = ["texture", "sprite", "atlas", "version", "url", "hash", "size", "level", "player", "config"]
+    parts, length = [], 0
+    while length < size:
+        part = f'"{rng.choice(words)}_{rng.randint(0, 999)}": {rng.randint(0, 99999)},\n'
+        parts.append(part)
+        length += len(part)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("".join(parts)[:size])
+
+
+def build_device(root, profile, seed=1):
+    """
+    生成合成的设备文件系统，相同参数已生成过时直接复用
+    :param root: 模拟设备根目录
+    :param profile: 规模参数
+    :param seed: 随机种子
+    :return: dict 文件数和总字节数
+    """
+    marker_path = os.path.join(root, ".profile.json")
+    marker = {"profile": profile, "seed": seed}
+    if os.path.exists(marker_path):
+        with open(marker_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get("marker") == json.loads(json.dumps(marker)):
+            return saved["stats"]
+        shutil.rmtree(root)
+
+    rng = random.Random(seed)
+    block = bytes(rng.getrandbits(8) for _ in range(RANDOM_BLOCK_SIZE))
+    stats = {"files": 0, "bytes": 0}
+
+    def add(path, size, text=False):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if text:
+            write_text_file(path, size, rng)
+        else:
+            write_random_file(path, size, block)
+        stats["files"] += 1
+        stats["bytes"] += size
+
+    app_dir = os.path.join(root, "data", "app", "~~bench==", f"{PACKAGE_NAME}-bench==")
+    data_dir = os.path.join(root, "data", "data", PACKAGE_NAME)
+    sdcard = os.path.join(root, "storage", "emulated", "0")
+    sdcard_data = os.path.join(sdcard, "Android", "data", PACKAGE_NAME)
+    obb_dir = os.path.join(sdcard, "Android", "obb", PACKAGE_NAME)
+    os.makedirs(os.path.join(root, "data", "local", "tmp"), exist_ok=True)
+
+    add(os.path.join(app_dir, "base.apk"), profile["apk_size"])
+    for i in range(profile["so_files"]):
+        add(os.path.join(app_dir, "lib", "arm64", f"libmodule{i}.so"), rng.randint(256 * 1024, 4 * 1024 * 1024))
+
+    # 小文件一半在私有目录，一半在外部存储；文本与二进制各半
+    for i in range(profile["small_files"]):
+        base = data_dir if i % 2 == 0 else sdcard_data
+        sub = rng.choice(["files/cache", "files/res", "cache", "shared_prefs", "files/gamecaches"])
+        ext = rng.choice([".json", ".plist", ".xml", ".bin", ".ktx2", ".png"])
+        size = rng.randint(*profile["small_size"])
+        add(os.path.join(base, sub, f"{i:06d}{ext}"), size, text=ext in (".json", ".plist", ".xml"))
+
+    for i in range(profile["medium_files"]):
+        base = data_dir if i % 3 == 0 else sdcard_data
+        ext = rng.choice([".db", ".ktx2", ".bundle"])
+        add(os.path.join(base, "files", "assets", f"asset{i:04d}{ext}"), rng.randint(*profile["medium_size"]),
+            text=ext == ".db")
+
+    for i in range(profile["obb_files"]):
+        add(os.path.join(obb_dir, f"main.{i + 1}.{PACKAGE_NAME}.obb"), profile["obb_size"])
+
+    sdcard_link = os.path.join(root, "sdcard")
+    if not os.path.lexists(sdcard_link):
+        os.symlink(sdcard, sdcard_link)
+
+    with open(marker_path, 'w', encoding='utf-8') as f:
+        json.dump({"marker": marker, "stats": stats}, f)
+    return stats
+
+
+def make_adb_launcher(work_dir):
+    """
+    生成调用模拟adb的启动脚本（ADBManager直接执行该路径）
+    :return: str 启动脚本路径
+    """
+    fake_adb = os.path.join(BENCH_DIR, "fake_adb.py")
+    if os.name == "nt":
+        launcher = os.path.join(work_dir, "adb.cmd")
+        content = f'@"{sys.executable}" "{fake_adb}" %*\n'
+    else:
+        launcher = os.path.join(work_dir, "adb")
+        content = f'#!/bin/sh\nexec "{sys.executable}" "{fake_adb}" "$@"\n'
+    with open(launcher, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.chmod(launcher, 0o755)
+    return launcher
+
+
+def start_adb_server():
+    """
+    启动模拟adb server（环境变量需已设置）
+    :return: (subprocess.Popen, int) 进程和监听端口
+    """
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "fake_adb_server.py"), "--port", "0"],
+        stdout=subprocess.PIPE,
+        text=True
+    )
+    return proc, int(proc.stdout.readline())
+
+
+def count_commands(log_path):
+    """统计命令日志中的adb进程数、会话命令数和模拟设备实际输出的字节数"""
+    counts = {"adb": 0, "session": 0, "bytes": 0}
+    if os.path.exists(log_path):
+        with open(log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                kind, _, text = line.partition("\t")
+                if kind == "bytes":
+                    counts["bytes"] += int(text)
+                else:
+                    counts[kind] = counts.get(kind, 0) + 1
+    return counts
+
+
+def local_tree_stats(path):
+    """统计导出目录中的文件数和字节数（不含元数据文件）"""
+    files, total = 0, 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for filename in filenames:
+            if filename.endswith(".json") and dirpath == path:
+                continue
+            files += 1
+            total += os.path.getsize(os.path.join(dirpath, filename))
+    return files, total
+
+
+def run_mode(name, adb_path, work_dir, log_path, server_port=None):
+    """
+    以指定模式运行一次（或两次，第二次计时）提取
+    :return: dict 测量结果
+    """
+    spec = MODES[name]
+    export_dir = os.path.join(work_dir, "export", name)
+    shutil.rmtree(export_dir, ignore_errors=True)
+    os.makedirs(export_dir)
+
+    original_pull_mode = extractor_module.PROTECTED_PULL_MODE
+    extractor_module.PROTECTED_PULL_MODE = spec.get("pull_mode", original_pull_mode)
+    try:
+        runs = 2 if spec.get("rerun") else 1
+        for run in range(runs):
+            adb = ADBManager(backend=spec.get("backend", "exe"))
+            adb.adb_path = adb_path
+            if adb.backend == "socket":
+                adb._client = AdbClient(adb.device_address, port=server_port)
+            if not spec.get("use_session", True):
+                adb._use_session = False
+            adb.connect()
+
+            extractor = ResourceExtractor(adb, **spec["extractor"])
+            extractor.export_dir = export_dir
+            if extractor.store is not None:
+                extractor.store = ObjectStore(root=os.path.join(export_dir, ".objects"))
+            if run == runs - 1 and spec.get("fresh_export"):
+                # 第二次导出到新目录：内容全部已在去重仓库中
+                extractor.export_dir = os.path.join(export_dir, "rerun")
+                os.makedirs(extractor.export_dir, exist_ok=True)
+
+            if os.path.exists(log_path):
+                os.remove(log_path)
+            start_time = time.time()
+            success, results = extractor.extract_package(PACKAGE_NAME)
+            elapsed = time.time() - start_time
+            extractor.close()
+            adb.disconnect()
+    finally:
+        extractor_module.PROTECTED_PULL_MODE = original_pull_mode
+
+    # 速率按模拟设备实际输出的字节数计算：增量、设备端哈希等模式下导出目录中的文件大多不是本次传输的
+    files, total = local_tree_stats(results["export_dir"])
+    counts = count_commands(log_path)
+    transferred = counts["bytes"]
+    return {
+        "mode": name,
+        "success": success,
+        "categories_ok": sum(1 for k in ("app", "data", "sdcard_data", "obb") if results[k]["success"]),
+        "wall_time": round(elapsed, 3),
+        "adb_processes": counts["adb"],
+        "session_commands": counts["session"],
+        "files": files,
+        "bytes": total,
+        "transferred_bytes": transferred,
+        "bytes_per_sec": round(transferred / elapsed) if elapsed else 0
+    }
+
+
+def print_table(rows):
+    """打印结果表格"""
+    header = (f"{'模式':14s} {'耗时(s)':>9s} {'adb进程':>8s} {'会话命令':>8s} {'传输MB':>9s} {'MB/s':>9s} "
+              f"{'导出文件':>8s} {'导出MB':>9s} {'类别':>5s}")
+    print("\n" + header)
+    print("-" * len(header.encode('gbk', errors='ignore')))
+    for row in rows:
+        print(f"{row['mode']:14s} {row['wall_time']:9.3f} {row['adb_processes']:8d} {row['session_commands']:8d} "
+              f"{row['transferred_bytes'] / 1024 / 1024:9.2f} {row['bytes_per_sec'] / 1024 / 1024:9.2f} "
+              f"{row['files']:8d} {row['bytes'] / 1024 / 1024:9.2f} {row['categories_ok']:>3d}/4")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="资源提取性能基准测试（模拟adb）")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small", help="合成文件系统规模")
+    parser.add_argument("--small-files", type=int, help="覆盖小文件数量")
+    parser.add_argument("--obb-size", help="覆盖OBB大小，如 256M")
+    parser.add_argument("--latency", type=float, default=0.0, help="每次adb调用/会话命令的附加延迟（秒）")
+    parser.add_argument("--bandwidth", default="0", help="每个连接的带宽上限，如 50M，0表示不限")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"逗号分隔的模式: {','.join(MODES)}")
+    parser.add_argument("--work-dir", default=os.path.join(BENCH_DIR, "_work"), help="工作目录")
+    parser.add_argument("--json", metavar="FILE", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    profile = dict(PROFILES[args.profile])
+    if args.small_files is not None:
+        profile["small_files"] = args.small_files
+    if args.obb_size:
+        profile["obb_size"] = parse_size(args.obb_size)
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"未知模式: {', '.join(unknown)}")
+
+    work_dir = os.path.abspath(args.work_dir)
+    device_root = os.path.join(work_dir, "device")
+    os.makedirs(device_root, exist_ok=True)
+
+    print(f"生成合成设备文件系统 ({args.profile})...")
+    device_stats = build_device(device_root, profile)
+    print(f"设备文件: {device_stats['files']} 个, {device_stats['bytes'] / 1024 / 1024:.1f} MB")
+
+    log_path = os.path.join(work_dir, "adb_commands.log")
+    os.environ["FAKE_ADB_ROOT"] = device_root
+    os.environ["FAKE_ADB_LATENCY"] = str(args.latency)
+    os.environ["FAKE_ADB_BANDWIDTH"] = str(parse_size(args.bandwidth))
+    os.environ["FAKE_ADB_LOG"] = log_path
+    adb_path = make_adb_launcher(work_dir)
+
+    server, server_port = None, None
+    if any(MODES[name].get("backend") == "socket" for name in modes):
+        server, server_port = start_adb_server()
+
+    rows = []
+    try:
+        for name in modes:
+            print(f"\n>>> 模式: {name}")
+            rows.append(run_mode(name, adb_path, work_dir, log_path, server_port))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_table(rows)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"profile": args.profile, "latency": args.latency, "bandwidth": args.bandwidth,
+                       "device": device_stats, "results": rows}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
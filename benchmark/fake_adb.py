@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟adb可执行文件 - 用本地目录充当设备文件系统，供基准测试使用
+支持 connect/disconnect/devices/shell(含交互式)/exec-out/pull/push
+
+设备路径 /data、/storage、/sdcard 被映射到 FAKE_ADB_ROOT 下，命令交给本机 sh 执行，
+因此需要POSIX环境（Linux/macOS，或Windows上的Git Bash/MSYS2）。
+
+环境变量:
+  FAKE_ADB_ROOT       模拟设备根目录（必需）
+  FAKE_ADB_LATENCY    每次adb调用及每条会话命令的附加延迟（秒），默认0
+  FAKE_ADB_BANDWIDTH  每个连接的输出带宽上限（字节/秒），默认不限
+  FAKE_ADB_LOG        命令日志路径，每次adb调用或会话命令追加一行，每个连接结束时追加一行输出字节数
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.environ.get("FAKE_ADB_ROOT", "fake_device"))
+LATENCY = float(os.environ.get("FAKE_ADB_LATENCY", "0") or 0)
+BANDWIDTH = float(os.environ.get("FAKE_ADB_BANDWIDTH", "0") or 0)
+LOG_PATH = os.environ.get("FAKE_ADB_LOG")
+
+# 命令中需要映射到模拟根目录的设备路径
+DEVICE_PATH_PATTERN = re.compile(r"(^|(?<=[\s'\"=;(|<>]))/(data|storage|sdcard)(?=/|\b)")
+
+# su -c 'cmd' 直接在当前用户下执行；交互式会话中的单独 su 行会被忽略
+SU_FUNCTION = 'su() { if [ "$1" = "-c" ]; then shift; sh -c "$*"; fi; }\n'
+
+# 模拟 pm 命令：根据 data/app 下的目录生成 pm list packages -f 的输出
+PM_SCRIPT = """#!/bin/sh
+for d in "$FAKE_ADB_ROOT"/data/app/*/*/; do
+    [ -d "$d" ] || continue
+    name=$(basename "$d")
+    parent=$(basename "$(dirname "$d")")
+    echo "package:/data/app/$parent/$name/base.apk=${name%%-*}"
+done
+"""
+
+CHUNK_SIZE = 64 * 1024
+
+
+def log(kind, text):
+    """追加一行命令日志"""
+    if LOG_PATH:
+        with open(LOG_PATH, 'a', encoding='utf-8') as f:
+            f.write(f"{kind}\t{text.strip()[:200]}\n")
+
+
+def to_host(cmd):
+    """将命令中的设备路径改写为模拟根目录下的路径"""
+    return DEVICE_PATH_PATTERN.sub(lambda m: f"{ROOT}/{m.group(2)}", cmd)
+
+
+def shell_env():
+    """执行设备命令的环境：PATH 前置模拟的 pm 命令"""
+    bin_dir = os.path.join(ROOT, ".bin")
+    pm_path = os.path.join(bin_dir, "pm")
+    if not os.path.exists(pm_path):
+        os.makedirs(bin_dir, exist_ok=True)
+        with open(pm_path, 'w', encoding='utf-8') as f:
+            f.write(PM_SCRIPT)
+        os.chmod(pm_path, 0o755)
+
+    env = dict(os.environ)
+    env["PATH"] = bin_dir + os.pathsep + env.get("PATH", "")
+    env["FAKE_ADB_ROOT"] = ROOT
+    return env
+
+
+class Throttle:
+    """按带宽上限控制输出速度"""
+
+    def __init__(self, bandwidth):
+        self.bandwidth = bandwidth
+        self.start_time = time.time()
+        self.sent = 0
+
+    def wait(self, size):
+        if self.bandwidth <= 0:
+            return
+        self.sent += size
+        delay = self.sent / self.bandwidth - (time.time() - self.start_time)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def copy_output(stream, out):
+    """
+    转发二进制输出，把模拟根目录前缀还原为设备路径
+    保留前缀长度-1个字节跨块处理，避免前缀被块边界截断
+    :return: int 输出的字节数
+    """
+    prefix = (ROOT + "/").encode()
+    keep = len(prefix) - 1
+    throttle = Throttle(BANDWIDTH)
+    buffer = b""
+    total = 0
+    for chunk in iter(lambda: stream.read1(CHUNK_SIZE), b""):
+        buffer = (buffer + chunk).replace(prefix, b"/")
+        if len(buffer) > keep:
+            data, buffer = buffer[:-keep], buffer[-keep:]
+            throttle.wait(len(data))
+            out.write(data)
+            out.flush()
+            total += len(data)
+    buffer = buffer.replace(prefix, b"/")
+    out.write(buffer)
+    out.flush()
+    return total + len(buffer)
+
+
+def run_interactive():
+    """交互式 adb shell：逐行转发stdin到sh，逐行回传输出"""
+    proc = subprocess.Popen(
+        ["sh"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=shell_env()
+    )
+    proc.stdin.write(SU_FUNCTION.encode())
+    proc.stdin.flush()
+
+    prefix = (ROOT + "/").encode()
+
+    def forward_output():
+        # 会话进程可能在断开时被直接终止，每条命令结束时记录一次输出字节数
+        out = sys.stdout.buffer
+        sent = 0
+        for line in iter(proc.stdout.readline, b""):
+            line = line.replace(prefix, b"/")
+            out.write(line)
+            out.flush()
+            sent += len(line)
+            if b"__ADB_END_" in line:
+                log("bytes", str(sent))
+                sent = 0
+
+    reader = threading.Thread(target=forward_output, daemon=True)
+    reader.start()
+
+    for raw in iter(sys.stdin.buffer.raw.readline, b""):
+        line = raw.decode('utf-8', errors='ignore')
+        if line.strip() == "su":
+            continue
+        if "__ADB_END_" in line:
+            log("session", line)
+            if LATENCY:
+                time.sleep(LATENCY)
+        proc.stdin.write(to_host(line).encode('utf-8'))
+        proc.stdin.flush()
+
+    proc.stdin.close()
+    proc.wait()
+    reader.join()
+    return proc.returncode
+
+
+def run_command(cmd):
+    """单次 shell/exec-out 命令"""
+    proc = subprocess.Popen(
+        ["sh", "-c", SU_FUNCTION + to_host(cmd)],
+        stdout=subprocess.PIPE,
+        env=shell_env()
+    )
+    log("bytes", str(copy_output(proc.stdout, sys.stdout.buffer)))
+    return proc.wait()
+
+
+def pull(remote, local):
+    """模拟 adb pull，目标为已存在目录时放入同名子目录"""
+    source = to_host(remote).rstrip('/')
+    if not os.path.exists(source):
+        print(f"adb: error: remote object '{remote}' does not exist")
+        return 1
+    if os.path.isdir(local):
+        local = os.path.join(local, os.path.basename(source))
+
+    total = 0
+    if os.path.isdir(source):
+        shutil.copytree(source, local, symlinks=True, dirs_exist_ok=True)
+        for dirpath, _, filenames in os.walk(local):
+            total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames
+                         if os.path.isfile(os.path.join(dirpath, f)))
+    else:
+        shutil.copy2(source, local)
+        total = os.path.getsize(local)
+
+    Throttle(BANDWIDTH).wait(total)
+    log("bytes", str(total))
+    print(f"{remote}: 1 file pulled, 0 skipped. ({total} bytes)")
+    return 0
+
+
+def main(argv):
+    if argv[:1] == ["-s"]:
+        argv = argv[2:]
+    if not argv:
+        print("usage: fake_adb.py [-s SERIAL] COMMAND ...")
+        return 1
+
+    log("adb", " ".join(argv))
+    if LATENCY:
+        time.sleep(LATENCY)
+
+    command = argv[0]
+    if command == "connect":
+        print(f"connected to {argv[1]}")
+        return 0
+    if command == "disconnect":
+        print(f"disconnected {argv[1] if len(argv) > 1 else 'everything'}")
+        return 0
+    if command == "devices":
+        print("List of devices attached\n127.0.0.1:7555\tdevice\n")
+        return 0
+    if command in ("shell", "exec-out"):
+        if len(argv) == 1:
+            return run_interactive()
+        return run_command(" ".join(argv[1:]))
+    if command == "pull":
+        return pull(argv[1], argv[2])
+    if command == "push":
+        shutil.copy(argv[1], to_host(argv[2]))
+        print(f"{argv[1]}: 1 file pushed")
+        return 0
+
+    print(f"adb: unknown command {command}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
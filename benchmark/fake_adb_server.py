@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟adb server - 在TCP端口上实现adb server协议，供 socket 后端的基准测试使用
+支持 host:version/devices/connect/disconnect/transport、shell:/exec: 以及 sync:(STAT/LIST/RECV/SEND/QUIT)
+
+与 fake_adb.py 共用设备路径映射和环境变量（FAKE_ADB_ROOT/LATENCY/BANDWIDTH/LOG），
+启动后在标准输出打印实际监听的端口号
+
+用法:
+  FAKE_ADB_ROOT=/path/to/device python benchmark/fake_adb_server.py --port 0
+"""
+
+import argparse
+import os
+import socketserver
+import stat
+import struct
+import subprocess
+import sys
+import time
+
+import fake_adb
+
+DEVICE_SERIAL = "127.0.0.1:7555"
+
+
+class DeviceStream:
+    """将套接字包装为 copy_output 可用的输出对象"""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def write(self, data):
+        self.sock.sendall(data)
+
+    def flush(self):
+        pass
+
+
+class AdbServerHandler(socketserver.BaseRequestHandler):
+    """处理一个客户端连接"""
+
+    def handle(self):
+        self.transport = False
+        try:
+            while True:
+                service = self.read_request()
+                if service is None:
+                    return
+                if not self.dispatch(service):
+                    return
+        except (ConnectionError, OSError):
+            pass
+
+    def read_exact(self, size):
+        buffer = bytearray()
+        while len(buffer) < size:
+            chunk = self.request.recv(size - len(buffer))
+            if not chunk:
+                raise ConnectionError("client closed")
+            buffer.extend(chunk)
+        return bytes(buffer)
+
+    def read_request(self):
+        try:
+            length = int(self.read_exact(4), 16)
+        except ConnectionError:
+            return None
+        return self.read_exact(length).decode('utf-8', errors='ignore')
+
+    def okay(self, payload=None):
+        data = b"OKAY"
+        if payload is not None:
+            encoded = payload.encode('utf-8')
+            data += f"{len(encoded):04x}".encode('ascii') + encoded
+        self.request.sendall(data)
+
+    def fail(self, message):
+        encoded = message.encode('utf-8')
+        self.request.sendall(b"FAIL" + f"{len(encoded):04x}".encode('ascii') + encoded)
+
+    def dispatch(self, service):
+        """
+        处理一个服务请求
+        :return: bool 连接是否继续读取下一个请求（仅 transport 切换后为True）
+        """
+        if service == "host:version":
+            self.okay("0029")
+            return False
+        if service == "host:devices":
+            self.okay(f"{DEVICE_SERIAL}\tdevice\n")
+            return False
+        if service.startswith("host:connect:"):
+            self.okay(f"connected to {service[len('host:connect:'):]}")
+            return False
+        if service.startswith("host:disconnect:"):
+            self.okay(f"disconnected {service[len('host:disconnect:'):] or 'everything'}")
+            return False
+        if service.startswith("host:transport"):
+            self.transport = True
+            self.okay()
+            return True
+
+        if not self.transport:
+            self.fail(f"unknown host service: {service}")
+            return False
+
+        fake_adb.log("adb", service)
+        if fake_adb.LATENCY:
+            time.sleep(fake_adb.LATENCY)
+
+        if service.startswith("shell:") or service.startswith("exec:"):
+            self.okay()
+            self.run_command(service.split(":", 1)[1], merge_stderr=service.startswith("shell:"))
+        elif service == "sync:":
+            self.okay()
+            self.run_sync()
+        else:
+            self.fail(f"unknown device service: {service}")
+        return False
+
+    def run_command(self, cmd, merge_stderr):
+        """执行设备命令，输出流式写回客户端"""
+        proc = subprocess.Popen(
+            ["sh", "-c", fake_adb.SU_FUNCTION + fake_adb.to_host(cmd)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else None,
+            env=fake_adb.shell_env()
+        )
+        try:
+            fake_adb.log("bytes", str(fake_adb.copy_output(proc.stdout, DeviceStream(self.request))))
+        finally:
+            proc.stdout.close()
+            proc.wait()
+
+    def run_sync(self):
+        """处理 sync 会话中的请求，直到 QUIT 或出错"""
+        while True:
+            try:
+                header = self.read_exact(8)
+            except ConnectionError:
+                return
+            kind, length = header[:4], struct.unpack("<I", header[4:])[0]
+            if kind == b"QUIT":
+                return
+            payload = self.read_exact(length).decode('utf-8', errors='ignore')
+            path = fake_adb.to_host(payload)
+
+            if kind == b"STAT":
+                self.sync_stat(path)
+            elif kind == b"LIST":
+                self.sync_list(path)
+            elif kind == b"RECV":
+                if not self.sync_recv(path):
+                    return
+            elif kind == b"SEND":
+                if not self.sync_send(payload):
+                    return
+            else:
+                self.sync_fail(f"unknown sync request {kind!r}")
+                return
+
+    def sync_fail(self, message):
+        encoded = message.encode('utf-8')
+        self.request.sendall(b"FAIL" + struct.pack("<I", len(encoded)) + encoded)
+
+    def sync_stat(self, path):
+        try:
+            st = os.stat(path)
+            values = (st.st_mode, st.st_size & 0xFFFFFFFF, int(st.st_mtime))
+        except OSError:
+            values = (0, 0, 0)
+        self.request.sendall(b"STAT" + struct.pack("<III", *values))
+
+    def sync_list(self, path):
+        entries = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    st = entry.stat(follow_symlinks=False)
+                    name = entry.name.encode('utf-8')
+                    entries.append(b"DENT" + struct.pack("<IIII", st.st_mode, st.st_size & 0xFFFFFFFF,
+                                                         int(st.st_mtime), len(name)) + name)
+        except OSError:
+            pass
+        self.request.sendall(b"".join(entries) + b"DONE" + struct.pack("<IIII", 0, 0, 0, 0))
+
+    def sync_recv(self, path):
+        try:
+            f = open(path, 'rb')
+        except OSError as e:
+            self.sync_fail(f"remote object does not exist: {e.strerror}")
+            return False
+        throttle = fake_adb.Throttle(fake_adb.BANDWIDTH)
+        total = 0
+        with f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                throttle.wait(len(chunk))
+                self.request.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                total += len(chunk)
+        fake_adb.log("bytes", str(total))
+        self.request.sendall(b"DONE" + struct.pack("<I", 0))
+        return True
+
+    def sync_send(self, payload):
+        remote_path, _, mode = payload.rpartition(",")
+        path = fake_adb.to_host(remote_path)
+        try:
+            with open(path, 'wb') as f:
+                while True:
+                    header = self.read_exact(8)
+                    kind, length = header[:4], struct.unpack("<I", header[4:])[0]
+                    if kind == b"DONE":
+                        break
+                    f.write(self.read_exact(length))
+            if mode.isdigit():
+                os.chmod(path, stat.S_IMODE(int(mode)))
+            os.utime(path, (length, length))
+        except OSError as e:
+            self.sync_fail(str(e))
+            return False
+        self.request.sendall(b"OKAY" + struct.pack("<I", 0))
+        return True
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟adb server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5037, help="监听端口，0表示自动分配")
+    args = parser.parse_args()
+
+    with FakeAdbServer((args.host, args.port), AdbServerHandler) as server:
+        print(server.server_address[1], flush=True)
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
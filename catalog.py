@@ -0,0 +1,415 @@
+"""
+资源目录索引模块 - 所有导出文件的 SQLite 索引
+提取时每个文件落地后即记录 包名/版本号/类别/路径/大小/修改时间/哈希/文件类型，
+按常用查询列建索引，"两个版本之间变化的 4MB 以上 ktx2" 之类的问题无需遍历导出目录
+
+命令行查询: python catalog.py --package 包名 --type ktx2 --min-size 4M --changed 100 101
+"""
+
+import argparse
+import codecs
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from config import CATALOG_PATH, DEDUP_HASH
+from filters import parse_size
+
+# 累计多少条记录写入一次数据库
+FLUSH_ROWS = 500
+
+# 等待计算哈希的文件数上限，超过时文件落地回调等待（传输远快于哈希时限制积压）
+QUEUE_SIZE = 10000
+
+# 识别文件类型读取的文件头字节数
+HEADER_BYTES = 64
+
+# 读取文件时的缓冲区大小
+READ_BUFFER_SIZE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    package TEXT NOT NULL,
+    version_code INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    hash TEXT,
+    type TEXT,
+    recorded INTEGER NOT NULL,
+    PRIMARY KEY (package, version_code, category, path)
+);
+CREATE INDEX IF NOT EXISTS idx_files_path ON files (path);
+CREATE INDEX IF NOT EXISTS idx_files_type_size ON files (type, size);
+CREATE INDEX IF NOT EXISTS idx_files_size ON files (size);
+CREATE INDEX IF NOT EXISTS idx_files_hash ON files (hash);
+CREATE INDEX IF NOT EXISTS idx_files_mtime ON files (mtime);
+"""
+
+COLUMNS = ("package", "version_code", "category", "path", "size", "mtime", "hash", "type", "recorded")
+
+# 文件头魔数 -> 类型，按顺序匹配 (偏移, 魔数, 类型)
+MAGIC_TYPES = [
+    (0, b"\xabKTX 20\xbb\r\n\x1a\n", "ktx2"),
+    (0, b"\xabKTX 11\xbb\r\n\x1a\n", "ktx"),
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"\xff\xd8\xff", "jpeg"),
+    (0, b"GIF8", "gif"),
+    (0, b"\x13\xab\xa1\x5c", "astc"),
+    (0, b"PKM ", "pkm"),
+    (0, b"DDS ", "dds"),
+    (0, b"SQLite format 3\x00", "sqlite"),
+    (0, b"\x1f\x8b", "gzip"),
+    (0, b"(\xb5/\xfd", "zstd"),
+    (0, b"\x04\x22\x4d\x18", "lz4"),
+    (0, b"OggS", "ogg"),
+    (0, b"ID3", "mp3"),
+    (0, b"fLaC", "flac"),
+    (0, b"\x7fELF", "elf"),
+    (0, b"dex\n", "dex"),
+    (0, b"\x1bLua", "luac"),
+    (0, b"\x1bLJ", "luajit"),
+    (0, b"UnityFS", "unityfs"),
+    (4, b"ftyp", "mp4"),
+]
+
+# ZIP 容器按扩展名细分
+ZIP_EXTENSIONS = {".apk": "apk", ".jar": "jar", ".obb": "obb", ".aab": "aab"}
+
+
+def detect_type(header, name):
+    """
+    按文件头魔数判断文件类型，无法识别时按内容是否为文本区分 json/xml/text/binary
+    :param header: 文件开头的若干字节（至少32字节效果最好）
+    :param name: 文件名（用于细分ZIP容器）
+    :return: str 类型
+    """
+    if header.startswith(b"PK\x03\x04") or header.startswith(b"PK\x05\x06"):
+        return ZIP_EXTENSIONS.get(os.path.splitext(name)[1].lower(), "zip")
+    if header.startswith(b"RIFF") and len(header) >= 12:
+        return {b"WEBP": "webp", b"WAVE": "wav"}.get(header[8:12], "riff")
+    for offset, magic, file_type in MAGIC_TYPES:
+        if header[offset:offset + len(magic)] == magic:
+            return file_type
+    if not header:
+        return "empty"
+
+    stripped = header.lstrip(b"\xef\xbb\xbf \t\r\n")
+    if stripped[:1] in (b"{", b"["):
+        return "json"
+    if stripped[:1] == b"<":
+        return "xml"
+    if b"\x00" in header:
+        return "binary"
+    try:
+        # 增量解码：末尾被截断的多字节字符不算错误
+        codecs.getincrementaldecoder("utf-8")().decode(header)
+        return "text"
+    except UnicodeDecodeError:
+        return "binary"
+
+
+def inspect_file(path, algorithm=DEDUP_HASH):
+    """
+    一次读取同时计算哈希和识别类型
+    :param path: 本地文件路径
+    :param algorithm: 哈希算法
+    :return: (str, str) 十六进制哈希和类型
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        header = f.read(READ_BUFFER_SIZE)
+        digest.update(header)
+        for chunk in iter(lambda: f.read(READ_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest(), detect_type(header[:HEADER_BYTES], os.path.basename(path))
+
+
+def inspect_type(path):
+    """
+    只读取文件头识别类型（哈希已知时使用）
+    :param path: 本地文件路径
+    :return: str 类型
+    """
+    with open(path, 'rb') as f:
+        return detect_type(f.read(HEADER_BYTES), os.path.basename(path))
+
+
+class Catalog:
+    """导出文件索引类"""
+
+    def __init__(self, path=CATALOG_PATH):
+        """
+        打开（必要时创建）索引数据库
+        :param path: 数据库路径
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 文件落地回调来自多个传输线程，统一加锁访问同一个连接
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._package = None
+        self._version_code = None
+        self._recorded = 0
+        # 哈希在后台线程中计算，不占用传输线程
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def begin(self, package, version_code, replace=True):
+        """
+        开始记录一个包的一次提取
+        :param package: 包名
+        :param version_code: 版本号（未知时为0）
+        :param replace: 是否先删除该版本已有的记录（完整提取时为True，增量提取和监视时为False）
+        """
+        with self._lock:
+            self._package = package
+            self._version_code = version_code
+            self._recorded = 0
+            if replace:
+                with self._conn:
+                    self._conn.execute("DELETE FROM files WHERE package = ? AND version_code = ?",
+                                       (package, version_code))
+
+    def add(self, rel_path, local_file, digest=None):
+        """
+        记录一个落地的文件（放入队列，由后台线程计算哈希后写入）
+        :param rel_path: 相对于包导出目录的路径，第一级目录为类别
+        :param local_file: 本地文件路径
+        :param digest: 已知的内容哈希（算法同 DEDUP_HASH，如取自去重仓库的文件），为None时读取文件计算
+        """
+        self._queue.put((self._package, self._version_code, rel_path, local_file, digest))
+
+    def _work(self):
+        """后台线程：逐个计算哈希和类型，攒够一批写入数据库"""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                package, version_code, rel_path, local_file, digest = item
+                category, _, path = rel_path.partition('/')
+                try:
+                    stat = os.stat(local_file)
+                    if digest is None:
+                        digest, file_type = inspect_file(local_file)
+                    else:
+                        file_type = inspect_type(local_file)
+                except OSError as e:
+                    # 文件在记录前已被移走或删除
+                    print(f"  文件索引: 无法读取 {rel_path}: {e}")
+                    continue
+                row = (package, version_code, category, path, stat.st_size, int(stat.st_mtime),
+                       digest, file_type, int(time.time()))
+                with self._lock:
+                    self._pending.append(row)
+                    self._recorded += 1
+                    if len(self._pending) >= FLUSH_ROWS:
+                        self._flush()
+            finally:
+                self._queue.task_done()
+
+    def finish(self, carry_forward_root=None):
+        """
+        写入剩余记录
+        :param carry_forward_root: 增量提取时传入包导出目录：本次未传输、但本地仍存在且大小不变的文件
+                                   沿用上一个版本的记录
+        :return: int 本次记录的文件数
+        """
+        self._queue.join()
+        with self._lock:
+            self._flush()
+            if carry_forward_root is not None:
+                self._recorded += self._carry_forward(carry_forward_root)
+            return self._recorded
+
+    def query(self, package=None, version_code=None, category=None, file_type=None, min_size=None,
+              max_size=None, path_glob=None, file_hash=None, limit=None):
+        """
+        按条件查询文件记录
+        :param path_glob: 路径通配符（SQLite GLOB 语法，区分大小写），如 "*/ui/*.png"
+        :return: list [dict]
+        """
+        conditions, params = [], []
+        for column, value in (("package", package), ("version_code", version_code), ("category", category),
+                              ("type", file_type), ("hash", file_hash)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if min_size is not None:
+            conditions.append("size >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            conditions.append("size <= ?")
+            params.append(max_size)
+        if path_glob:
+            conditions.append("path GLOB ?")
+            params.append(path_glob)
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM files"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY package, version_code, category, path"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self._fetch(sql, params)
+
+    def changed_between(self, package, old_version, new_version, file_type=None, min_size=None):
+        """
+        找出两个版本之间新增或内容变化的文件
+        :param package: 包名
+        :param old_version: 旧版本号
+        :param new_version: 新版本号
+        :param file_type: 只看该类型
+        :param min_size: 新版本中的最小大小
+        :return: list [dict]，附加 old_hash/old_size（新增文件为None）
+        """
+        sql = (f"SELECT {', '.join('n.' + c for c in COLUMNS)}, o.hash AS old_hash, o.size AS old_size "
+               "FROM files n LEFT JOIN files o ON o.package = n.package AND o.version_code = ? "
+               "AND o.category = n.category AND o.path = n.path "
+               "WHERE n.package = ? AND n.version_code = ? AND (o.path IS NULL OR o.hash IS NOT n.hash)")
+        params = [old_version, package, new_version]
+        if file_type is not None:
+            sql += " AND n.type = ?"
+            params.append(file_type)
+        if min_size is not None:
+            sql += " AND n.size >= ?"
+            params.append(min_size)
+        return self._fetch(sql + " ORDER BY n.category, n.path", params)
+
+    def versions(self, package):
+        """
+        :param package: 包名
+        :return: list [(版本号, 文件数, 总大小)]
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT version_code, COUNT(*), SUM(size) FROM files WHERE package = ? "
+                "GROUP BY version_code ORDER BY version_code", (package,)
+            ).fetchall()
+
+    def close(self):
+        """等待队列中的文件处理完，写入剩余记录并关闭数据库"""
+        self._queue.put(None)
+        self._worker.join()
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+    def _flush(self):
+        """批量写入待写记录（调用方持有锁）"""
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO files ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                self._pending
+            )
+        self._pending = []
+
+    def _carry_forward(self, root):
+        """
+        把上一个版本中本次未记录的文件复制到当前版本（调用方持有锁）
+        :param root: 包导出目录
+        :return: int 沿用的记录数
+        """
+        previous = self._conn.execute(
+            "SELECT MAX(version_code) FROM files WHERE package = ? AND version_code <> ?",
+            (self._package, self._version_code)
+        ).fetchone()[0]
+        if previous is None:
+            return 0
+
+        rows = self._conn.execute(
+            f"SELECT {', '.join('o.' + c for c in COLUMNS)} FROM files o WHERE o.package = ? AND o.version_code = ? "
+            "AND NOT EXISTS (SELECT 1 FROM files n WHERE n.package = o.package AND n.version_code = ? "
+            "AND n.category = o.category AND n.path = o.path)",
+            (self._package, previous, self._version_code)
+        ).fetchall()
+
+        carried = []
+        for row in rows:
+            row = dict(zip(COLUMNS, row))
+            try:
+                if os.path.getsize(os.path.join(root, row["category"], row["path"])) != row["size"]:
+                    continue
+            except OSError:
+                continue
+            carried.append(tuple(dict(row, version_code=self._version_code)[c] for c in COLUMNS))
+        self._pending = carried
+        self._flush()
+        return len(carried)
+
+    def _fetch(self, sql, params):
+        """执行查询并转换为dict列表"""
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            names = [d[0] for d in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def main():
+    """命令行查询"""
+    parser = argparse.ArgumentParser(description="查询导出文件索引")
+    parser.add_argument("--db", default=CATALOG_PATH, help=f"索引数据库 (默认: {CATALOG_PATH})")
+    parser.add_argument("--package", help="包名")
+    parser.add_argument("--version", type=int, help="版本号")
+    parser.add_argument("--category", help="类别，如 data、organized")
+    parser.add_argument("--type", help="文件类型，如 ktx2、png、json")
+    parser.add_argument("--min-size", help="最小大小，如 4M")
+    parser.add_argument("--max-size", help="最大大小")
+    parser.add_argument("--path", help="路径通配符，如 '*/ui/*'")
+    parser.add_argument("--hash", help="内容哈希")
+    parser.add_argument("--changed", nargs=2, type=int, metavar=("OLD", "NEW"),
+                        help="列出两个版本之间新增或变化的文件（需要 --package）")
+    parser.add_argument("--versions", action="store_true", help="列出包的所有版本（需要 --package）")
+    parser.add_argument("--limit", type=int, default=200, help="最多显示条数 (默认: 200, 0 表示不限)")
+    args = parser.parse_args()
+
+    # 先校验参数，查询命令不创建新的数据库
+    if (args.changed or args.versions) and not args.package:
+        parser.error("--changed/--versions 需要 --package")
+    sizes = []
+    for text in (args.min_size, args.max_size):
+        try:
+            sizes.append(parse_size(text) if text else None)
+        except ValueError:
+            parser.error(f"无法解析大小: {text}")
+    min_size, max_size = sizes
+    if not os.path.exists(args.db):
+        parser.error(f"索引数据库不存在: {args.db}")
+
+    catalog = Catalog(args.db)
+    try:
+        start_time = time.perf_counter()
+        if args.versions:
+            for version_code, count, total in catalog.versions(args.package):
+                print(f"{version_code:>12}  {count:8d} 个文件  {total or 0:14d} 字节")
+            return
+        if args.changed:
+            rows = catalog.changed_between(args.package, args.changed[0], args.changed[1], args.type, min_size)
+        else:
+            rows = catalog.query(args.package, args.version, args.category, args.type, min_size, max_size,
+                                 args.path, args.hash)
+        elapsed = time.perf_counter() - start_time
+
+        for row in rows[:args.limit or None]:
+            status = ""
+            if args.changed:
+                status = "新增 " if row["old_hash"] is None else "变化 "
+            print(f"{status}{row['package']} v{row['version_code']} {row['category']}/{row['path']} "
+                  f"{row['size']} 字节 {row['type']} {(row['hash'] or '')[:12]}")
+        print(f"\n共 {len(rows)} 条 (查询耗时 {elapsed * 1000:.1f}ms)")
+    finally:
+        catalog.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+分块传输模块 - 大文件（OBB、APK）按固定大小分块拉取，支持断点续传
+设备端用 dd 按偏移读取单个块，tee 一次读取同时输出块数据和md5，主机端校验后写入预分配的稀疏文件；
+进度记录在 {文件}.part.json 中，中断后再次拉取时只传输尚未完成的块
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from adb_manager import quote_path
+from config import CHUNK_SIZE, CHUNK_WORKERS, CHUNK_RETRIES
+from temp_names import temp_name
+from tracing import tracer
+
+
+class ChunkedTransfer:
+    """分块传输类"""
+
+    def __init__(self, adb_manager, chunk_size=CHUNK_SIZE, workers=CHUNK_WORKERS):
+        """
+        初始化分块传输
+        :param adb_manager: ADBManager实例
+        :param chunk_size: 每块字节数
+        :param workers: 同一文件并行拉取的块数
+        """
+        self.adb = adb_manager
+        self.chunk_size = chunk_size
+        self.workers = max(1, workers)
+
+    def pull_file(self, remote_file, local_file):
+        """
+        分块拉取单个文件，已有进度记录且远端文件未变化时从上次完成的块继续
+        :param remote_file: 设备上的文件路径
+        :param local_file: 本地文件路径
+        :return: (bool, str) 成功标志和消息
+        """
+        success, info = self._stat(remote_file)
+        if not success:
+            return False, info
+        size, mtime = info
+
+        part_path = temp_name(local_file)
+        progress_path = temp_name(local_file, "part.json")
+        os.makedirs(os.path.dirname(local_file) or ".", exist_ok=True)
+
+        progress = self._load_progress(progress_path)
+        expected = {"remote": remote_file, "size": size, "mtime": mtime, "chunk_size": self.chunk_size}
+        if not progress or any(progress.get(k) != v for k, v in expected.items()) \
+                or not os.path.exists(part_path):
+            progress = dict(expected, done={})
+
+        mode = 'r+b' if os.path.exists(part_path) and progress["done"] else 'wb'
+        total_chunks = max(1, -(-size // self.chunk_size))
+        pending = [index for index in range(total_chunks) if str(index) not in progress["done"]]
+        resumed = total_chunks - len(pending)
+        tracker = self.adb.progress_tracker(
+            remote_file, total_files=1,
+            total_bytes=sum(min(self.chunk_size, size - index * self.chunk_size) for index in pending))
+
+        try:
+            errors = self._fetch_all(remote_file, size, pending, part_path, mode, progress_path, progress, tracker)
+        except Exception as e:
+            if tracker is not None:
+                tracker.finish(False, files=0)
+            return False, f"分块拉取异常: {str(e)}"
+        if tracker is not None:
+            tracker.finish(not errors, files=0 if errors else 1)
+
+        if errors:
+            return False, (f"分块拉取未完成: {remote_file} ({total_chunks - len(errors)}/{total_chunks} 块, "
+                           f"可再次运行继续): {errors[0]}")
+
+        os.utime(part_path, (mtime, mtime))
+        os.replace(part_path, local_file)
+        os.remove(progress_path)
+
+        message = f"分块拉取成功: {remote_file} ({size} 字节, {total_chunks} 块"
+        if resumed:
+            message += f", 续传跳过 {resumed} 块"
+        return True, message + ")"
+
+    def _fetch_all(self, remote_file, size, pending, part_path, mode, progress_path, progress, tracker=None):
+        """
+        并行拉取尚未完成的块并按偏移写入本地文件，每写完一块立即落盘并更新进度记录
+        :param remote_file: 设备上的文件路径
+        :param size: 文件总大小
+        :param pending: 待拉取的块序号列表
+        :param part_path: 本地临时文件路径
+        :param mode: 打开临时文件的模式（续传时为 r+b）
+        :param progress_path: 进度记录路径
+        :param progress: 进度记录
+        :param tracker: TransferProgress实例，每写完一块报告字节数
+        :return: list 失败块的错误信息
+        """
+        lock = threading.Lock()
+        with open(part_path, mode) as f:
+            # 预分配为稀疏文件，各块按偏移写入
+            f.truncate(size)
+
+            def fetch(index):
+                success, result = self._fetch_chunk(remote_file, index, size)
+                if not success:
+                    return result
+                digest, data = result
+                with lock:
+                    f.seek(index * self.chunk_size)
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    progress["done"][str(index)] = digest
+                    self._save_progress(progress_path, progress)
+                if tracker is not None:
+                    tracker.advance(nbytes=len(data))
+                return None
+
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(pending) or 1)) as pool:
+                return [error for error in pool.map(fetch, pending) if error]
+
+    def _stat(self, remote_file):
+        """
+        读取远端文件大小和修改时间（用于判断进度记录是否仍然有效）
+        :param remote_file: 设备上的文件路径
+        :return: (bool, tuple|str) 成功标志和 (大小, 修改时间)
+        """
+        success, output = self.adb.run_command(f'stat -c "%s %Y" {quote_path(remote_file)} 2>/dev/null')
+        parts = output.split() if success else []
+        if len(parts) != 2 or not parts[0].isdigit() or not parts[1].isdigit():
+            return False, f"无法读取文件信息: {remote_file}"
+        return True, (int(parts[0]), int(parts[1]))
+
+    def _fetch_chunk(self, remote_file, index, size):
+        """
+        拉取并校验单个块，失败时重试
+        设备端只读取一次：tee 把块数据写到标准输出的同时交给 md5sum，md5 在数据之后输出
+        :param remote_file: 设备上的文件路径
+        :param index: 块序号
+        :param size: 文件总大小
+        :return: (bool, tuple|str) 成功标志和 (md5, 数据)
+        """
+        length = min(self.chunk_size, size - index * self.chunk_size)
+        read = f"dd if={quote_path(remote_file)} bs={self.chunk_size} skip={index} count=1 2>/dev/null"
+        cmd = f"{{ {read} | tee /dev/fd/3 | md5sum; }} 3>&1"
+
+        error = ""
+        for _ in range(CHUNK_RETRIES):
+            with tracer.span("chunk", "phase", remote_file=remote_file, index=index) as info:
+                success, output = self.adb.exec_out(cmd)
+                if not success:
+                    error = output
+                    info["exit_code"] = 1
+                    continue
+
+                data, trailer = output[:length], output[length:]
+                digest = trailer.split(b" ", 1)[0].decode('ascii', errors='ignore').lower()
+                info["bytes"] = len(data)
+                if len(data) != length or len(digest) != 32:
+                    error = f"块 {index} 长度不符 ({len(output)}/{length})"
+                elif hashlib.md5(data).hexdigest() != digest:
+                    error = f"块 {index} md5校验失败"
+                else:
+                    return True, (digest, data)
+                info["exit_code"] = 1
+        return False, error
+
+    @staticmethod
+    def _load_progress(progress_path):
+        """读取进度记录，不存在或损坏时返回None"""
+        try:
+            with open(progress_path, 'r', encoding='utf-8') as f:
+                progress = json.load(f)
+            if isinstance(progress.get("done"), dict):
+                return progress
+        except (OSError, ValueError):
+            pass
+        return None
+
+    @staticmethod
+    def _save_progress(progress_path, progress):
+        """保存进度记录（先写临时文件并落盘再替换，断电后不会留下与已落盘块不一致的记录）"""
+        temp_path = progress_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(progress, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, progress_path)
@@ -0,0 +1,130 @@
+"""
+传输压缩策略模块 - 决定哪些文件在设备端gzip后再传输
+按扩展名区分已压缩格式与文本类格式，未知扩展名抽样计算信息熵；
+auto 模式下仅在实测链路吞吐量低于阈值时启用压缩
+"""
+
+import math
+import os
+from collections import Counter
+from adb_manager import quote_path
+from config import (COMPRESS_BELOW_BYTES_PER_SEC, COMPRESSIBLE_EXTENSIONS, INCOMPRESSIBLE_EXTENSIONS,
+                    ENTROPY_THRESHOLD, ENTROPY_SAMPLE_BYTES, ENTROPY_SAMPLES_PER_EXTENSION)
+
+
+def shannon_entropy(data):
+    """
+    计算字节数据的香农熵
+    :param data: bytes
+    :return: float 比特/字节（0~8）
+    """
+    if not data:
+        return 0.0
+    total = len(data)
+    return -sum(count / total * math.log2(count / total) for count in Counter(data).values())
+
+
+def link_wants_compression(mode, throughput=None):
+    """
+    按压缩模式和链路吞吐量决定是否压缩传输（同步和异步提取器共用）
+    :param mode: "off"、"on" 或 "auto"
+    :param throughput: 实测链路吞吐量（字节/秒），仅 auto 模式使用，0表示测量失败
+    :return: bool
+    """
+    if mode == "on":
+        return True
+    if mode != "auto":
+        return False
+    return 0 < throughput < COMPRESS_BELOW_BYTES_PER_SEC
+
+
+class CompressionPolicy:
+    """传输压缩策略类"""
+
+    def __init__(self, adb_manager, mode):
+        """
+        初始化策略
+        :param adb_manager: ADBManager实例
+        :param mode: "off"、"on" 或 "auto"
+        """
+        self.adb = adb_manager
+        self.mode = mode
+        # 抽样得出的 {扩展名: 是否可压缩}，同一提取器内复用
+        self._sampled = {}
+
+    def enabled(self):
+        """
+        当前链路是否值得压缩
+        :return: bool
+        """
+        throughput = self.adb.measure_throughput() if self.mode == "auto" else None
+        return link_wants_compression(self.mode, throughput)
+
+    def split(self, remote_path, file_sizes):
+        """
+        将文件分为可压缩和不可压缩两组
+        :param remote_path: 设备上的目录路径
+        :param file_sizes: {相对路径: 大小}
+        :return: (dict, dict) 可压缩的 {相对路径: 大小} 和不可压缩的 {相对路径: 大小}
+        """
+        if not self.enabled():
+            return {}, dict(file_sizes)
+
+        unknown = {}
+        for rel_path, size in file_sizes.items():
+            ext = os.path.splitext(rel_path)[1].lower()
+            if ext not in COMPRESSIBLE_EXTENSIONS and ext not in INCOMPRESSIBLE_EXTENSIONS \
+                    and ext not in self._sampled and size > 0:
+                unknown.setdefault(ext, []).append((rel_path, size))
+        if unknown:
+            self._sample_extensions(remote_path, unknown)
+
+        compressible, incompressible = {}, {}
+        for rel_path, size in file_sizes.items():
+            ext = os.path.splitext(rel_path)[1].lower()
+            if ext in COMPRESSIBLE_EXTENSIONS or self._sampled.get(ext, False):
+                compressible[rel_path] = size
+            else:
+                incompressible[rel_path] = size
+        return compressible, incompressible
+
+    def _sample_extensions(self, remote_path, unknown):
+        """
+        对未知扩展名各抽取少量文件，一次 exec-out 读取各文件开头的样本并计算信息熵
+        :param remote_path: 设备上的目录路径
+        :param unknown: {扩展名: [(相对路径, 大小)]}
+        """
+        samples = []
+        for ext, files in unknown.items():
+            files.sort(key=lambda item: item[1], reverse=True)
+            for rel_path, _ in files[:ENTROPY_SAMPLES_PER_EXTENSION]:
+                samples.append((ext, rel_path))
+
+        # 每个样本前输出文件当前大小作为长度前缀，文件缺失时为0，不会错位到后面的样本
+        remote_dir = remote_path.rstrip('/') or '/'
+        reads = "; ".join(f"{{ stat -c %s {quote_path(rel_path)} || echo 0; }}; head -c {ENTROPY_SAMPLE_BYTES} "
+                          f"{quote_path(rel_path)}" for _, rel_path in samples)
+        success, data = self.adb.exec_out(f"cd {quote_path(remote_dir)} && {{ {reads}; }} 2>/dev/null")
+        if not success:
+            return
+
+        # 按长度前缀切分样本；格式不符或长度对不上（如读取期间文件被截断）时整批丢弃，不作判断
+        entropies = {}
+        offset = 0
+        for ext, _ in samples:
+            newline = data.find(b"\n", offset)
+            try:
+                length = min(int(data[offset:newline]), ENTROPY_SAMPLE_BYTES) if newline >= 0 else -1
+            except ValueError:
+                length = -1
+            if length < 0 or newline + 1 + length > len(data):
+                return
+            chunk = data[newline + 1:newline + 1 + length]
+            offset = newline + 1 + length
+            if chunk:
+                entropies.setdefault(ext, []).append(shannon_entropy(chunk))
+        if offset != len(data):
+            return
+
+        for ext, values in entropies.items():
+            self._sampled[ext] = sum(values) / len(values) < ENTROPY_THRESHOLD
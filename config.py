@@ -9,6 +9,23 @@ import os
 ADB_PATH = os.path.join(os.path.dirname(__file__), "adb.exe")
 DEVICE_ADDRESS = "127.0.0.1:7555"
 
+# 与设备通信的方式
+# "exe": 每次操作启动一个adb进程（默认）
+# "socket": 直接通过TCP连接adb server，省去进程启动开销（需要adb server已在运行，可先执行一次 adb start-server）
+ADB_BACKEND = "exe"
+ADB_SERVER_HOST = "127.0.0.1"
+ADB_SERVER_PORT = 5037
+# socket 模式下保持打开的 sync（文件传输）连接数
+ADB_SOCKET_POOL_SIZE = 4
+
+# 多设备批量提取时自动探测的本机端口
+# MuMu6 使用 7555，MuMu12 多开实例从 16384 开始每个实例间隔 32
+DISCOVERY_HOST = "127.0.0.1"
+DISCOVERY_PORTS = [7555] + [16384 + 32 * i for i in range(16)]
+
+# 设备端临时文件目录（存放文件清单等小文件）
+DEVICE_TEMP_DIR = "/data/local/tmp"
+
 # 导出目录
 EXPORT_DIR = os.path.join(os.path.dirname(__file__), "export")
 
@@ -28,3 +45,133 @@ EXPORT_SUBDIRS = {
     "sdcard_data": "sdcard_data",
     "obb": "obb"
 }
+
+# 受保护路径(/data/app、/data/data)的拉取方式
+# "stream": su -c tar 经 adb exec-out 流式传输，主机端边收边解包（默认）
+# "staging": 旧方式，先 cp -r 到 /sdcard 临时目录再 adb pull
+PROTECTED_PULL_MODE = "stream"
+
+# 常驻shell会话：复用一个 adb shell + su 进程执行查询类命令，减少进程启动开销
+USE_SHELL_SESSION = True
+# 会话中单条命令的超时时间（秒），超时后会话自动重建
+SHELL_SESSION_TIMEOUT = 600
+
+# 传输进度：各传输按 PROGRESS_INTERVAL 秒的间隔向 ADBManager.progress 回调发送进度事件，
+# 速率按最近 PROGRESS_RATE_WINDOW 次采样计算；命令行默认显示实时进度（--no-progress 关闭），
+# 输出重定向到文件时每 PROGRESS_LOG_INTERVAL 秒打印一行
+PROGRESS_DISPLAY = True
+PROGRESS_INTERVAL = 0.5
+PROGRESS_RATE_WINDOW = 20
+PROGRESS_LOG_INTERVAL = 10
+# adb pull 的输出边运行边读取，只保留最后几行用于错误信息
+PULL_OUTPUT_TAIL_LINES = 20
+
+# 监视模式（--watch）：定期在设备端查找比上次检查点更新的文件，只拉取这些增量，
+# 用于捕获游戏运行过程中陆续下载的热更新资源
+WATCH_INTERVAL = 5
+WATCH_CATEGORIES = ["sdcard_data", "data"]
+
+# 导出格式
+# "files": 逐个文件保存在 export/{包名}/{类别}/ 下（默认）
+# "zip": 每个类别写入一个不压缩的 export/{包名}/{类别}.zip，避免大量小文件的目录和杀毒扫描开销；
+#        可用 archive_sink.ArchiveReader 按路径随机读取，或 main.py --unpack 解包
+EXPORT_FORMAT = "files"
+
+# 任务日志：提取过程中把已落地的文件、已完成的类别和包记录到导出目录下的 .journal/{包名}.jsonl，
+# 中断（模拟器重启、主机休眠）后用 --resume 跳过已完成的部分，只传输尚未落地的文件；
+# 日志每隔 JOURNAL_SYNC_INTERVAL 秒及每个类别完成时 fsync；默认关闭，可用 main.py --journal 启用
+JOURNAL_ENABLED = False
+JOURNAL_DIR_NAME = ".journal"
+JOURNAL_SYNC_INTERVAL = 1.0
+
+# 增量提取：对比远端文件清单(大小+修改时间)与本地保存的清单，只拉取新增或变更的文件
+INCREMENTAL = False
+
+# 并发传输：大于1时各类别同时提取，大目录按文件列表拆分为分片并发拉取（每个分片一个adb连接），
+# sdcard_data/obb 也从 adb pull 改为 find 列表 + tar 流；默认1：逐个类别整目录拉取，可用 --max-concurrent 开启
+MAX_CONCURRENT_TRANSFERS = 1
+# 异步接口（async_adb / async_extractor）中每个管理器同时运行的adb进程数上限
+ASYNC_MAX_CONCURRENT = 16
+# 分片目标大小（字节），超过该大小的单个文件独立成片
+SHARD_TARGET_BYTES = 64 * 1024 * 1024
+# 每个分片的最大文件数
+SHARD_MAX_FILES = 2000
+
+# 去重仓库：导出文件按内容哈希存入仓库，包目录中的文件改为指向仓库对象的硬链接/reflink
+DEDUP_STORE = False
+DEDUP_STORE_DIR = os.path.join(EXPORT_DIR, ".objects")
+# 哈希算法，与设备端 sha1sum/md5sum 对应
+DEDUP_HASH = "sha1"
+# 链接方式: "auto"(优先reflink，否则硬链接) / "hardlink" / "reflink"，均失败时复制
+DEDUP_LINK_MODE = "auto"
+
+# 导出文件索引：每个文件落地后记录包名、版本号、类别、路径、大小、修改时间、哈希和文件类型，
+# 可用 python catalog.py 按条件查询（如两个版本间变化的大纹理），无需遍历导出目录
+CATALOG_ENABLED = False
+CATALOG_PATH = os.path.join(EXPORT_DIR, "catalog.db")
+
+# 设备端哈希：传输前在设备上批量计算哈希，去重仓库中已有的内容直接链接，不再经过adb传输
+# 启用时自动使用去重仓库
+DEVICE_HASH_SKIP = False
+
+# 传输压缩: "off" 不压缩 / "on" 总是压缩 / "auto" 实测链路吞吐量低于阈值时压缩
+# 只对文本类文件压缩（按扩展名，未知扩展名抽样计算信息熵），已压缩格式原样传输
+TRANSFER_COMPRESSION = "off"
+COMPRESS_BELOW_BYTES_PER_SEC = 20 * 1024 * 1024
+COMPRESSIBLE_EXTENSIONS = {
+    ".json", ".txt", ".xml", ".plist", ".db", ".sqlite", ".lua", ".js", ".csv",
+    ".ini", ".log", ".atlas", ".fnt", ".html", ".css", ".dex", ".vdex", ".odex"
+}
+INCOMPRESSIBLE_EXTENSIONS = {
+    ".ktx2", ".png", ".jpg", ".jpeg", ".webp", ".apk", ".obb", ".so", ".zip", ".gz",
+    ".7z", ".mp3", ".mp4", ".ogg", ".m4a", ".astc", ".pkm", ".jar", ".zst", ".lz4", ".br"
+}
+# 抽样判断：平均信息熵低于阈值(比特/字节)视为可压缩
+ENTROPY_THRESHOLD = 7.5
+ENTROPY_SAMPLE_BYTES = 4096
+ENTROPY_SAMPLES_PER_EXTENSION = 3
+
+# 大文件分块传输：不小于该大小的文件（OBB、大APK）按块拉取，每块校验md5后写入本地，
+# 中断后再次提取时从已完成的块继续；0 表示关闭
+CHUNKED_THRESHOLD_BYTES = 256 * 1024 * 1024
+CHUNK_SIZE = 16 * 1024 * 1024
+# 同一文件并行拉取的块数
+CHUNK_WORKERS = 4
+# 单个块校验失败或读取失败时的重试次数
+CHUNK_RETRIES = 3
+
+# APK选择性提取：非空时不再拉取整个 /data/app/{包名}-xxx/ 目录，
+# 只读取各APK的中央目录并提取匹配的条目，如 ["assets/**/*.ktx2", "lib/arm64-v8a/*.so"]
+APK_GLOBS = []
+
+# 文件过滤规则：按类别（"*" 表示所有类别）配置，在设备端生成文件列表时即过滤，
+# 被过滤的文件不会被中转或传输。规则格式见 filters.py，例如:
+# FILTERS = {
+#     "data": {"exclude": ["cache/", "code_cache/", "app_webview/", "*.log"], "max_size": 50 * 1024 * 1024},
+#     "sdcard_data": {"exclude": ["cache/"]}
+# }
+FILTERS = {}
+
+# 后处理流水线：文件落地后立即交给这些阶段处理，与传输并行
+# 内置阶段 "organize"（按缓存映射整理）、"ktx2"（ktx2转png）；自定义插件写作 "模块名:类名"
+PIPELINE_STAGES = []
+# 每个阶段的待处理队列长度上限，队列满时传输线程等待
+PIPELINE_QUEUE_SIZE = 256
+# 游戏缓存映射文件名及需要从资源URL中去掉的CDN根目录
+ORGANIZE_MAPPING_NAME = "cacheList.json"
+ORGANIZE_STRIP_PREFIXES = ["/zhengba3_res/"]
+# KTX-Software 命令行工具
+KTX_TOOL = "ktx"
+
+# 边传输边整理：按包名配置游戏的缓存映射规则。提取该类别前先从设备读取映射文件，
+# 映射中的缓存文件在传输时直接写到 organized/{相对路径}，本地不再落地扁平的缓存文件
+#   category: 缓存所在的提取类别
+#   mapping: 映射文件相对于类别目录的路径，其中的缓存文件名相对于映射文件所在目录
+#   strip_prefixes: 需要从资源URL中去掉的CDN根目录
+ORGANIZE_RULES = {
+    "com.chenyou.slsy.yofun.mumu": {
+        "category": "data",
+        "mapping": "files/cache/gamecaches/cacheList.json",
+        "strip_prefixes": ["/zhengba3_res/"]
+    }
+}
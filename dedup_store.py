@@ -0,0 +1,185 @@
+"""
+去重仓库模块 - 按内容哈希寻址的对象存储
+导出目录中的文件以硬链接（或支持时以reflink）指向仓库对象，相同内容只占用一份磁盘空间
+每个包目录下的 .objects.json 记录 {相对路径: [哈希, 大小, 修改时间]}，用于跳过已入库文件和垃圾回收
+"""
+
+import hashlib
+import json
+import os
+from config import EXPORT_DIR, DEDUP_STORE_DIR, DEDUP_HASH, DEDUP_LINK_MODE
+from file_links import link_file
+from temp_names import temp_name, is_temp_name
+
+REFS_NAME = ".objects.json"
+
+# 包目录中不参与去重的元数据文件
+METADATA_FILES = {REFS_NAME, "manifest.json"}
+
+
+class ObjectStore:
+    """去重对象仓库类"""
+
+    def __init__(self, root=DEDUP_STORE_DIR, algorithm=DEDUP_HASH, link_mode=DEDUP_LINK_MODE):
+        """
+        初始化仓库
+        :param root: 仓库根目录
+        :param algorithm: 哈希算法名（与设备端 md5sum/sha1sum 保持一致）
+        :param link_mode: "hardlink"、"reflink" 或 "auto"（优先reflink，失败时硬链接）
+        """
+        self.root = root
+        self.algorithm = algorithm
+        self.link_mode = link_mode
+
+    def object_path(self, digest):
+        """
+        对象文件路径，按哈希前两位分目录
+        :param digest: 十六进制哈希
+        :return: str
+        """
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def has(self, digest):
+        """仓库中是否已有该内容"""
+        return os.path.exists(self.object_path(digest))
+
+    def hash_file(self, path):
+        """
+        计算本地文件哈希
+        :param path: 文件路径
+        :return: str 十六进制哈希
+        """
+        h = hashlib.new(self.algorithm)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def materialize(self, digest, target, mtime=None):
+        """
+        将仓库对象链接到目标路径（目标已存在时替换）
+        :param digest: 十六进制哈希
+        :param target: 目标文件路径
+        :param mtime: 目标文件应有的修改时间；硬链接与对象共享修改时间，只在对象没有其他链接时设置
+        """
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        object_path = self.object_path(digest)
+        temp_target = temp_name(target, unique=True)
+        self._link(object_path, temp_target)
+        os.replace(temp_target, target)
+        if mtime is not None and (not os.path.samefile(target, object_path) or os.stat(target).st_nlink <= 2):
+            os.utime(target, (mtime, mtime))
+
+    def ingest_package(self, pkg_export_dir, known_digests=None):
+        """
+        将包导出目录中的文件入库并替换为指向仓库的链接
+        大小和修改时间与上次记录一致的文件直接跳过，不重复计算哈希
+        :param pkg_export_dir: 包导出目录
+        :param known_digests: 已知内容的 {相对路径: 哈希}（如直接由仓库对象链接生成的文件）
+        :return: dict 统计信息 files/ingested/deduped/skipped/saved_bytes
+        """
+        refs = self.load_refs(pkg_export_dir)
+        known_digests = known_digests or {}
+        new_refs = {}
+        stats = {"files": 0, "ingested": 0, "deduped": 0, "skipped": 0, "saved_bytes": 0}
+
+        for dirpath, _, filenames in os.walk(pkg_export_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                rel_path = os.path.relpath(path, pkg_export_dir).replace(os.sep, '/')
+                if rel_path in METADATA_FILES or is_temp_name(filename):
+                    continue
+
+                stats["files"] += 1
+                st = os.stat(path)
+                old = refs.get(rel_path)
+                if old and old[1] == st.st_size and old[2] == int(st.st_mtime) and self.has(old[0]):
+                    new_refs[rel_path] = old
+                    stats["skipped"] += 1
+                    continue
+
+                digest = known_digests.get(rel_path) or self.hash_file(path)
+                if self.has(digest):
+                    # 已有相同内容：用仓库对象替换本地文件（已是同一对象的链接则无需替换）
+                    if not os.path.samefile(path, self.object_path(digest)):
+                        self.materialize(digest, path, int(st.st_mtime))
+                    stats["deduped"] += 1
+                    stats["saved_bytes"] += st.st_size
+                else:
+                    self._store(path, digest)
+                    stats["ingested"] += 1
+
+                # 硬链接与对象共享修改时间，按链接后的实际状态记录
+                st = os.stat(path)
+                new_refs[rel_path] = [digest, st.st_size, int(st.st_mtime)]
+
+        self.save_refs(pkg_export_dir, new_refs)
+        return stats
+
+    def gc(self, export_dir=EXPORT_DIR):
+        """
+        清理不再被任何包引用的对象
+        引用来源为各包目录下的 .objects.json；硬链接数大于1的对象同样视为仍在使用
+        :param export_dir: 导出根目录
+        :return: dict 统计信息 removed/freed_bytes/kept
+        """
+        referenced = set()
+        for entry in os.scandir(export_dir):
+            if entry.is_dir() and os.path.abspath(entry.path) != os.path.abspath(self.root):
+                referenced.update(ref[0] for ref in self.load_refs(entry.path).values())
+
+        stats = {"removed": 0, "freed_bytes": 0, "kept": 0}
+        if not os.path.isdir(self.root):
+            return stats
+
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, name)
+                st = os.stat(path)
+                if prefix + name in referenced or st.st_nlink > 1:
+                    stats["kept"] += 1
+                    continue
+                os.remove(path)
+                stats["removed"] += 1
+                stats["freed_bytes"] += st.st_size
+            if not os.listdir(prefix_dir):
+                os.rmdir(prefix_dir)
+
+        return stats
+
+    @staticmethod
+    def load_refs(pkg_export_dir):
+        """
+        读取包目录的引用记录
+        :return: dict {相对路径: [哈希, 大小, 修改时间]}
+        """
+        try:
+            with open(os.path.join(pkg_export_dir, REFS_NAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def save_refs(pkg_export_dir, refs):
+        """保存包目录的引用记录"""
+        refs_path = os.path.join(pkg_export_dir, REFS_NAME)
+        temp_path = temp_name(refs_path, "tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(refs, f, ensure_ascii=False)
+        os.replace(temp_path, refs_path)
+
+    def _store(self, path, digest):
+        """将本地文件作为新对象放入仓库"""
+        object_path = self.object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        # 多个包并行入库时可能同时写入同一对象，临时文件名需唯一
+        temp_object = temp_name(object_path, unique=True)
+        self._link(path, temp_object)
+        os.replace(temp_object, object_path)
+
+    def _link(self, source, target):
+        """按链接模式建立链接，依次回退到reflink、硬链接、复制"""
+        link_file(source, target, self.link_mode)
@@ -0,0 +1,123 @@
+"""
+设备池模块 - 多模拟器并行批量提取
+每个设备一个ADBManager，多个提取任务通过共享队列分发到各设备
+"""
+
+import queue
+import socket
+import threading
+import time
+from adb_manager import ADBManager
+from config import ADB_BACKEND, DISCOVERY_HOST, DISCOVERY_PORTS
+
+
+def _port_open(host, port, timeout=0.2):
+    """
+    快速检查本机端口是否在监听，避免对未启动的实例执行耗时的 adb connect
+    :return: bool
+    """
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class DevicePool:
+    """设备池类"""
+
+    def __init__(self, serials=None, backend=ADB_BACKEND):
+        """
+        初始化设备池
+        :param serials: 指定的设备序列号或地址列表
+        :param backend: ADBManager 的通信方式，"exe" 或 "socket"
+        """
+        self.serials = list(serials or [])
+        self.backend = backend
+        self.managers = []
+
+    def discover(self):
+        """
+        发现设备：adb devices 中已在线的设备，以及本机模拟器常用端口上的实例
+        :return: list 设备序列号列表
+        """
+        serials = list(self.serials)
+
+        for serial in ADBManager(backend=self.backend).list_devices():
+            if serial not in serials:
+                serials.append(serial)
+
+        for port in DISCOVERY_PORTS:
+            address = f"{DISCOVERY_HOST}:{port}"
+            if address not in serials and _port_open(DISCOVERY_HOST, port):
+                serials.append(address)
+
+        self.serials = serials
+        return serials
+
+    def connect_all(self):
+        """
+        连接池中的所有设备，只保留连接成功的设备
+        :return: list [(序列号, 成功标志, 消息)]
+        """
+        status = []
+        self.managers = []
+        for serial in self.serials:
+            adb = ADBManager(serial, self.backend)
+            success, message = adb.connect()
+            if success:
+                self.managers.append(adb)
+            status.append((serial, success, message))
+        return status
+
+    def disconnect_all(self):
+        """断开池中所有设备"""
+        for adb in self.managers:
+            adb.disconnect()
+        self.managers = []
+
+    def run_jobs(self, packages, extractor_factory):
+        """
+        将包提取任务分发到各设备并行执行，每个设备同一时间处理一个包
+        :param packages: 包名列表
+        :param extractor_factory: 根据ADBManager创建ResourceExtractor的函数
+        :return: dict {包名: (成功标志, 提取结果详情)}，详情中 device 为执行设备、elapsed 为耗时秒数
+        """
+        jobs = queue.Queue()
+        for package_name in packages:
+            jobs.put(package_name)
+
+        results = {}
+        lock = threading.Lock()
+
+        def worker(adb):
+            # 一次查询解析该设备上所有包的安装目录，各任务不再单独扫描 /data/app
+            adb.list_packages()
+            extractor = extractor_factory(adb)
+            try:
+                while True:
+                    try:
+                        package_name = jobs.get_nowait()
+                    except queue.Empty:
+                        return
+
+                    start_time = time.time()
+                    try:
+                        success, detail = extractor.extract_package(package_name)
+                    except Exception as e:
+                        success, detail = False, {"package": package_name, "error": str(e)}
+                    detail["device"] = adb.device_address
+                    detail["elapsed"] = round(time.time() - start_time, 3)
+
+                    with lock:
+                        results[package_name] = (success, detail)
+            finally:
+                extractor.close()
+
+        threads = [threading.Thread(target=worker, args=(adb,), daemon=True) for adb in self.managers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results
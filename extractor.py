@@ -4,20 +4,90 @@
 """
 
 import os
-from adb_manager import ADBManager
-from config import EXPORT_DIR, PATHS, EXPORT_SUBDIRS
+import time
+from functools import partial
+from adb_manager import ADBManager, quote_path
+from config import (EXPORT_DIR, PATHS, EXPORT_SUBDIRS, PROTECTED_PULL_MODE, INCREMENTAL, DEVICE_TEMP_DIR,
+                    WATCH_INTERVAL, WATCH_CATEGORIES,
+                    MAX_CONCURRENT_TRANSFERS, DEDUP_STORE, DEVICE_HASH_SKIP, TRANSFER_COMPRESSION,
+                    CHUNKED_THRESHOLD_BYTES, APK_GLOBS, FILTERS, PIPELINE_STAGES, ORGANIZE_RULES, EXPORT_FORMAT,
+                    CATALOG_ENABLED, JOURNAL_ENABLED)
+from apk_remote import RemoteApk, ApkFormatError
+from archive_sink import ArchiveSink, STAGING_DIR
+from catalog import Catalog
+from chunked import ChunkedTransfer
+from compression import CompressionPolicy
+from dedup_store import ObjectStore
+from filters import rules_for, build_find_expression
+from journal import JobJournal
+from manifest import load_manifest, save_manifest, diff_files, update_category
+from organize_rules import CacheOrganizer, rule_for
+from pipeline import Pipeline, build_stages
+from scheduler import TransferScheduler
+from temp_names import is_temp_name
+from tracing import tracer
 
 
 class ResourceExtractor:
     """资源提取器类"""
 
-    def __init__(self, adb_manager):
+    def __init__(self, adb_manager, incremental=INCREMENTAL, max_concurrent=MAX_CONCURRENT_TRANSFERS,
+                 dedup=DEDUP_STORE, device_hash=DEVICE_HASH_SKIP, compression=TRANSFER_COMPRESSION,
+                 chunked_threshold=CHUNKED_THRESHOLD_BYTES, apk_globs=APK_GLOBS, filters=FILTERS,
+                 pipeline_stages=PIPELINE_STAGES, organize_rules=ORGANIZE_RULES, export_format=EXPORT_FORMAT,
+                 catalog=CATALOG_ENABLED, journal=JOURNAL_ENABLED, resume=False):
         """
         初始化提取器
         :param adb_manager: ADBManager实例
+        :param incremental: 是否增量提取（只拉取新增或变更的文件）
+        :param max_concurrent: 最大并发传输数，大于1时各类别并发提取并分片拉取
+        :param dedup: 是否将导出文件存入去重仓库
+        :param device_hash: 是否先在设备端计算哈希，仓库中已有的内容不再传输（需启用去重仓库）
+        :param compression: 传输压缩模式 "off"/"on"/"auto"
+        :param chunked_threshold: 不小于该大小的文件分块断点续传，0表示关闭
+        :param apk_globs: 非空时只从APK中提取匹配这些通配符的条目，不拉取整个安装目录
+        :param filters: 按类别的文件过滤规则 {类别名或 "*": 规则}
+        :param pipeline_stages: 后处理阶段名列表，文件落地后即交给这些阶段并行处理
+        :param organize_rules: 按包名的缓存整理规则，缓存文件在传输时直接写到整理后的路径
+        :param export_format: "files" 逐个文件导出 / "zip" 每个类别打包为一个不压缩的ZIP
+        :param catalog: 是否把导出的文件记录到SQLite索引（见 catalog.py）
+        :param journal: 是否记录任务日志（见 journal.py）
+        :param resume: 是否按任务日志续传：跳过已完成的包和类别，已落地且未变化的文件不再传输
         """
+        if export_format == "zip" and (incremental or dedup or device_hash or pipeline_stages or catalog or resume):
+            # 这些功能都需要逐个文件落地在导出目录中
+            print("警告: 打包导出不支持增量提取、去重仓库、设备端哈希、后处理流水线、文件索引和续传，已忽略这些选项")
+            incremental, dedup, device_hash, pipeline_stages, catalog, resume = False, False, False, [], False, False
         self.adb = adb_manager
         self.export_dir = EXPORT_DIR
+        self.incremental = incremental
+        self.scheduler = TransferScheduler(adb_manager, max_concurrent) if max_concurrent > 1 else None
+        self.store = ObjectStore() if dedup or device_hash else None
+        self.device_hash = device_hash
+        self.compression = CompressionPolicy(adb_manager, compression)
+        self.chunked_threshold = chunked_threshold
+        self.chunked = ChunkedTransfer(adb_manager) if chunked_threshold > 0 else None
+        self.apk_globs = list(apk_globs or [])
+        self.filters = filters or {}
+        self.pipeline_stages = list(pipeline_stages or [])
+        self.organize_rules = organize_rules or {}
+        self.export_format = export_format
+        self.catalog = Catalog() if catalog else None
+        # 续传依赖任务日志
+        self.journal = (journal or resume) and export_format != "zip"
+        self.resume = resume
+        self._sink = None
+        self._pipeline = None
+        # 文件落地回调，未启用流水线和文件索引时为None
+        self._on_file = None
+        self._package_name = None
+        self._pkg_export_dir = None
+        # 本次运行中直接由仓库对象生成的文件 {包内相对路径: 哈希}
+        self._known_digests = {}
+        self._manifest = None
+        self._journal = None
+        # 续传时上次提取的进度，见 JobJournal.load
+        self._resume_state = None
 
     def extract_package(self, package_name):
         """
@@ -32,6 +102,35 @@ class ResourceExtractor:
         pkg_export_dir = os.path.join(self.export_dir, package_name)
         os.makedirs(pkg_export_dir, exist_ok=True)
 
+        # 任务日志：续传时先重放上次的进度，上次已正常结束且各类别都成功的包直接跳过
+        self._journal, self._resume_state = None, None
+        if self.journal:
+            self._journal = JobJournal(package_name, self.export_dir)
+            if self.resume:
+                self._resume_state = self._journal.load()
+                self._resume_state["objects"] = ObjectStore.load_refs(pkg_export_dir) if self.store is not None else {}
+                done = self._resume_state["categories"]
+                if self._resume_state["finished"] and len(done) == 4 and all(r["success"] for r in done.values()):
+                    print("上次已完整提取，跳过")
+                    results = {"package": package_name, "export_dir": pkg_export_dir, "resumed": True}
+                    results.update(done)
+                    self._journal, self._resume_state = None, None
+                    return True, results
+            self._journal.open(self.resume)
+
+        # 打包导出时各类别先写入暂存目录（流式传输的文件直接写入ZIP）
+        work_dir = pkg_export_dir
+        if self.export_format == "zip":
+            work_dir = os.path.join(pkg_export_dir, STAGING_DIR)
+            self._sink = ArchiveSink(work_dir, pkg_export_dir)
+        self._pkg_export_dir = work_dir
+        self._package_name = package_name
+        self._known_digests = {}
+
+        # 增量模式读取上次的清单
+        if self.incremental:
+            self._manifest = load_manifest(pkg_export_dir)
+
         # 提取结果统计
         results = {
             "package": package_name,
@@ -42,32 +141,310 @@ class ResourceExtractor:
             "obb": {"success": False, "message": ""}
         }
 
-        # 1. 提取APK及lib (需要特殊处理路径)
-        print("\n[1/4] 提取APK及lib...")
-        results["app"] = self._extract_app_data(package_name, pkg_export_dir)
+        # 提取类别：APK及lib(需要特殊处理路径)、私有数据、外部存储数据、OBB数据包
+        categories = [
+            ("app", "提取APK及lib", self._extract_app_data),
+            ("data", "提取私有数据", self._extract_private_data),
+            ("sdcard_data", "提取外部存储数据", self._extract_sdcard_data),
+            ("obb", "提取OBB数据包", self._extract_obb)
+        ]
+
+        # 文件索引按版本号记录，增量提取只记录本次传输的文件，未变的沿用上一版本的记录；续传时保留已有记录
+        if self.catalog is not None:
+            self.catalog.begin(package_name, self._version_code(package_name),
+                               replace=not (self.incremental or self.resume))
+
+        # 后处理阶段与传输同时运行
+        self._start_pipeline(package_name, pkg_export_dir)
 
-        # 2. 提取私有数据
-        print("\n[2/4] 提取私有数据...")
-        results["data"] = self._extract_private_data(package_name, pkg_export_dir)
+        try:
+            if self.scheduler is not None:
+                # 各类别同时进行，分片传输共享同一个并发上限
+                print(f"\n并发提取 {len(categories)} 个类别 (最大并发传输数: {self.scheduler.max_workers})...")
+                tasks = [(key, partial(self._run_category, key, func, package_name, work_dir))
+                         for key, _, func in categories]
+                results.update(self.scheduler.run_categories(tasks))
+            else:
+                for index, (key, title, func) in enumerate(categories, 1):
+                    print(f"\n[{index}/{len(categories)}] {title}...")
+                    results[key] = self._run_category(key, func, package_name, work_dir)
+        except BaseException:
+            # 中断时日志保留已落地的文件，下次 --resume 继续
+            if self._journal is not None:
+                self._journal.close()
+            raise
+        finally:
+            if self._pipeline is not None:
+                results["pipeline"] = self._close_pipeline()
+            if self._sink is not None:
+                results["archive"] = self._close_sink()
+            self._on_file = None
 
-        # 3. 提取外部存储数据
-        print("\n[3/4] 提取外部存储数据...")
-        results["sdcard_data"] = self._extract_sdcard_data(package_name, pkg_export_dir)
+        if self.incremental:
+            save_manifest(pkg_export_dir, self._manifest)
+            self._manifest = None
 
-        # 4. 提取OBB数据包
-        print("\n[4/4] 提取OBB数据包...")
-        results["obb"] = self._extract_obb(package_name, pkg_export_dir)
+        if self.catalog is not None:
+            with tracer.span("catalog commit", "phase", package=package_name) as info:
+                info["files"] = self.catalog.finish(pkg_export_dir if self.incremental else None)
+            results["catalog"] = info["files"]
+            print(f"\n文件索引: 记录 {info['files']} 个文件 -> {self.catalog.path}")
+
+        # 导出文件入库去重
+        if self.store is not None:
+            with tracer.span("dedup ingest", "phase", package=package_name) as info:
+                stats = self.store.ingest_package(pkg_export_dir, self._known_digests)
+                info.update(stats)
+            print(f"\n去重入库: {stats['files']} 个文件, 新对象 {stats['ingested']} 个, "
+                  f"重复 {stats['deduped']} 个 (节省 {stats['saved_bytes']} 字节), 未变 {stats['skipped']} 个")
 
         # 统计成功数量
         success_count = sum(1 for v in results.values() if isinstance(v, dict) and v.get("success"))
         total_count = 4
 
+        if self._journal is not None:
+            self._journal.record_package(success_count)
+            self._journal.close()
+            self._journal, self._resume_state = None, None
+
         print("\n" + "=" * 60)
         print(f"提取完成: {success_count}/{total_count} 项成功")
         print(f"导出位置: {pkg_export_dir}")
 
         return success_count > 0, results
 
+    def mark_watch_start(self, package_name):
+        """
+        在设备上创建监视检查点，之后修改的文件都会被 watch_package(fresh=False) 捕获
+        在提取前调用，提取期间下载的文件也不会遗漏
+        :param package_name: 包名
+        """
+        self.adb.run_command(f"touch {quote_path(self._watch_marker(package_name))}")
+
+    def watch_package(self, package_name, interval=WATCH_INTERVAL, categories=WATCH_CATEGORIES, duration=None,
+                      fresh=True):
+        """
+        监视模式：每隔 interval 秒在设备端用一次 find -cnewer 找出比上次检查点更新的文件，只拉取这些增量
+        检查点是设备上的一个标记文件，按设备时钟比较，与主机时间无关；每轮只保存本轮的文件列表，
+        长时间运行内存占用不增长。按 Ctrl+C 停止
+        :param package_name: 包名
+        :param interval: 轮询间隔（秒）
+        :param categories: 监视的类别
+        :param duration: 监视时长（秒），None表示直到中断
+        :param fresh: 是否以当前时刻为起点，False时沿用 mark_watch_start 创建的检查点
+        :return: (bool, dict) 成功标志和统计信息 polls/files/failed
+        """
+        if self.export_format == "zip":
+            return False, {"message": "监视模式不支持打包导出"}
+
+        print(f"\n监视应用资源: {package_name} (间隔 {interval}s, 类别: {', '.join(categories)}, Ctrl+C 停止)")
+        print("=" * 60)
+        pkg_export_dir = os.path.join(self.export_dir, package_name)
+        os.makedirs(pkg_export_dir, exist_ok=True)
+        self._pkg_export_dir = pkg_export_dir
+        self._package_name = package_name
+        self._known_digests = {}
+
+        marker = self._watch_marker(package_name)
+        if fresh:
+            self.mark_watch_start(package_name)
+        targets = {category: (PATHS[category].format(pkg=package_name),
+                              os.path.join(pkg_export_dir, EXPORT_SUBDIRS[category]))
+                   for category in categories}
+        organizers = {category: self._load_organizer(category, remote_path)
+                      for category, (remote_path, _) in targets.items()}
+        # 上一轮传输失败的文件 {类别: {相对路径: 大小}}，下一轮重试
+        retry = {}
+        stats = {"polls": 0, "files": 0, "failed": 0}
+
+        if self.catalog is not None:
+            self.catalog.begin(package_name, self._version_code(package_name), replace=False)
+        self._start_pipeline(package_name, pkg_export_dir)
+        deadline = time.time() + duration if duration is not None else None
+        try:
+            while deadline is None or time.time() < deadline:
+                start_time = time.time()
+                with tracer.span("watch poll", "phase", package=package_name) as info:
+                    info["files"] = self._watch_poll(targets, organizers, marker, retry, stats)
+                stats["polls"] += 1
+                time.sleep(max(0.0, interval - (time.time() - start_time)))
+        except KeyboardInterrupt:
+            print("\n监视已停止")
+        finally:
+            self.adb.run_command(f"rm -f {quote_path(marker)} {quote_path(marker + '.next')}")
+            if self._pipeline is not None:
+                stats["pipeline"] = self._close_pipeline()
+            self._on_file = None
+            if self.catalog is not None:
+                stats["catalog"] = self.catalog.finish()
+
+        if self.store is not None:
+            ingest = self.store.ingest_package(pkg_export_dir, self._known_digests)
+            print(f"\n去重入库: {ingest['files']} 个文件, 新对象 {ingest['ingested']} 个")
+        print(f"\n监视结束: {stats['polls']} 轮, 拉取 {stats['files']} 个文件, 失败 {stats['failed']} 个")
+        return True, stats
+
+    def close(self):
+        """
+        结束使用提取器：关闭文件索引（写入剩余记录，结束后台哈希线程并关闭数据库连接）
+        """
+        if self.catalog is not None:
+            self.catalog.close()
+            self.catalog = None
+
+    def _watch_poll(self, targets, organizers, marker, retry, stats):
+        """
+        监视模式的一轮检查：先创建新检查点再查找比旧检查点更新的文件，传输完成后新检查点替换旧检查点
+        查找期间被修改的文件会在本轮和下一轮各拉取一次，不会遗漏
+        :param targets: {类别: (设备目录, 本地目录)}
+        :param organizers: {类别: CacheOrganizer或None}
+        :param marker: 设备上的检查点文件
+        :param retry: 需要重试的文件，传输失败的文件会写回
+        :param stats: 累计统计信息
+        :return: int 本轮拉取的文件数
+        """
+        next_marker = marker + ".next"
+        self.adb.run_command(f"touch {quote_path(next_marker)}")
+
+        pulled = 0
+        for category, (remote_path, local_path) in targets.items():
+            success, remote_files = self._list_files(category, remote_path, newer=marker)
+            if not success:
+                print(f"  {category}: 无法列出文件: {remote_files}")
+                continue
+            file_sizes = retry.pop(category, {})
+            file_sizes.update((p, size) for p, (size, _) in remote_files.items())
+            if not file_sizes:
+                continue
+
+            # 缓存映射本身更新后重新读取，新下载的缓存文件才能整理到正确位置
+            organizer = organizers.get(category)
+            if organizer is not None and organizer.rule["mapping"].strip('/') in file_sizes:
+                organizer = organizers[category] = self._load_organizer(category, remote_path)
+            remap = organizer.target if organizer is not None else None
+
+            success, message, failed = self._transfer_files(remote_path, file_sizes, local_path, remap)
+            if failed:
+                retry[category] = {p: file_sizes[p] for p in failed}
+            pulled += len(file_sizes) - len(failed)
+            stats["files"] += len(file_sizes) - len(failed)
+            stats["failed"] += len(failed)
+            print(f"  [{time.strftime('%H:%M:%S')}] {category}: {len(file_sizes) - len(failed)} 个新文件"
+                  + (f", {len(failed)} 个失败，下一轮重试" if failed else ""))
+
+        self.adb.run_command(f"mv -f {quote_path(next_marker)} {quote_path(marker)}")
+        return pulled
+
+    @staticmethod
+    def _watch_marker(package_name):
+        """
+        :param package_name: 包名
+        :return: str 设备上的监视检查点文件路径
+        """
+        return f"{DEVICE_TEMP_DIR}/adb_watch_{package_name}"
+
+    def _start_pipeline(self, package_name, pkg_export_dir):
+        """启用后处理时启动流水线；启用流水线、文件索引或任务日志时文件落地回调生效"""
+        if self.pipeline_stages:
+            self._pipeline = Pipeline(build_stages(self.pipeline_stages))
+            self._pipeline.start({"package": package_name, "export_dir": pkg_export_dir})
+        if self._pipeline is not None or self.catalog is not None or self._journal is not None:
+            self._on_file = self._file_arrived
+
+    def _version_code(self, package_name):
+        """
+        :param package_name: 包名
+        :return: int 已安装版本号，无法获取时为0
+        """
+        with tracer.span("version code", "phase", package=package_name):
+            success, version_code = self.adb.get_version_code(package_name)
+        if not success:
+            print(f"警告: {version_code}，文件索引按版本号 0 记录")
+            return 0
+        return version_code
+
+    def _close_pipeline(self):
+        """
+        等待后处理阶段处理完剩余的文件并打印统计
+        :return: dict 各阶段统计
+        """
+        with tracer.span("pipeline drain", "phase", package=self._package_name):
+            stats = self._pipeline.close()
+        self._pipeline = None
+
+        print("\n后处理:")
+        for name, stage_stats in stats.items():
+            print(f"  {name}: 处理 {stage_stats['processed']} 个, 产出 {stage_stats['emitted']} 个, "
+                  f"耗时 {stage_stats['busy']:.2f}s, 失败 {len(stage_stats['errors'])} 个")
+            for error in stage_stats["errors"][:3]:
+                print(f"    - {error}")
+        return stats
+
+    def _close_sink(self):
+        """
+        将暂存目录中的文件移入ZIP并完成各类别的ZIP
+        :return: dict 统计信息 files/bytes/archives
+        """
+        with tracer.span("archive finalize", "phase", package=self._package_name):
+            self._sink.absorb()
+            stats = self._sink.close()
+        self._sink = None
+
+        print(f"\n打包导出: {stats['files']} 个文件, {stats['bytes']} 字节")
+        for name, count in sorted(stats["archives"].items()):
+            print(f"  {name}.zip: {count} 个文件")
+        return stats
+
+    def _file_arrived(self, local_file):
+        """
+        文件落地回调：记录到任务日志和文件索引，并发布给后处理流水线
+        :param local_file: 本地文件路径
+        """
+        rel_path = os.path.relpath(local_file, self._pkg_export_dir).replace(os.sep, '/')
+        if self._journal is not None:
+            self._journal.record_file(rel_path, local_file)
+        if self.catalog is not None:
+            self.catalog.add(rel_path, local_file, self._known_digests.get(rel_path))
+        if self._pipeline is None:
+            return
+        self._pipeline.emit({
+            "source": "extract",
+            "package": self._package_name,
+            "category": rel_path.split('/', 1)[0],
+            "path": local_file,
+            "rel_path": rel_path
+        })
+
+    def _emit_tree(self, local_path):
+        """整体拉取（无逐文件回调）完成后，补发目录下所有文件的落地事件"""
+        if self._on_file is None:
+            return
+        for dirpath, _, filenames in os.walk(local_path):
+            for filename in filenames:
+                if not is_temp_name(filename):
+                    self._on_file(os.path.join(dirpath, filename))
+
+    def _run_category(self, key, func, package_name, export_dir):
+        """
+        执行单个类别的提取并记录耗时
+        :param key: 类别名
+        :param func: 类别提取方法
+        :param package_name: 包名
+        :param export_dir: 导出根目录
+        :return: dict 提取结果
+        """
+        done = self._resume_state["categories"].get(key) if self._resume_state is not None else None
+        if done is not None and done["success"]:
+            print(f"  {key}: 上次已完成，跳过")
+            return dict(done)
+
+        with tracer.span(f"category {key}", "phase", package=package_name) as info:
+            result = func(package_name, export_dir)
+            info["exit_code"] = 0 if result.get("success") else 1
+        if self._journal is not None:
+            self._journal.record_category(key, result)
+        return result
+
     def _extract_app_data(self, package_name, export_dir):
         """
         提取APK及lib (/data/app/{包名}-xxx/)
@@ -76,7 +453,8 @@ class ResourceExtractor:
         :return: dict 提取结果
         """
         # 查找实际路径
-        success, app_path = self.adb.find_app_path(package_name)
+        with tracer.span("find_app_path", "phase", package=package_name):
+            success, app_path = self.adb.find_app_path(package_name)
 
         if not success:
             return {"success": False, "message": f"未找到应用: {package_name}"}
@@ -85,13 +463,54 @@ class ResourceExtractor:
         local_path = os.path.join(export_dir, EXPORT_SUBDIRS["app"])
 
         # 拉取文件
-        success, message = self.adb.pull(app_path, local_path)
+        if self.apk_globs:
+            success, message = self._extract_apk_entries(app_path, local_path)
+        else:
+            success, message = self._pull("app", app_path, local_path)
 
         if success:
             return {"success": True, "message": f"成功: {app_path}"}
         else:
             return {"success": False, "message": message}
 
+    def _extract_apk_entries(self, app_path, local_path):
+        """
+        只提取安装目录中各APK内匹配通配符的条目，条目保存到 app/{APK名}/ 下
+        :param app_path: 设备上的安装目录
+        :param local_path: 本地保存路径
+        :return: (bool, str) 成功标志和消息
+        """
+        success, remote_files = self.adb.list_files(app_path)
+        if not success:
+            return False, remote_files
+        apks = sorted((p, size) for p, (size, _) in remote_files.items() if p.endswith(".apk"))
+        if not apks:
+            return False, f"未找到APK: {app_path}"
+
+        errors, files, read_bytes = [], 0, 0
+        for rel_path, size in apks:
+            remote_apk = RemoteApk(self.adb, f"{app_path.rstrip('/')}/{rel_path}", size)
+            with tracer.span("apk entries", "phase", apk=rel_path) as info:
+                try:
+                    apk_dir = os.path.join(local_path, rel_path[:-4])
+                    stats = remote_apk.extract(self.apk_globs, apk_dir)
+                except ApkFormatError as e:
+                    errors.append(f"{rel_path}: {str(e)}")
+                    info["exit_code"] = 1
+                    continue
+                info["bytes"] = stats["bytes_read"]
+
+            print(f"  {rel_path}: 匹配 {stats['matched']}/{stats['entries']} 个条目, 解压 {stats['bytes']} 字节, "
+                  f"读取 {stats['bytes_read']}/{size} 字节")
+            self._emit_tree(apk_dir)
+            errors.extend(f"{rel_path}: {error}" for error in stats["errors"])
+            files += stats["files"]
+            read_bytes += stats["bytes_read"]
+
+        if errors:
+            return False, f"{len(errors)} 个APK条目提取失败: {errors[0]}"
+        return True, f"APK选择性提取: {files} 个条目 (读取 {read_bytes} 字节)"
+
     def _extract_private_data(self, package_name, export_dir):
         """
         提取私有数据 (/data/data/{包名}/)
@@ -107,7 +526,7 @@ class ResourceExtractor:
             return {"success": False, "message": f"路径不存在: {remote_path}"}
 
         # 拉取文件
-        success, message = self.adb.pull(remote_path, local_path)
+        success, message = self._pull("data", remote_path, local_path)
 
         if success:
             return {"success": True, "message": f"成功: {remote_path}"}
@@ -129,7 +548,7 @@ class ResourceExtractor:
             return {"success": False, "message": f"路径不存在: {remote_path}"}
 
         # 拉取文件
-        success, message = self.adb.pull(remote_path, local_path)
+        success, message = self._pull("sdcard_data", remote_path, local_path)
 
         if success:
             return {"success": True, "message": f"成功: {remote_path}"}
@@ -151,9 +570,342 @@ class ResourceExtractor:
             return {"success": False, "message": f"路径不存在: {remote_path}"}
 
         # 拉取文件
-        success, message = self.adb.pull(remote_path, local_path)
+        success, message = self._pull("obb", remote_path, local_path)
 
         if success:
             return {"success": True, "message": f"成功: {remote_path}"}
         else:
             return {"success": False, "message": message}
+
+    def _pull(self, category, remote_path, local_path):
+        """
+        按当前模式拉取一个类别的目录
+        :param category: 提取类别 (app/data/sdcard_data/obb)
+        :param remote_path: 设备上的路径
+        :param local_path: 本地保存路径
+        :return: (bool, str) 成功标志和消息
+        """
+        organizer = self._load_organizer(category, remote_path)
+        remap = organizer.target if organizer is not None else None
+        if self.incremental:
+            return self._pull_incremental(category, remote_path, local_path, organizer)
+        if self._resume_state is not None:
+            return self._pull_resume(category, remote_path, local_path, organizer)
+        # OBB和APK可能有数GB，需要先列出文件才能挑出大文件分块传输
+        chunked = self.chunked is not None and category in ("app", "obb")
+        # 有过滤规则时必须按文件列表传输，整体拉取会带上被过滤的文件
+        filtered = rules_for(self.filters, category) is not None
+        if self.scheduler is not None or self.device_hash or chunked or filtered:
+            success, remote_files = self._list_files(category, remote_path)
+            if success:
+                file_sizes = {p: size for p, (size, _) in remote_files.items()}
+                success, message, _ = self._transfer_category(category, remote_path, file_sizes, local_path,
+                                                              organizer)
+                return success, message
+            if filtered:
+                return False, remote_files
+            print(f"  无法列出文件，改为整体拉取: {remote_files}")
+        if category in ("app", "data"):
+            return self._pull_protected(remote_path, local_path, organizer)
+        success, message = self.adb.pull(remote_path, local_path)
+        if success:
+            self._relocate_tree(local_path, organizer)
+        return success, message
+
+    def _load_organizer(self, category, remote_path):
+        """
+        包为该类别配置了整理规则时，先从设备读取缓存映射
+        :param category: 提取类别
+        :param remote_path: 设备上的类别目录
+        :return: CacheOrganizer，未配置或映射读取失败时返回None（按原路径保存）
+        """
+        rule = rule_for(self._package_name, self.organize_rules)
+        if not rule or rule.get("category") != category:
+            return None
+
+        organizer = CacheOrganizer(rule, self._pkg_export_dir)
+        with tracer.span("organize mapping", "phase", package=self._package_name) as info:
+            success, message = organizer.load(self.adb, remote_path)
+            info["exit_code"] = 0 if success else 1
+        if not success:
+            print(f"  无法读取缓存映射，按原路径保存: {message}")
+            return None
+        print(f"  边传输边整理: {message}")
+        return organizer
+
+    def _relocate_tree(self, local_path, organizer):
+        """整体拉取完成后，把映射中的缓存文件移动到整理后的路径，并补发落地事件"""
+        moved = organizer.relocate(local_path) if organizer is not None else []
+        self._emit_tree(local_path)
+        if self._on_file is not None:
+            for target in moved:
+                self._on_file(target)
+
+    @staticmethod
+    def _local_file(local_path, rel_path, remap=None):
+        """
+        :param local_path: 本地类别目录
+        :param rel_path: 类别内的相对路径
+        :param remap: 路径映射函数，返回None时按原路径保存
+        :return: str 文件的本地保存路径
+        """
+        return (remap and remap(rel_path)) or os.path.join(local_path, rel_path)
+
+    def _pull_incremental(self, category, remote_path, local_path, organizer=None):
+        """
+        增量拉取：一次find/stat生成远端清单，与本地清单对比后只传输新增或变更的文件
+        :param category: 提取类别
+        :param remote_path: 设备上的路径
+        :param local_path: 本地保存路径
+        :param organizer: 类别的CacheOrganizer，为None时按原路径保存
+        :return: (bool, str) 成功标志和消息
+        """
+        remap = organizer.target if organizer is not None else None
+        success, remote_files = self._list_files(category, remote_path)
+        if not success:
+            return False, remote_files
+
+        entry = self._manifest["categories"].get(category, {})
+        changed, deleted = diff_files(entry.get("files", {}), remote_files, local_path, remap)
+        pending = {p: remote_files[p][0] for p in changed}
+        if self._resume_state is not None:
+            # 清单在提取结束时才保存，中断前已落地的文件由任务日志识别
+            pending = self._skip_landed({p: remote_files[p] for p in changed}, local_path, remap)
+
+        success, message, failed = self._transfer_category(category, remote_path, pending, local_path, organizer)
+        if failed:
+            # 传输失败的文件不写入清单，下次运行时重新拉取
+            failed = set(failed)
+            remote_files = {p: v for p, v in remote_files.items() if p not in failed}
+
+        update_category(self._manifest, category, remote_path, remote_files, deleted)
+        if not success:
+            return False, message
+
+        unchanged = len(remote_files) - len(changed)
+        message = f"增量拉取: 传输 {len(pending)} 个, 未变 {unchanged} 个, 删除 {len(deleted)} 个"
+        if len(pending) < len(changed):
+            message += f", 续传跳过 {len(changed) - len(pending)} 个"
+        print(f"  {message}")
+        return True, message
+
+    def _pull_resume(self, category, remote_path, local_path, organizer=None):
+        """
+        续传：列出远端文件，跳过任务日志中已落地且本地文件未变化的文件，只传输其余文件
+        :param category: 提取类别
+        :param remote_path: 设备上的路径
+        :param local_path: 本地保存路径
+        :param organizer: 类别的CacheOrganizer，为None时按原路径保存
+        :return: (bool, str) 成功标志和消息
+        """
+        success, remote_files = self._list_files(category, remote_path)
+        if not success:
+            return False, remote_files
+
+        remap = organizer.target if organizer is not None else None
+        pending = self._skip_landed(remote_files, local_path, remap)
+        success, message, _ = self._transfer_category(category, remote_path, pending, local_path, organizer)
+        if not success:
+            return False, message
+
+        message = f"续传: 传输 {len(pending)} 个, 已落地跳过 {len(remote_files) - len(pending)} 个"
+        print(f"  {message}")
+        return True, message
+
+    def _skip_landed(self, remote_files, local_path, remap=None):
+        """
+        找出尚未完整落地的文件：任务日志中没有记录、记录的大小或修改时间与远端不同、
+        或本地文件缺失/已变化（如写到一半）时都需要重新传输
+        去重入库后本地文件是仓库对象的链接，修改时间随对象变化，此时按 .objects.json 的记录核对
+        :param remote_files: {相对路径: (大小, 修改时间)}
+        :param local_path: 本地类别目录
+        :param remap: 路径映射函数
+        :return: dict 需要传输的 {相对路径: 大小}
+        """
+        landed = self._resume_state["files"]
+        objects = self._resume_state.get("objects", {})
+        pending = {}
+        for rel_path, (size, mtime) in remote_files.items():
+            local_file = self._local_file(local_path, rel_path, remap)
+            key = os.path.relpath(local_file, self._pkg_export_dir).replace(os.sep, '/')
+            if landed.get(key) == (size, mtime):
+                try:
+                    stat = os.stat(local_file)
+                    if stat.st_size == size and int(stat.st_mtime) == mtime:
+                        continue
+                    ref = objects.get(key)
+                    if (ref and ref[1:] == [size, int(stat.st_mtime)] and self.store.has(ref[0])
+                            and os.path.samefile(local_file, self.store.object_path(ref[0]))):
+                        continue
+                except OSError:
+                    pass
+            pending[rel_path] = size
+        return pending
+
+    def _list_files(self, category, remote_path, newer=None):
+        """
+        列出类别目录下需要提取的文件，过滤规则在设备端 find 中执行
+        :param category: 提取类别
+        :param remote_path: 设备上的路径
+        :param newer: 设备上的检查点文件，只列出比它更新的文件
+        :return: (bool, dict|str) 成功标志和 {相对路径: (大小, 修改时间)}
+        """
+        rule = rules_for(self.filters, category)
+        expression = build_find_expression(remote_path.rstrip('/') or '/', rule)
+        if newer is not None:
+            # 按状态改变时间比较：保留原修改时间写入的文件（如解压、cp -p）mtime 可能早于检查点
+            expression += f" -cnewer {quote_path(newer)}"
+        return self.adb.list_files(remote_path, expression)
+
+    def _transfer_category(self, category, remote_path, file_sizes, local_path, organizer=None):
+        """
+        按文件列表拉取一个类别；受保护类别（app/data）的 su tar -T 流失败时，只重试失败的文件：
+        先按同一文件列表经/sdcard中转流式拉取，仍失败的再逐个经/sdcard中转拉取
+        重试始终限于文件列表，不整体拉取目录（过滤规则和增量/续传的待传文件都只体现在列表中）
+        :param category: 提取类别
+        :param remote_path: 设备上的目录路径
+        :param file_sizes: {相对路径: 大小}
+        :param local_path: 本地保存路径
+        :param organizer: 类别的CacheOrganizer，为None时按原路径保存
+        :return: (bool, str, list) 是否全部成功、消息、失败的相对路径
+        """
+        remap = organizer.target if organizer is not None else None
+        success, message, failed = self._transfer_files(remote_path, file_sizes, local_path, remap)
+        if not failed or category not in ("app", "data"):
+            return success, message, failed
+
+        print(f"  {len(failed)} 个文件拉取失败，按文件列表经中转目录重试: {message}")
+        retried = len(failed)
+        success, message, failed = self.adb.pull_files_staged(remote_path, failed, local_path, False,
+                                                              self._on_file, remap, self._sink)
+        if not failed:
+            return True, f"拉取成功: {remote_path} ({retried} 个文件经中转重试)", []
+
+        print(f"  {len(failed)} 个文件中转拉取失败，逐个重试: {message}")
+        still_failed = []
+        for rel_path in failed:
+            local_file = self._local_file(local_path, rel_path, remap)
+            success, message = self.adb.pull(f"{remote_path.rstrip('/')}/{rel_path}", local_file)
+            if not success:
+                still_failed.append(rel_path)
+            elif self._on_file is not None:
+                self._on_file(local_file)
+        if still_failed:
+            return False, f"{len(still_failed)} 个文件拉取失败: {message}", still_failed
+        return True, f"拉取成功: {remote_path} ({retried} 个文件经中转重试)", []
+
+    def _transfer_files(self, remote_path, file_sizes, local_path, remap=None):
+        """
+        拉取目录下的指定文件，启用调度器时分片并发传输
+        :param remote_path: 设备上的目录路径
+        :param file_sizes: {相对路径: 大小}
+        :param local_path: 本地保存路径
+        :param remap: 路径映射函数，见 tar_stream.extract_tar_stream
+        :return: (bool, str, list) 是否全部成功、消息、失败的相对路径
+        """
+        if self.device_hash and file_sizes:
+            file_sizes = self._link_known_content(remote_path, file_sizes, local_path, remap)
+
+        results = []
+        if self.chunked is not None:
+            large = {p: size for p, size in file_sizes.items() if size >= self.chunked_threshold}
+            if large:
+                file_sizes = {p: size for p, size in file_sizes.items() if p not in large}
+                results.extend(self._pull_chunked(remote_path, sorted(large), local_path, remap))
+
+        # 文本类文件压缩传输，已压缩格式原样传输
+        compressible, plain = self.compression.split(remote_path, file_sizes)
+        groups = [(group, compress) for group, compress in ((compressible, True), (plain, False)) if group]
+        if not groups and not results:
+            return True, f"无需拉取: {remote_path}", []
+
+        for group, compress in groups:
+            if self.scheduler is not None:
+                results.append(self.scheduler.pull_sharded(remote_path, group, local_path, compress,
+                                                           self._on_file, remap, self._sink))
+            else:
+                results.append(self.adb.pull_files(remote_path, list(group), local_path, compress,
+                                                   self._on_file, remap, self._sink))
+
+        failed = [p for _, _, group_failed in results for p in group_failed]
+        messages = [message for _, message, _ in results]
+        if compressible:
+            messages.append(f"压缩传输 {len(compressible)} 个文件")
+        return all(success for success, _, _ in results), "; ".join(messages), failed
+
+    def _pull_chunked(self, remote_path, rel_paths, local_path, remap=None):
+        """
+        逐个分块拉取大文件（每个文件内部多块并行）
+        :param remote_path: 设备上的目录路径
+        :param rel_paths: 大文件的相对路径列表
+        :param local_path: 本地保存路径
+        :param remap: 路径映射函数，见 tar_stream.extract_tar_stream
+        :return: list [(成功标志, 消息, 失败的相对路径)]
+        """
+        results = []
+        for rel_path in rel_paths:
+            remote_file = f"{remote_path.rstrip('/')}/{rel_path}"
+            local_file = self._local_file(local_path, rel_path, remap)
+            success, message = self.chunked.pull_file(remote_file, local_file)
+            print(f"  {message}")
+            if success and self._on_file is not None:
+                self._on_file(local_file)
+            results.append((success, message, [] if success else [rel_path]))
+        return results
+
+    def _pull_protected(self, remote_path, local_path, organizer=None):
+        """
+        拉取受保护路径，默认使用tar流式拉取，失败时回退到/sdcard中转方式
+        :param remote_path: 设备上的路径
+        :param local_path: 本地保存路径
+        :param organizer: 类别的CacheOrganizer，为None时按原路径保存
+        :return: (bool, str) 成功标志和消息
+        """
+        if PROTECTED_PULL_MODE == "stream":
+            success, message = self.adb.pull_stream(remote_path, local_path, self.compression.enabled(),
+                                                    self._on_file, organizer.target if organizer else None,
+                                                    self._sink)
+            if success:
+                return success, message
+            print(f"  流式拉取失败，回退到中转方式: {message}")
+
+        success, message = self.adb.pull(remote_path, local_path)
+        if success:
+            self._relocate_tree(local_path, organizer)
+        return success, message
+
+    def _link_known_content(self, remote_path, file_sizes, local_path, remap=None):
+        """
+        设备端批量计算哈希，仓库中已有的内容直接链接到本地，不经过adb传输
+        :param remote_path: 设备上的目录路径
+        :param file_sizes: {相对路径: 大小}
+        :param local_path: 本地保存路径
+        :param remap: 路径映射函数，见 tar_stream.extract_tar_stream
+        :return: dict 仍需传输的 {相对路径: 大小}
+        """
+        with tracer.span("device hash", "phase", remote_path=remote_path, files=len(file_sizes)):
+            success, digests = self.adb.hash_files(remote_path, list(file_sizes), self.store.algorithm)
+        if not success:
+            print(f"  设备端哈希失败，全部传输: {digests}")
+            return file_sizes
+
+        remaining = {}
+        linked_bytes = 0
+        for rel_path, size in file_sizes.items():
+            digest = digests.get(rel_path)
+            if digest is None or not self.store.has(digest):
+                remaining[rel_path] = size
+                continue
+
+            target = self._local_file(local_path, rel_path, remap)
+            self.store.materialize(digest, target)
+            pkg_rel_path = os.path.relpath(target, self._pkg_export_dir).replace(os.sep, '/')
+            self._known_digests[pkg_rel_path] = digest
+            if self._on_file is not None:
+                self._on_file(target)
+            linked_bytes += size
+
+        skipped = len(file_sizes) - len(remaining)
+        if skipped:
+            print(f"  设备端哈希命中: {skipped} 个文件 ({linked_bytes} 字节) 直接取自去重仓库")
+        return remaining
@@ -0,0 +1,75 @@
+"""
+文件链接模块 - 在目标位置生成源文件而尽量不占用额外空间
+依次尝试reflink（写时复制克隆）、硬链接，均不可用时复制；去重仓库、后处理整理阶段和缓存整理脚本共用
+"""
+
+import os
+import shutil
+import sys
+from temp_names import temp_name
+
+# Linux FICLONE ioctl 请求码
+FICLONE = 0x40049409
+
+# 链接方式: auto(reflink→硬链接→复制) / reflink / hardlink / copy，前三者均失败时复制
+LINK_MODES = ("auto", "reflink", "hardlink", "copy")
+
+
+def reflink(source, target):
+    """
+    尝试以reflink方式复制文件（保留源文件的修改时间），目前仅支持Linux (btrfs/xfs等)
+    :param source: 源文件
+    :param target: 目标文件（不存在）
+    :return: bool 是否成功
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        import fcntl
+        with open(source, 'rb') as src, open(target, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        shutil.copystat(source, target)
+        return True
+    except (OSError, ImportError):
+        if os.path.exists(target):
+            os.remove(target)
+        return False
+
+
+def link_file(source, target, link_mode="auto"):
+    """
+    按链接方式在目标路径（不存在）生成源文件
+    :param source: 源文件
+    :param target: 目标文件
+    :param link_mode: LINK_MODES 之一
+    :return: str 实际使用的方式 reflink/hardlink/copy
+    """
+    if link_mode in ("reflink", "auto") and reflink(source, target):
+        return "reflink"
+    if link_mode in ("hardlink", "auto"):
+        try:
+            os.link(source, target)
+            return "hardlink"
+        except OSError:
+            # 跨分区或文件系统不支持硬链接
+            pass
+    shutil.copy2(source, target)
+    return "copy"
+
+
+def place_file(source, target, link_mode="auto"):
+    """
+    在目标位置生成源文件，目标已存在时替换（先写临时文件再改名，不会留下写到一半的文件）
+    :param source: 源文件
+    :param target: 目标文件
+    :param link_mode: LINK_MODES 之一
+    :return: str 实际使用的方式，目标已是源文件的硬链接时为None
+    """
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    # 已是同一文件的硬链接（同一inode间rename不生效，会留下临时文件）
+    if os.path.exists(target) and os.path.samefile(source, target):
+        return None
+    temp_target = temp_name(target, "tmp", unique=True)
+    method = link_file(source, temp_target, link_mode)
+    os.replace(temp_target, target)
+    return method
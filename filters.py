@@ -0,0 +1,147 @@
+"""
+文件过滤模块 - 按类别的包含/排除规则及大小、时间限制
+规则编译为设备端 find 表达式，在生成文件列表时即完成过滤，被过滤的文件不会被中转或传输
+
+规则格式（config.FILTERS 或命令行）:
+  {
+      "include": ["files/*", "*.json"],      # 只保留匹配的文件，为空表示全部
+      "exclude": ["cache/", "*.log"],        # 排除匹配的文件；以 / 结尾的目录整体跳过，不再遍历
+      "max_size": 50 * 1024 * 1024,          # 只保留不超过该大小的文件（字节）
+      "max_age_days": 30                     # 只保留最近N天内修改过的文件
+  }
+通配符不含 / 时按文件名匹配（任意层级），含 / 时按相对于类别目录的路径匹配
+以 / 结尾的目录规则同样相对于类别目录：cache/ 只排除顶层的 cache 目录，任意层级的同名目录写作 **/cache/
+"""
+
+from adb_manager import quote_path
+
+# 各类别共用的规则键名
+ALL_CATEGORIES = "*"
+
+SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(text):
+    """
+    解析带单位的大小
+    :param text: 如 "50M"、"512K"、"1024"
+    :return: int 字节数
+    """
+    text = str(text).strip().upper().rstrip("B")
+    if text and text[-1] in SIZE_UNITS:
+        return int(float(text[:-1]) * SIZE_UNITS[text[-1]])
+    return int(float(text))
+
+
+def merge_rules(*rules):
+    """
+    合并多组规则：include/exclude 取并集，大小和时间限制取更严格的值
+    :param rules: 规则字典
+    :return: dict 合并后的规则
+    """
+    merged = {"include": [], "exclude": []}
+    for rule in rules:
+        if not rule:
+            continue
+        merged["include"] += [p for p in rule.get("include", []) if p not in merged["include"]]
+        merged["exclude"] += [p for p in rule.get("exclude", []) if p not in merged["exclude"]]
+        for key in ("max_size", "max_age_days"):
+            if rule.get(key) is not None:
+                merged[key] = min(merged.get(key, rule[key]), rule[key])
+    return merged
+
+
+def rules_for(filters, category):
+    """
+    取出某个类别生效的规则（通用规则与类别规则合并）
+    :param filters: {类别名或 "*": 规则}
+    :param category: 类别名
+    :return: dict 规则，无任何限制时返回None
+    """
+    rule = merge_rules(filters.get(ALL_CATEGORIES), filters.get(category))
+    if rule["include"] or rule["exclude"] or "max_size" in rule or "max_age_days" in rule:
+        return rule
+    return None
+
+
+def parse_cli_rules(includes=None, excludes=None, max_size=None, max_age_days=None):
+    """
+    将命令行参数转换为规则，通配符可用 "类别:" 前缀限定类别，如 data:cache/
+    :param includes: 包含通配符列表
+    :param excludes: 排除通配符列表
+    :param max_size: 大小上限，如 "50M"
+    :param max_age_days: 修改时间天数上限
+    :return: dict {类别名或 "*": 规则}
+    """
+    filters = {}
+
+    def add(key, pattern):
+        category, sep, glob = pattern.partition(":")
+        if not sep or "/" in category or "*" in category:
+            category, glob = ALL_CATEGORIES, pattern
+        filters.setdefault(category, {}).setdefault(key, []).append(glob)
+
+    for pattern in includes or []:
+        add("include", pattern)
+    for pattern in excludes or []:
+        add("exclude", pattern)
+    if max_size is not None:
+        filters.setdefault(ALL_CATEGORIES, {})["max_size"] = parse_size(max_size)
+    if max_age_days is not None:
+        filters.setdefault(ALL_CATEGORIES, {})["max_age_days"] = float(max_age_days)
+    return filters
+
+
+def merge_filters(*filter_sets):
+    """
+    按类别合并多组过滤配置（如 config.FILTERS 与命令行规则）
+    :param filter_sets: {类别名或 "*": 规则}
+    :return: dict 合并后的过滤配置
+    """
+    merged = {}
+    for filters in filter_sets:
+        for category, rule in (filters or {}).items():
+            merged[category] = merge_rules(merged.get(category), rule)
+    return merged
+
+
+def build_find_expression(remote_dir, rule):
+    """
+    将规则编译为 find 表达式（用于 find "目录" <表达式> -exec ...）
+    :param remote_dir: 设备上的类别目录（不带末尾斜杠）
+    :param rule: 规则，为None时只筛选普通文件
+    :return: str find 表达式
+    """
+    if not rule:
+        return "-type f"
+
+    def match(pattern):
+        pattern = pattern.rstrip("/")
+        if "/" in pattern:
+            return f"-path {quote_path(f'{remote_dir}/{pattern}')}"
+        return f"-name {quote_path(pattern)}"
+
+    def match_dir(pattern):
+        pattern = pattern.rstrip("/")
+        if pattern.startswith("**/") and "/" not in pattern[3:]:
+            return f"-name {quote_path(pattern[3:])}"
+        return f"-path {quote_path(f'{remote_dir}/{pattern}')}"
+
+    parts = []
+    # 以 / 结尾的排除规则视为目录：整体剪枝，不遍历其内容
+    pruned = [p for p in rule.get("exclude", []) if p.endswith("/")]
+    if pruned:
+        parts.append(r"\( " + " -o ".join(match_dir(p) for p in pruned) + r" \) -prune -o")
+
+    parts.append("-type f")
+    includes = rule.get("include", [])
+    if includes:
+        parts.append(r"\( " + " -o ".join(match(p) for p in includes) + r" \)")
+    for pattern in rule.get("exclude", []):
+        if not pattern.endswith("/"):
+            parts.append(f"! {match(pattern)}")
+    if rule.get("max_size") is not None:
+        parts.append(f"-size -{int(rule['max_size']) + 1}c")
+    if rule.get("max_age_days") is not None:
+        parts.append(f"-mmin -{max(1, int(rule['max_age_days'] * 1440))}")
+    return " ".join(parts)
@@ -2,102 +2,214 @@
 # -*- coding: utf-8 -*-
 """
 批量解包 organized 目录下的所有 ktx2 文件为 png 格式
+使用进程池并行调用 ktx extract；png 比 ktx2 新，或 ktx2 内容哈希与上次转换记录一致时跳过
+转换记录保存在 {目录}/ktx2_manifest.json，失败列表写入 JSON 报告
 """
 
+import argparse
+import hashlib
+import json
 import os
 import subprocess
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
-def find_ktx2_files(root_dir):
-    """递归查找所有 .ktx2 文件"""
-    ktx2_files = []
+MANIFEST_NAME = 'ktx2_manifest.json'
+REPORT_NAME = 'ktx2_failures.json'
+
+# 每个工作进程最多排队的任务数，避免一次性提交全部文件
+QUEUE_PER_WORKER = 4
+
+# 每完成多少个文件保存一次转换记录，中断后已完成的部分不必重做
+SAVE_INTERVAL = 1000
+
+
+def iter_ktx2_files(root_dir):
+    """边遍历边产出 .ktx2 文件路径，不预先生成完整列表"""
     for dirpath, dirnames, filenames in os.walk(root_dir):
         for filename in filenames:
             if filename.endswith('.ktx2'):
-                full_path = os.path.join(dirpath, filename)
-                ktx2_files.append(full_path)
-    return ktx2_files
+                yield os.path.join(dirpath, filename)
+
 
-def extract_ktx2_to_png(ktx2_path):
-    """将单个 ktx2 文件解包为 png"""
+def file_sha1(path):
+    """计算文件的 sha1"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_ktx2_to_png(ktx2_path, recorded_hash=None):
+    """
+    将单个 ktx2 文件解包为 png（在工作进程中执行）
+    png 已存在且源文件哈希与记录一致时跳过
+    """
     # 生成输出路径：将 .ktx2 替换为 .png
     png_path = ktx2_path[:-5] + '.png'
 
-    # 调用 ktx extract 命令
-    cmd = ['ktx', 'extract', ktx2_path, png_path]
-
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=False
-        )
-
-        # 返回结果
+        source_hash = file_sha1(ktx2_path)
+        if recorded_hash == source_hash and os.path.exists(png_path):
+            return {'success': True, 'skipped': True, 'hash': source_hash, 'output_file': png_path}
+
+        # 调用 ktx extract 命令，先写临时文件，成功后再替换，中断或失败时不会留下被当作最新的半个 png
+        temp_path = f'{png_path[:-4]}.{os.getpid()}.tmp.png'
+        try:
+            result = subprocess.run(
+                ['ktx', 'extract', ktx2_path, temp_path],
+                capture_output=True,
+                text=True,
+                check=False
+            )
+            if result.returncode == 0:
+                os.replace(temp_path, png_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
         return {
             'success': result.returncode == 0,
-            'stdout': result.stdout,
+            'skipped': False,
+            'hash': source_hash,
             'stderr': result.stderr,
             'output_file': png_path
         }
     except Exception as e:
         return {
             'success': False,
+            'skipped': False,
             'error': str(e),
             'output_file': png_path
         }
 
-def main():
-    """主函数"""
-    root_dir = 'organized'
 
-    print(f"开始扫描 {root_dir} 目录...")
+def is_up_to_date(ktx2_path):
+    """png 比 ktx2 新时无需转换（不必计算哈希）"""
+    png_path = ktx2_path[:-5] + '.png'
+    try:
+        return os.path.getmtime(png_path) >= os.path.getmtime(ktx2_path)
+    except OSError:
+        return False
+
 
-    # 查找所有 ktx2 文件
-    ktx2_files = find_ktx2_files(root_dir)
-    total_files = len(ktx2_files)
+def load_json(path, default):
+    """读取JSON文件，不存在或损坏时返回默认值"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
 
-    print(f"找到 {total_files} 个 .ktx2 文件\n")
 
-    if total_files == 0:
-        print("未找到任何 .ktx2 文件")
-        return
+def save_json(path, data):
+    """先写临时文件再替换，避免中断时损坏"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, path)
 
-    # 统计信息
-    success_count = 0
-    failed_files = []
 
-    # 批量处理
-    for idx, ktx2_file in enumerate(ktx2_files, 1):
-        print(f"[{idx}/{total_files}] 处理: {ktx2_file}")
+def parse_args():
+    parser = argparse.ArgumentParser(description='批量将 ktx2 纹理解包为 png')
+    parser.add_argument('root_dir', nargs='?', default='organized', help='扫描目录，默认 organized')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='并行进程数，默认为CPU核心数')
+    parser.add_argument('--force', action='store_true', help='忽略已有输出和转换记录，全部重新转换')
+    parser.add_argument('--report', help=f'失败报告路径，默认 {{目录}}/{REPORT_NAME}')
+    return parser.parse_args()
 
-        result = extract_ktx2_to_png(ktx2_file)
 
+def main():
+    """主函数"""
+    args = parse_args()
+    root_dir = args.root_dir
+    manifest_path = os.path.join(root_dir, MANIFEST_NAME)
+    report_path = args.report or os.path.join(root_dir, REPORT_NAME)
+
+    if not os.path.isdir(root_dir):
+        print(f"目录不存在: {root_dir}")
+        return 1
+
+    print(f"开始扫描 {root_dir} 目录，使用 {args.workers} 个进程...")
+
+    # 转换记录 {相对路径: ktx2 的 sha1}
+    manifest = {} if args.force else load_json(manifest_path, {})
+
+    stats = {'total': 0, 'converted': 0, 'skipped': 0, 'failed': 0}
+    failures = []
+    start_time = time.time()
+    max_pending = args.workers * QUEUE_PER_WORKER
+
+    def count(key):
+        # 计数与定期保存放在一起，遍历时直接跳过的文件同样计入保存间隔
+        stats[key] += 1
+        done = stats['converted'] + stats['skipped'] + stats['failed']
+        if done % SAVE_INTERVAL == 0:
+            save_json(manifest_path, manifest)
+            print(f"已处理 {done} 个 (转换 {stats['converted']}, 跳过 {stats['skipped']}, "
+                  f"失败 {stats['failed']}) ...")
+
+    def handle(ktx2_file, result):
+        rel_path = os.path.relpath(ktx2_file, root_dir).replace(os.sep, '/')
         if result['success']:
-            success_count += 1
-            print(f"  ✓ 成功生成: {result['output_file']}")
+            manifest[rel_path] = result['hash']
             # 如果有警告信息，也显示出来
-            if result['stderr']:
-                print(f"  ⚠ 警告: {result['stderr'][:100]}...")
+            if result.get('stderr'):
+                print(f"  ⚠ 警告 {rel_path}: {result['stderr'][:100]}...")
+            count('skipped' if result['skipped'] else 'converted')
         else:
-            failed_files.append(ktx2_file)
+            manifest.pop(rel_path, None)
             error_msg = result.get('error') or result.get('stderr', 'Unknown error')
-            print(f"  ✗ 失败: {error_msg}")
-
-        print()
+            failures.append({'file': rel_path, 'error': error_msg.strip()})
+            print(f"  ✗ 失败: {rel_path}: {error_msg.strip()[:200]}")
+            count('failed')
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        pending = {}
+        for ktx2_file in iter_ktx2_files(root_dir):
+            stats['total'] += 1
+            if not args.force and is_up_to_date(ktx2_file):
+                count('skipped')
+                continue
+
+            rel_path = os.path.relpath(ktx2_file, root_dir).replace(os.sep, '/')
+            recorded = None if args.force else manifest.get(rel_path)
+            pending[pool.submit(extract_ktx2_to_png, ktx2_file, recorded)] = ktx2_file
+
+            # 排队任务达到上限时等待部分完成，遍历与转换同时进行
+            if len(pending) >= max_pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    handle(pending.pop(future), future.result())
+
+        for future in list(pending):
+            handle(pending.pop(future), future.result())
+
+    save_json(manifest_path, manifest)
+    elapsed = time.time() - start_time
+
+    report = {
+        'root_dir': os.path.abspath(root_dir),
+        'elapsed': round(elapsed, 2),
+        'total': stats['total'],
+        'converted': stats['converted'],
+        'skipped': stats['skipped'],
+        'failed': stats['failed'],
+        'failures': failures
+    }
+    save_json(report_path, report)
 
     # 输出统计结果
     print("=" * 60)
-    print(f"处理完成!")
-    print(f"总计: {total_files} 个文件")
-    print(f"成功: {success_count} 个")
-    print(f"失败: {len(failed_files)} 个")
+    print(f"处理完成! 耗时 {elapsed:.1f}s")
+    print(f"总计: {stats['total']} 个文件")
+    print(f"转换: {stats['converted']} 个")
+    print(f"跳过: {stats['skipped']} 个 (已是最新)")
+    print(f"失败: {stats['failed']} 个")
+    print(f"失败报告: {report_path}")
+    return 1 if failures else 0
 
-    if failed_files:
-        print("\n失败的文件列表:")
-        for f in failed_files:
-            print(f"  - {f}")
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
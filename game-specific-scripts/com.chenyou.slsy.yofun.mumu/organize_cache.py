@@ -2,124 +2,243 @@
 # -*- coding: utf-8 -*-
 """
 缓存文件组织脚本
-根据cacheList.json中的URL映射，将缓存文件复制到organized目录下的相对路径中
+根据cacheList.json中的URL映射，将缓存文件链接（或复制）到organized目录下的相对路径中
+
+cacheList.json 按条目流式解析，不一次性载入内存；文件操作在线程池中并行执行，
+优先使用reflink/硬链接，不支持时回退为复制；目标已是最新的条目直接跳过，重复运行几乎不耗时
+URL 中要去掉的CDN根目录取自 config.ORGANIZE_RULES 中该包的 strip_prefixes
+脚本依赖项目根目录下的模块，需留在本仓库中运行，用 --cache-list 指定导出的 gamecaches 目录中的 cacheList.json
 """
 
+import argparse
 import json
 import os
-import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-from urllib.parse import urlparse, unquote
 
-def extract_relative_path(url):
+# 项目根目录（本脚本位于 game-specific-scripts/{包名}/ 下）
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from config import ORGANIZE_STRIP_PREFIXES  # noqa: E402
+from file_links import LINK_MODES, place_file  # noqa: E402
+from organize_rules import rule_for, url_to_relative_path  # noqa: E402
+from tar_stream import safe_relpath  # noqa: E402
+
+# 流式解析时每次读取的字符数
+READ_SIZE = 1024 * 1024
+
+# 每个工作线程最多排队的任务数
+QUEUE_PER_WORKER = 64
+
+# 只保留前若干条错误详情，其余只计数
+MAX_ERRORS = 100
+
+# 每处理多少个条目打印一次进度
+PROGRESS_INTERVAL = 10000
+
+
+class JsonStream:
+    """在文本流上按需读取并逐个解析JSON值"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """丢弃已解析部分并读入更多数据"""
+        chunk = self.f.read(READ_SIZE)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+
+    def peek(self):
+        """跳过空白并返回下一个字符，已到结尾时返回空串"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, ch):
+        """消费一个指定字符"""
+        if self.peek() != ch:
+            raise ValueError(f"JSON格式错误: 期望 '{ch}'，实际为 '{self.peek()}'")
+        self.pos += 1
+
+    def value(self):
+        """解析下一个完整的JSON值，数据不足时继续读入"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # 数字可能恰好被块边界截断，到达缓冲区末尾时需读入更多再确认
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def items(self):
+        """逐个产出对象的键值对（调用前对象的 '{' 尚未消费），值由调用方通过 value()/items() 读取"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            ch = self.peek()
+            self.pos += 1
+            if ch == '}':
+                return
+            if ch != ',':
+                raise ValueError(f"JSON格式错误: 期望 ',' 或 '}}'，实际为 '{ch}'")
+
+
+def iter_cache_entries(cache_list_path):
+    """
+    流式读取cacheList.json中 files 下的条目
+    :return: 生成器，产出 (URL, 条目信息)
     """
-    从URL中提取相对路径
+    with open(cache_list_path, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f)
+        for key in stream.items():
+            if key != 'files':
+                stream.value()
+                continue
+            for url in stream.items():
+                yield url, stream.value()
+
+
+def is_up_to_date(source_stat, target_file):
+    """目标与源文件为同一文件，或大小和修改时间一致时视为最新"""
+    try:
+        target_stat = os.stat(target_file)
+    except OSError:
+        return False
+    if (target_stat.st_ino, target_stat.st_dev) == (source_stat.st_ino, source_stat.st_dev) \
+            and source_stat.st_ino:
+        return True
+    return target_stat.st_size == source_stat.st_size and \
+        int(target_stat.st_mtime) == int(source_stat.st_mtime)
 
-    示例:
-    输入: https://cdn.lth5.zeda6.com/zhengba3_res/anim/player/player_9999_0_0.plist?version=xxx
-    输出: anim/player/player_9999_0_0.plist
+
+def organize_entry(url, file_info, source_dir, output_dir, link_mode, strip_prefixes):
+    """
+    处理单个条目（在工作线程中执行）
+    :return: (str, str) 结果类型 success/skipped/missing/failed 和说明
     """
-    # 解析URL
-    parsed = urlparse(url)
+    local_filename = file_info.get('url') if isinstance(file_info, dict) else None
+    if not local_filename:
+        return 'failed', f"URL无本地文件映射: {url}"
+
+    # 提取相对路径（不允许指向输出目录之外）
+    try:
+        relative_path = safe_relpath(url_to_relative_path(url, strip_prefixes))
+    except Exception as e:
+        return 'failed', f"URL解析失败 {url}: {e}"
+    if relative_path is None:
+        return 'failed', f"URL路径非法: {url}"
 
-    # 获取路径部分（移除查询参数）
-    path = unquote(parsed.path)
+    # 源文件路径（相对于cacheList.json所在目录）
+    source_file = source_dir / local_filename
+    try:
+        source_stat = os.stat(source_file)
+    except OSError:
+        return 'missing', f"源文件不存在: {local_filename}"
 
-    # 移除基础路径 "/zhengba3_res/"
-    if path.startswith('/zhengba3_res/'):
-        path = path[len('/zhengba3_res/'):]
-    elif path.startswith('zhengba3_res/'):
-        path = path[len('zhengba3_res/'):]
+    # 目标文件路径
+    target_file = output_dir / relative_path
+    if is_up_to_date(source_stat, target_file):
+        return 'skipped', ''
 
-    return path
+    try:
+        return 'success', place_file(str(source_file), str(target_file), link_mode) or 'hardlink'
+    except Exception as e:
+        return 'failed', f"生成文件失败 {local_filename} -> {target_file}: {e}"
 
-def organize_cache_files(cache_list_path, output_dir):
+
+def organize_cache_files(cache_list_path, output_dir, workers=None, link_mode='auto',
+                         strip_prefixes=ORGANIZE_STRIP_PREFIXES):
     """
     组织缓存文件
 
     Args:
         cache_list_path: cacheList.json文件路径
         output_dir: 输出目录（organized）
+        workers: 线程数，默认为CPU核心数的4倍（文件操作以IO为主）
+        link_mode: auto(reflink→硬链接→复制)/reflink/hardlink/copy
+        strip_prefixes: 需要从资源URL中去掉的CDN根目录
     """
     # 统计信息
     stats = {
         'total': 0,
         'success': 0,
+        'skipped': 0,
         'failed': 0,
         'missing': 0,
-        'errors': []
+        'methods': {},
+        'errors': [],
+        'error_count': 0
     }
 
-    # 读取cacheList.json
-    try:
-        with open(cache_list_path, 'r', encoding='utf-8') as f:
-            cache_data = json.load(f)
-    except Exception as e:
-        print(f"错误: 无法读取 {cache_list_path}: {e}")
-        return stats
-
-    files_mapping = cache_data.get('files', {})
-    stats['total'] = len(files_mapping)
+    cache_list_path = Path(cache_list_path)
+    source_dir = cache_list_path.parent
+    output_dir = Path(output_dir)
+    workers = workers or (os.cpu_count() or 1) * 4
 
-    print(f"开始处理 {stats['total']} 个文件...")
+    print(f"开始处理 (线程数: {workers}, 方式: {link_mode})...")
     print("-" * 60)
 
-    # 遍历所有文件映射
-    for url, file_info in files_mapping.items():
-        local_filename = file_info.get('url')
-
-        if not local_filename:
-            stats['failed'] += 1
-            stats['errors'].append(f"URL无本地文件映射: {url}")
-            continue
-
-        # 提取相对路径
-        try:
-            relative_path = extract_relative_path(url)
-        except Exception as e:
-            stats['failed'] += 1
-            stats['errors'].append(f"URL解析失败 {url}: {e}")
-            continue
-
-        # 源文件路径
-        source_file = Path(local_filename)
-
-        # 检查源文件是否存在
-        if not source_file.exists():
-            stats['missing'] += 1
-            stats['errors'].append(f"源文件不存在: {local_filename}")
-            continue
-
-        # 目标文件路径
-        target_file = Path(output_dir) / relative_path
-
-        # 创建目标目录
-        try:
-            target_file.parent.mkdir(parents=True, exist_ok=True)
-        except Exception as e:
-            stats['failed'] += 1
-            stats['errors'].append(f"创建目录失败 {target_file.parent}: {e}")
-            continue
-
-        # 复制文件
-        try:
-            shutil.copy2(source_file, target_file)
-            stats['success'] += 1
-            print(f"✓ {local_filename} -> {relative_path}")
-        except Exception as e:
-            stats['failed'] += 1
-            stats['errors'].append(f"复制文件失败 {local_filename} -> {target_file}: {e}")
-            print(f"✗ {local_filename} -> {relative_path} (失败)")
+    def handle(future):
+        kind, detail = future.result()
+        stats[kind] += 1
+        if kind == 'success':
+            stats['methods'][detail] = stats['methods'].get(detail, 0) + 1
+        elif kind in ('failed', 'missing'):
+            stats['error_count'] += 1
+            if len(stats['errors']) < MAX_ERRORS:
+                stats['errors'].append(detail)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for url, file_info in iter_cache_entries(cache_list_path):
+                stats['total'] += 1
+                pending.add(pool.submit(organize_entry, url, file_info, source_dir, output_dir, link_mode,
+                                         strip_prefixes))
+                if len(pending) >= workers * QUEUE_PER_WORKER:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        handle(future)
+                if stats['total'] % PROGRESS_INTERVAL == 0:
+                    print(f"  已读取 {stats['total']} 个条目...")
+            for future in pending:
+                handle(future)
+    except (OSError, ValueError) as e:
+        print(f"错误: 无法读取 {cache_list_path}: {e}")
 
     return stats
 
+
 def print_summary(stats):
     """打印统计摘要"""
     print("\n" + "=" * 60)
     print("处理完成!")
     print("=" * 60)
     print(f"总文件数:   {stats['total']}")
-    print(f"成功复制:   {stats['success']}")
+    print(f"新生成:     {stats['success']} "
+          f"({', '.join(f'{k} {v}' for k, v in sorted(stats['methods'].items())) or '-'})")
+    print(f"已是最新:   {stats['skipped']}")
     print(f"源文件缺失: {stats['missing']}")
     print(f"失败:       {stats['failed']}")
 
@@ -128,27 +247,39 @@ def print_summary(stats):
         print("-" * 60)
         for error in stats['errors'][:10]:  # 只显示前10个错误
             print(f"  - {error}")
-        if len(stats['errors']) > 10:
-            print(f"  ... 还有 {len(stats['errors']) - 10} 个错误")
+        if stats['error_count'] > 10:
+            print(f"  ... 还有 {stats['error_count'] - 10} 个错误")
+
 
 def main():
     """主函数"""
     script_dir = Path(__file__).parent
-    cache_list_path = script_dir / 'cacheList.json'
-    output_dir = script_dir / 'organized'
+    parser = argparse.ArgumentParser(description='按cacheList.json整理缓存文件')
+    parser.add_argument('--cache-list', required=True, help='导出的 gamecaches 目录中的 cacheList.json 路径')
+    parser.add_argument('--output', help='输出目录，默认为 cacheList.json 同目录下的 organized')
+    parser.add_argument('--workers', type=int, help='线程数')
+    parser.add_argument('--link', choices=LINK_MODES, default='auto',
+                        help='生成文件的方式，默认 auto（reflink→硬链接→复制）')
+    parser.add_argument('--package', default=script_dir.name,
+                        help='包名，用于读取 config.ORGANIZE_RULES 中的 strip_prefixes，默认为脚本所在目录名')
+    args = parser.parse_args()
+    args.output = args.output or str(Path(args.cache_list).parent / 'organized')
+    strip_prefixes = (rule_for(args.package) or {}).get('strip_prefixes', ORGANIZE_STRIP_PREFIXES)
 
     print("缓存文件组织脚本")
     print("=" * 60)
-    print(f"配置文件: {cache_list_path}")
-    print(f"输出目录: {output_dir}")
+    print(f"配置文件: {args.cache_list}")
+    print(f"输出目录: {args.output}")
+    print(f"去掉前缀: {', '.join(strip_prefixes) or '-'}")
     print("=" * 60)
     print()
 
     # 执行组织
-    stats = organize_cache_files(cache_list_path, output_dir)
+    stats = organize_cache_files(args.cache_list, args.output, args.workers, args.link, strip_prefixes)
 
     # 打印摘要
     print_summary(stats)
 
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,127 @@
+"""
+任务日志模块 - 记录提取进度，中断后用 --resume 从中断处继续
+每个包一个只追加的 JSONL 文件 export/.journal/{包名}.jsonl，文件落地、类别完成、包完成时各写一行，
+每隔 JOURNAL_SYNC_INTERVAL 秒及类别/包完成时 fsync。进程崩溃或主机断电最多丢失最后一个同步周期内的
+文件记录，这些文件续传时重新传输；写到一半的最后一行在读取时忽略
+
+记录格式:
+    {"type": "start", "time": int, "resume": bool}               一次提取开始
+    {"type": "file", "path": str, "size": int, "mtime": int}     文件已完整落地（路径相对于包导出目录）
+    {"type": "category", "category": str, "success": bool, "message": str}
+    {"type": "package", "success_count": int}                    提取正常结束
+"""
+
+import json
+import os
+import threading
+import time
+from config import EXPORT_DIR, JOURNAL_DIR_NAME, JOURNAL_SYNC_INTERVAL
+
+JOURNAL_SUFFIX = ".jsonl"
+
+
+class JobJournal:
+    """单个包的提取日志"""
+
+    def __init__(self, package_name, export_dir=EXPORT_DIR, sync_interval=JOURNAL_SYNC_INTERVAL):
+        """
+        初始化
+        :param package_name: 包名
+        :param export_dir: 导出根目录，日志保存在其下的 JOURNAL_DIR_NAME 目录
+        :param sync_interval: 两次 fsync 之间的最长间隔（秒）
+        """
+        self.path = os.path.join(export_dir, JOURNAL_DIR_NAME, package_name + JOURNAL_SUFFIX)
+        self.sync_interval = sync_interval
+        self._file = None
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        读取日志，重放出上次（可能被中断的）提取进度
+        :return: dict {"files": {路径: (大小, 修改时间)}, "categories": {类别: 结果}, "finished": bool}
+        """
+        state = {"files": {}, "categories": {}, "finished": False}
+        try:
+            f = open(self.path, 'r', encoding='utf-8')
+        except OSError:
+            return state
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 崩溃时写到一半的行
+                    continue
+                kind = record.get("type")
+                if kind == "file":
+                    state["files"][record["path"]] = (record["size"], record["mtime"])
+                elif kind == "category":
+                    state["categories"][record["category"]] = {"success": record["success"],
+                                                               "message": record["message"]}
+                elif kind == "package":
+                    state["finished"] = True
+                elif kind == "start":
+                    # 之后又开始过一次（续传）提取，以最后一次是否正常结束为准
+                    state["finished"] = False
+        return state
+
+    def open(self, resume=False):
+        """
+        开始记录一次提取
+        :param resume: 是否续传；为False时清空旧日志重新开始
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+            self._write({"type": "start", "time": int(time.time()), "resume": resume}, sync=True)
+
+    def record_file(self, rel_path, local_file):
+        """
+        记录一个完整落地的文件（大小和修改时间取自本地文件）
+        :param rel_path: 相对于包导出目录的路径
+        :param local_file: 本地文件路径
+        """
+        stat = os.stat(local_file)
+        with self._lock:
+            self._write({"type": "file", "path": rel_path, "size": stat.st_size, "mtime": int(stat.st_mtime)})
+
+    def record_category(self, category, result):
+        """
+        记录类别提取结果
+        :param category: 类别名
+        :param result: {"success": bool, "message": str}
+        """
+        with self._lock:
+            self._write({"type": "category", "category": category, "success": result.get("success", False),
+                         "message": result.get("message", "")}, sync=True)
+
+    def record_package(self, success_count):
+        """
+        记录包提取正常结束
+        :param success_count: 成功的类别数
+        """
+        with self._lock:
+            self._write({"type": "package", "success_count": success_count}, sync=True)
+
+    def close(self):
+        """同步并关闭日志文件"""
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def _write(self, record, sync=False):
+        """写入一行，距上次同步超过间隔或 sync 为True时落盘（调用方持有锁）"""
+        if self._file is None:
+            return
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if sync or time.time() - self._last_sync >= self.sync_interval:
+            self._sync()
+
+    def _sync(self):
+        """把缓冲区写入磁盘（调用方持有锁）"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.time()
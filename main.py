@@ -3,9 +3,24 @@ Android应用资源提取器 - 主程序
 通过ADB从Android设备提取应用资源文件
 """
 
+import argparse
+import json
+import os
+import re
 import sys
+import time
 from adb_manager import ADBManager
+from device_pool import DevicePool
 from extractor import ResourceExtractor
+from config import (ADB_BACKEND, INCREMENTAL, MAX_CONCURRENT_TRANSFERS, DEVICE_ADDRESS, EXPORT_DIR,
+                    DEDUP_STORE, DEVICE_HASH_SKIP, TRANSFER_COMPRESSION, APK_GLOBS, FILTERS, PIPELINE_STAGES,
+                    ORGANIZE_RULES, EXPORT_FORMAT, WATCH_INTERVAL, CATALOG_ENABLED, JOURNAL_ENABLED,
+                    PROGRESS_DISPLAY)
+from archive_sink import ArchiveReader, ARCHIVE_SUFFIX
+from dedup_store import ObjectStore
+from filters import parse_cli_rules, merge_filters
+from progress import ConsoleProgress
+from tracing import tracer
 
 
 def print_banner():
@@ -37,12 +52,272 @@ def print_results(results):
         print(f"{name:12s} {status:8s} | {result['message']}")
 
 
+def parse_args():
+    """
+    解析命令行参数
+    :return: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(description="Android应用资源提取器")
+    parser.add_argument("packages", nargs="*", help="应用包名（可多个），省略时进入交互模式")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量提取，只拉取与上次清单相比新增或变更的文件")
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT_TRANSFERS,
+                        help=f"最大并发传输数，1表示逐个类别整目录拉取 (默认: {MAX_CONCURRENT_TRANSFERS})")
+    parser.add_argument("--compress", choices=["off", "on", "auto"], default=TRANSFER_COMPRESSION,
+                        help=f"传输压缩模式，auto 按实测链路吞吐量决定 (默认: {TRANSFER_COMPRESSION})")
+    parser.add_argument("--dedup", action="store_true",
+                        help="将导出文件存入按内容寻址的去重仓库，包目录改为链接")
+    parser.add_argument("--device-hash", action="store_true",
+                        help="传输前在设备端计算哈希，去重仓库中已有的内容不再传输（隐含 --dedup）")
+    parser.add_argument("--apk-glob", action="append", metavar="PATTERN",
+                        help="只从APK中提取匹配的条目（可多次指定），如 'assets/**/*.ktx2'")
+    parser.add_argument("--include", action="append", metavar="GLOB",
+                        help="只提取匹配的文件（可多次指定），可加类别前缀如 data:files/*")
+    parser.add_argument("--exclude", action="append", metavar="GLOB",
+                        help="排除匹配的文件（可多次指定），以 / 结尾表示整个目录，如 data:cache/")
+    parser.add_argument("--max-size", metavar="SIZE", help="跳过超过该大小的文件，如 50M")
+    parser.add_argument("--max-age", type=float, metavar="DAYS", help="只提取最近N天内修改过的文件")
+    parser.add_argument("--pipeline", metavar="STAGES",
+                        help="逗号分隔的后处理阶段，文件落地后即并行处理，如 organize,ktx2 或 模块名:类名")
+    parser.add_argument("--watch", type=float, nargs="?", const=WATCH_INTERVAL, metavar="SECONDS",
+                        help=f"提取完成后进入监视模式，按间隔拉取新下载的文件直到 Ctrl+C (默认间隔: {WATCH_INTERVAL}s)")
+    parser.add_argument("--no-organize", action="store_true",
+                        help="不按 ORGANIZE_RULES 边传输边整理，缓存文件按设备上的原路径保存")
+    parser.add_argument("--export-format", choices=["files", "zip"], default=EXPORT_FORMAT,
+                        help="files: 逐个文件导出; zip: 每个类别打包为一个不压缩的ZIP (默认: %(default)s)")
+    parser.add_argument("--unpack", metavar="ARCHIVE",
+                        help="解包 --export-format zip 导出的ZIP后退出，可用 --unpack-glob 只解包部分文件")
+    parser.add_argument("--unpack-glob", action="append", metavar="PATTERN",
+                        help="只解包匹配的文件（可多次指定），如 '**/*.ktx2'")
+    parser.add_argument("--unpack-to", metavar="DIR", help="解包目标目录 (默认: ZIP同名目录)")
+    parser.add_argument("--catalog", action="store_true",
+                        help="把导出的文件记录到SQLite索引，用 python catalog.py 查询")
+    parser.add_argument("--dedup-gc", action="store_true",
+                        help="清理去重仓库中不再被任何包引用的对象后退出")
+    parser.add_argument("--backend", choices=["exe", "socket"], default=ADB_BACKEND,
+                        help="exe: 每次操作启动adb进程; socket: 直接连接adb server (TCP 5037)")
+    parser.add_argument("--resume", action="store_true",
+                        help="按任务日志续传上次中断的提取：跳过已完成的包和类别，已落地的文件不再传输"
+                             "（上次运行需启用 --journal）")
+    parser.add_argument("--journal", action="store_true",
+                        help="记录任务日志（已落地的文件、已完成的类别和包），中断后可用 --resume 续传")
+    parser.add_argument("--no-progress", action="store_true",
+                        help="不显示实时传输进度（文件数、字节数、速率、剩余时间）")
+    parser.add_argument("--timing", action="store_true",
+                        help="结束时打印每类adb调用及提取阶段的耗时统计")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="将每次adb调用和提取阶段写入 Chrome Trace JSON 文件（隐含 --timing）")
+    parser.add_argument("--devices",
+                        help="多设备模式：逗号分隔的设备地址，如 127.0.0.1:7555,127.0.0.1:16384")
+    parser.add_argument("--discover", action="store_true",
+                        help="多设备模式：自动发现在线设备及本机模拟器实例")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="批量模式：从文件读取包名列表（每行一个，# 开头为注释）")
+    parser.add_argument("--match", metavar="REGEX",
+                        help="批量模式：提取 pm list packages 中匹配正则的所有包")
+    parser.add_argument("--summary", metavar="FILE",
+                        help="批量/多设备模式结束时写入JSON汇总的路径")
+    return parser.parse_args()
+
+
+def create_extractor(adb, args):
+    """
+    按命令行参数创建资源提取器
+    :param adb: ADBManager实例
+    :param args: 命令行参数
+    :return: ResourceExtractor
+    """
+    return ResourceExtractor(
+        adb,
+        incremental=args.incremental or INCREMENTAL,
+        max_concurrent=args.max_concurrent,
+        dedup=args.dedup or DEDUP_STORE,
+        device_hash=args.device_hash or DEVICE_HASH_SKIP,
+        compression=args.compress,
+        apk_globs=args.apk_glob or APK_GLOBS,
+        filters=merge_filters(FILTERS, parse_cli_rules(args.include, args.exclude, args.max_size, args.max_age)),
+        pipeline_stages=[s.strip() for s in args.pipeline.split(",") if s.strip()] if args.pipeline
+        else PIPELINE_STAGES,
+        organize_rules={} if args.no_organize else ORGANIZE_RULES,
+        export_format=args.export_format,
+        catalog=args.catalog or CATALOG_ENABLED,
+        journal=args.journal or JOURNAL_ENABLED,
+        resume=args.resume
+    )
+
+
+def create_progress_display(args):
+    """
+    按命令行参数创建实时进度显示
+    :param args: 命令行参数
+    :return: ConsoleProgress或None
+    """
+    if args.no_progress or not PROGRESS_DISPLAY:
+        return None
+    return ConsoleProgress()
+
+
+def read_package_list(path):
+    """
+    读取包名列表文件
+    :param path: 文件路径，每行一个包名，# 开头为注释
+    :return: list 包名列表
+    """
+    packages = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                packages.append(line)
+    return packages
+
+
+def build_summary(packages, results):
+    """
+    生成机器可读的批量提取汇总
+    :param packages: 包名列表（决定输出顺序）
+    :param results: DevicePool.run_jobs 的返回值
+    :return: dict 汇总
+    """
+    entries = []
+    for package_name in packages:
+        success, detail = results.get(package_name, (False, {"error": "未执行"}))
+        entry = {
+            "package": package_name,
+            "success": success,
+            "device": detail.get("device"),
+            "elapsed": detail.get("elapsed"),
+            "export_dir": detail.get("export_dir")
+        }
+        if "error" in detail:
+            entry["error"] = detail["error"]
+        else:
+            entry["categories"] = {
+                key: detail[key] for key in ("app", "data", "sdcard_data", "obb") if key in detail
+            }
+        entries.append(entry)
+
+    succeeded = sum(1 for entry in entries if entry["success"])
+    return {
+        "total": len(entries),
+        "succeeded": succeeded,
+        "failed": len(entries) - succeeded,
+        "packages": entries
+    }
+
+
+def run_device_pool(args):
+    """
+    多设备/批量模式：将包提取任务分发到一个或多个设备并行执行
+    :param args: 命令行参数
+    """
+    packages = list(args.packages)
+    if args.batch:
+        packages += read_package_list(args.batch)
+
+    serials = [s.strip() for s in (args.devices or "").split(",") if s.strip()]
+    if not serials and not args.discover:
+        serials = [DEVICE_ADDRESS]
+    pool = DevicePool(serials, args.backend)
+    if args.discover:
+        pool.discover()
+
+    print(f"\n正在连接 {len(pool.serials)} 个设备...")
+    for serial, success, message in pool.connect_all():
+        print(f"  {'✓' if success else '✗'} {serial}: {message}")
+
+    if not pool.managers:
+        print("\n错误: 没有可用的设备")
+        sys.exit(1)
+
+    # 所有设备的传输合并显示在同一行进度中
+    display = create_progress_display(args)
+    for adb in pool.managers:
+        adb.progress = display
+
+    if args.match:
+        # 一次 pm list packages 查询即可得到所有匹配的包
+        success, app_paths = pool.managers[0].list_packages()
+        if not success:
+            print(f"\n错误: {app_paths}")
+            sys.exit(1)
+        pattern = re.compile(args.match)
+        packages += sorted(p for p in app_paths if pattern.search(p))
+
+    # 去重并保持顺序
+    packages = list(dict.fromkeys(packages))
+    if not packages:
+        print("\n错误: 没有需要提取的包")
+        pool.disconnect_all()
+        sys.exit(1)
+
+    print(f"\n使用 {len(pool.managers)} 个设备提取 {len(packages)} 个包\n")
+    results = pool.run_jobs(packages, lambda adb: create_extractor(adb, args))
+
+    for package_name in packages:
+        success, detail = results.get(package_name, (False, {"error": "未执行"}))
+        print(f"\n[{package_name}] 设备: {detail.get('device', '-')}")
+        if "error" in detail:
+            print(f"错误: {detail['error']}")
+        else:
+            print_results(detail)
+
+    pool.disconnect_all()
+
+    summary = build_summary(packages, results)
+    print(f"\n批量提取完成: {summary['succeeded']}/{summary['total']} 个包成功")
+
+    summary_path = args.summary
+    if not summary_path and (args.batch or args.match):
+        summary_path = os.path.join(EXPORT_DIR, f"batch_summary_{int(time.time())}.json")
+    if summary_path:
+        os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"汇总已写入: {summary_path}")
+
+
+def report_timing(args):
+    """
+    输出耗时统计及trace文件
+    :param args: 命令行参数
+    """
+    if args.timing or args.trace:
+        tracer.print_summary()
+    if args.trace:
+        tracer.write_chrome_trace(args.trace)
+        print(f"\nTrace已写入: {args.trace} (可在 chrome://tracing 或 Perfetto 中打开)")
+
+
 def main():
     """主程序入口"""
+    args = parse_args()
     print_banner()
+    if args.trace:
+        tracer.reset(keep_events=True)
+
+    if args.dedup_gc:
+        stats = ObjectStore().gc()
+        print(f"\n去重仓库清理完成: 删除 {stats['removed']} 个对象, "
+              f"释放 {stats['freed_bytes']} 字节, 保留 {stats['kept']} 个")
+        return
+
+    if args.unpack:
+        dest_dir = args.unpack_to or (args.unpack[:-len(ARCHIVE_SUFFIX)] if args.unpack.endswith(ARCHIVE_SUFFIX)
+                                      else args.unpack + "_unpacked")
+        with ArchiveReader(args.unpack) as reader:
+            stats = reader.unpack(dest_dir, args.unpack_glob)
+        print(f"\n解包完成: {stats['files']} 个文件, {stats['bytes']} 字节 -> {dest_dir} "
+              f"(跳过 {stats['skipped']} 个)")
+        return
+
+    if args.devices or args.discover or args.batch or args.match:
+        run_device_pool(args)
+        report_timing(args)
+        return
 
     # 初始化ADB管理器
-    adb = ADBManager()
+    adb = ADBManager(backend=args.backend, progress=create_progress_display(args))
 
     # 连接设备
     print("\n正在连接ADB设备...")
@@ -64,12 +339,20 @@ def main():
     print("设备连接成功！\n")
 
     # 创建资源提取器
-    extractor = ResourceExtractor(adb)
+    extractor = create_extractor(adb, args)
+
+    if args.watch is not None:
+        if len(args.packages) != 1:
+            print("错误: 监视模式需要在命令行指定且只指定一个包名")
+            extractor.close()
+            adb.disconnect()
+            sys.exit(1)
+        # 检查点先于提取创建，提取期间下载的文件也会被监视捕获
+        extractor.mark_watch_start(args.packages[0])
 
     # 检查是否有命令行参数
-    if len(sys.argv) > 1:
+    for package_name in args.packages:
         # 命令行模式：直接提取指定包名
-        package_name = sys.argv[1]
         print(f"命令行模式: 提取包 {package_name}\n")
 
         try:
@@ -83,7 +366,13 @@ def main():
         except Exception as e:
             print(f"\n错误: {str(e)}")
 
+    if args.watch is not None:
+        extractor.watch_package(args.packages[0], args.watch, fresh=False)
+
+    if args.packages:
+        extractor.close()
         adb.disconnect()
+        report_timing(args)
         return
 
     # 交互模式：循环输入
@@ -93,7 +382,9 @@ def main():
 
         if package_name.lower() == 'q':
             print("\n感谢使用，再见！")
+            extractor.close()
             adb.disconnect()
+            report_timing(args)
             break
 
         if not package_name:
@@ -0,0 +1,94 @@
+"""
+文件清单模块 - 增量提取使用的本地清单
+清单保存在 export/{包名}/manifest.json，按提取类别记录远端文件的大小和修改时间
+"""
+
+import json
+import os
+import time
+from temp_names import temp_name
+
+MANIFEST_NAME = "manifest.json"
+
+
+def load_manifest(pkg_export_dir):
+    """
+    读取包导出目录下的清单，不存在或损坏时返回空清单
+    :param pkg_export_dir: 包导出目录
+    :return: dict 清单
+    """
+    manifest_path = os.path.join(pkg_export_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if isinstance(manifest.get("categories"), dict):
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": 1, "categories": {}}
+
+
+def save_manifest(pkg_export_dir, manifest):
+    """
+    保存清单（先写临时文件再替换，避免中途中断损坏旧清单）
+    :param pkg_export_dir: 包导出目录
+    :param manifest: 清单
+    """
+    manifest_path = os.path.join(pkg_export_dir, MANIFEST_NAME)
+    temp_path = temp_name(manifest_path, "tmp")
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(temp_path, manifest_path)
+
+
+def diff_files(old_files, new_files, local_dir, remap=None):
+    """
+    对比新旧远端清单，找出需要传输的文件和已删除的文件
+    本地文件缺失或大小不一致时同样视为需要传输
+    :param old_files: 上次的 {相对路径: [大小, 修改时间]}
+    :param new_files: 本次的 {相对路径: (大小, 修改时间)}
+    :param local_dir: 本地类别目录
+    :param remap: 路径映射函数，返回文件整理后的本地路径；返回None时为 local_dir 下的同名路径
+    :return: (list, list) 需要传输的相对路径（按大小降序）和已删除的相对路径
+    """
+    changed = []
+    for rel_path, (size, mtime) in new_files.items():
+        old = old_files.get(rel_path)
+        if old is None or old[0] != size or old[1] != mtime:
+            changed.append(rel_path)
+            continue
+
+        local_file = (remap and remap(rel_path)) or os.path.join(local_dir, rel_path)
+        try:
+            if os.path.getsize(local_file) != size:
+                changed.append(rel_path)
+        except OSError:
+            changed.append(rel_path)
+
+    deleted = [rel_path for rel_path in old_files if rel_path not in new_files]
+    changed.sort(key=lambda p: new_files[p][0], reverse=True)
+    return changed, deleted
+
+
+def update_category(manifest, category, remote_path, new_files, deleted):
+    """
+    用本次的远端清单更新类别记录，并登记删除的文件
+    :param manifest: 清单
+    :param category: 提取类别
+    :param remote_path: 远端目录
+    :param new_files: 本次的 {相对路径: (大小, 修改时间)}
+    :param deleted: 本次检测到已删除的相对路径列表
+    """
+    entry = manifest["categories"].setdefault(category, {})
+    history = entry.get("deleted", {})
+    now = int(time.time())
+    for rel_path in deleted:
+        history[rel_path] = now
+    # 重新出现的文件不再算作已删除
+    for rel_path in new_files:
+        history.pop(rel_path, None)
+
+    entry["remote_path"] = remote_path
+    entry["updated"] = now
+    entry["files"] = {p: list(v) for p, v in new_files.items()}
+    entry["deleted"] = history
@@ -0,0 +1,120 @@
+"""
+缓存整理规则模块 - 按游戏配置的 资源URL -> 相对路径 映射
+提取前先从设备读取游戏的缓存映射文件（如 cacheList.json），映射中的缓存文件在传输时
+直接写到整理后的相对路径，一次传输、一次写入，本地不再保留扁平的缓存文件副本
+"""
+
+import json
+import os
+from urllib.parse import urlparse, unquote
+from adb_manager import quote_path
+from config import ORGANIZE_RULES, ORGANIZE_STRIP_PREFIXES
+from tar_stream import safe_relpath
+
+# 整理结果在包导出目录下的子目录
+ORGANIZED_DIR = "organized"
+
+
+def url_to_relative_path(url, strip_prefixes=ORGANIZE_STRIP_PREFIXES):
+    """
+    从资源URL中提取相对路径（去掉查询参数和CDN上的根目录）
+    例: https://cdn.example.com/zhengba3_res/anim/a.plist?version=1 -> anim/a.plist
+    :param url: 资源URL
+    :param strip_prefixes: 需要去掉的路径前缀
+    :return: str 相对路径
+    """
+    path = unquote(urlparse(url).path)
+    for prefix in strip_prefixes:
+        for candidate in (prefix, prefix.lstrip('/')):
+            if candidate and path.startswith(candidate):
+                return path[len(candidate):]
+    return path.lstrip('/')
+
+
+def parse_mapping(data, strip_prefixes=ORGANIZE_STRIP_PREFIXES):
+    """
+    解析缓存映射
+    :param data: 映射文件内容，格式 {"files": {资源URL: {"url": 缓存文件名}}}
+    :param strip_prefixes: 需要从资源URL中去掉的路径前缀
+    :return: dict {缓存文件名: 整理后的相对路径}，非法路径被忽略
+    """
+    mapping = {}
+    for url, info in data.get("files", {}).items():
+        local_name = info.get("url") if isinstance(info, dict) else None
+        rel_path = safe_relpath(url_to_relative_path(url, strip_prefixes)) if local_name else None
+        if rel_path is not None:
+            mapping[local_name] = rel_path
+    return mapping
+
+
+def rule_for(package_name, rules=ORGANIZE_RULES):
+    """
+    取出包的整理规则
+    :param package_name: 包名
+    :param rules: {包名: 规则}
+    :return: dict 规则，未配置时返回None
+    """
+    return (rules or {}).get(package_name)
+
+
+class CacheOrganizer:
+    """一个类别的边传输边整理：把类别内的缓存文件路径换算为整理后的本地路径"""
+
+    def __init__(self, rule, pkg_export_dir):
+        """
+        初始化
+        :param rule: 整理规则 {"category", "mapping", "strip_prefixes"}
+        :param pkg_export_dir: 包导出目录，整理结果写到其下的 organized/
+        """
+        self.rule = rule
+        self.output_dir = os.path.join(pkg_export_dir, ORGANIZED_DIR)
+        # 映射文件所在目录（相对于类别目录）
+        self.cache_dir = os.path.dirname(rule["mapping"].strip('/'))
+        # {类别内相对路径: 整理后的相对路径}
+        self.mapping = {}
+
+    def load(self, adb_manager, remote_path):
+        """
+        从设备读取映射文件
+        :param adb_manager: ADBManager实例
+        :param remote_path: 设备上的类别目录
+        :return: (bool, str) 成功标志和消息
+        """
+        remote_file = f"{remote_path.rstrip('/')}/{self.rule['mapping'].strip('/')}"
+        success, data = adb_manager.exec_out(f"cat {quote_path(remote_file)} 2>/dev/null")
+        if not success:
+            return False, data
+        try:
+            mapping = parse_mapping(json.loads(data.decode('utf-8')),
+                                    self.rule.get("strip_prefixes", ORGANIZE_STRIP_PREFIXES))
+        except (ValueError, AttributeError) as e:
+            return False, f"映射文件无法解析: {remote_file}: {str(e)}"
+
+        prefix = f"{self.cache_dir}/" if self.cache_dir else ""
+        self.mapping = {f"{prefix}{name}": rel_path for name, rel_path in mapping.items()}
+        return True, f"读取映射 {len(self.mapping)} 条: {remote_file}"
+
+    def target(self, rel_path):
+        """
+        :param rel_path: 类别内的相对路径（以 / 分隔）
+        :return: str 整理后的本地路径，不在映射中时返回None
+        """
+        organized = self.mapping.get(rel_path)
+        return os.path.join(self.output_dir, organized) if organized else None
+
+    def relocate(self, local_path):
+        """
+        整体拉取的目录无法在传输中改名，拉取后把映射中的文件移动（而非复制）到整理后的路径
+        :param local_path: 本地类别目录
+        :return: list 移动后的本地路径
+        """
+        moved = []
+        for rel_path in self.mapping:
+            source = os.path.join(local_path, *rel_path.split('/'))
+            if not os.path.isfile(source):
+                continue
+            target = self.target(rel_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(source, target)
+            moved.append(target)
+        return moved
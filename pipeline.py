@@ -0,0 +1,275 @@
+"""
+后处理流水线模块 - 文件一落地就交给后处理阶段，与仍在进行的传输并行
+每个阶段有独立的工作线程和有界队列：下游处理不过来时队列写满，上游（传输）随之放慢，内存占用有上限。
+阶段输出的新文件同样作为事件发布，供订阅该阶段的下游阶段处理（如 整理 -> ktx2转换）
+
+事件为dict: {"source": 来源阶段名("extract" 表示提取), "package": 包名,
+            "category": 类别, "path": 本地绝对路径, "rel_path": 相对于包导出目录的路径}
+"""
+
+import importlib
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from file_links import place_file
+from organize_rules import ORGANIZED_DIR, parse_mapping, rule_for
+from temp_names import temp_name
+from config import PIPELINE_QUEUE_SIZE, ORGANIZE_MAPPING_NAME, ORGANIZE_STRIP_PREFIXES, KTX_TOOL
+
+# 通知工作线程退出的哨兵
+_STOP = object()
+
+
+class Stage:
+    """
+    后处理阶段基类
+    子类实现 process()，需要时覆盖 accepts()/start()/finish()；
+    process() 与 finish() 可返回新事件列表（source 默认为阶段名）
+    """
+
+    name = "stage"
+    # 订阅的事件来源
+    subscribes = ("extract",)
+    # 工作线程数
+    workers = 1
+
+    def start(self, context):
+        """
+        每个包开始提取前调用
+        :param context: {"package": 包名, "export_dir": 包导出目录}
+        """
+        self.context = context
+
+    def accepts(self, event):
+        """是否处理该事件（在发布线程中调用，应当很快）"""
+        return True
+
+    def process(self, event):
+        """
+        处理一个事件
+        :param event: 事件
+        :return: list 新产生的事件
+        """
+        return []
+
+    def finish(self):
+        """
+        所有事件处理完后调用
+        :return: list 新产生的事件
+        """
+        return []
+
+
+class Pipeline:
+    """后处理流水线类"""
+
+    def __init__(self, stages, queue_size=PIPELINE_QUEUE_SIZE):
+        """
+        初始化流水线
+        :param stages: Stage实例列表，按上游到下游的顺序排列
+        :param queue_size: 每个阶段的队列长度上限
+        """
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self._queues = {}
+        self._threads = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def start(self, context):
+        """
+        启动各阶段的工作线程
+        :param context: {"package": 包名, "export_dir": 包导出目录}
+        """
+        for stage in self.stages:
+            stage.start(context)
+            self._queues[stage.name] = queue.Queue(maxsize=self.queue_size)
+            self._stats[stage.name] = {"processed": 0, "emitted": 0, "busy": 0.0, "errors": []}
+            self._threads[stage.name] = [
+                threading.Thread(target=self._worker, args=(stage,), daemon=True)
+                for _ in range(max(1, stage.workers))
+            ]
+            for thread in self._threads[stage.name]:
+                thread.start()
+
+    def emit(self, event):
+        """
+        发布事件到所有订阅该来源的阶段，队列已满时阻塞（背压）
+        :param event: 事件
+        """
+        for stage in self.stages:
+            if event["source"] in stage.subscribes and stage.name in self._queues and stage.accepts(event):
+                self._queues[stage.name].put(event)
+
+    def close(self):
+        """
+        按上游到下游的顺序结束各阶段：上游的 finish() 产生的事件会先进入下游队列
+        :return: dict {阶段名: {"processed", "emitted", "busy", "errors"}}
+        """
+        for stage in self.stages:
+            stage_queue = self._queues.pop(stage.name, None)
+            if stage_queue is None:
+                continue
+            for _ in self._threads[stage.name]:
+                stage_queue.put(_STOP)
+            for thread in self._threads.pop(stage.name):
+                thread.join()
+            try:
+                self._publish(stage, stage.finish())
+            except Exception as e:
+                self._stats[stage.name]["errors"].append(f"finish: {str(e)}")
+        return self._stats
+
+    def _worker(self, stage):
+        """阶段工作线程：逐个处理队列中的事件"""
+        stage_queue = self._queues[stage.name]
+        stats = self._stats[stage.name]
+        while True:
+            event = stage_queue.get()
+            if event is _STOP:
+                return
+            start_time = time.perf_counter()
+            try:
+                outputs = stage.process(event)
+            except Exception as e:
+                outputs = []
+                with self._lock:
+                    stats["errors"].append(f"{event.get('rel_path')}: {str(e)}")
+            with self._lock:
+                stats["processed"] += 1
+                stats["busy"] += time.perf_counter() - start_time
+            self._publish(stage, outputs)
+
+    def _publish(self, stage, events):
+        """发布阶段产生的新事件"""
+        for event in events or []:
+            event.setdefault("source", stage.name)
+            with self._lock:
+                self._stats[stage.name]["emitted"] += 1
+            self.emit(event)
+
+
+class OrganizeStage(Stage):
+    """
+    按缓存映射文件（如 cacheList.json）把游戏缓存文件整理为原始的资源目录结构
+    映射文件到达时整理其目录下已落地的缓存文件，之后到达的缓存文件逐个整理；
+    包配置了整理规则（config.ORGANIZE_RULES）时缓存文件在传输时已整理好，直接转发给下游
+    """
+
+    name = "organize"
+
+    def start(self, context):
+        super().start(context)
+        self.output_dir = os.path.join(context["export_dir"], ORGANIZED_DIR)
+        rule = rule_for(context["package"]) or {}
+        self.mapping_name = os.path.basename(rule["mapping"]) if rule.get("mapping") else ORGANIZE_MAPPING_NAME
+        self.strip_prefixes = rule.get("strip_prefixes", ORGANIZE_STRIP_PREFIXES)
+        # {缓存目录: {缓存文件名: 整理后的相对路径}}
+        self._mappings = {}
+        # {缓存目录: 已整理的缓存文件名}，映射到达时已整理的文件随后到达的事件不再重复整理
+        self._organized = {}
+        self._lock = threading.Lock()
+
+    def process(self, event):
+        if event["category"] == ORGANIZED_DIR:
+            return [dict(event, source=self.name)]
+
+        directory, filename = os.path.split(event["path"])
+        if filename == self.mapping_name:
+            mapping = self._load_mapping(event["path"])
+            with self._lock:
+                self._mappings[directory] = mapping
+                organized = self._organized.setdefault(directory, set())
+                names = [name for name in mapping
+                         if name not in organized and os.path.isfile(os.path.join(directory, name))]
+                organized.update(names)
+        else:
+            with self._lock:
+                mapping = self._mappings.get(directory)
+                # 映射文件尚未到达时先跳过，映射到达后会统一整理已落地的文件
+                if not mapping or filename not in mapping or filename in self._organized[directory]:
+                    return []
+                self._organized[directory].add(filename)
+            names = [filename]
+
+        outputs = []
+        for name in names:
+            target = os.path.join(self.output_dir, mapping[name])
+            place_file(os.path.join(directory, name), target, "hardlink")
+            outputs.append(dict(event, source=self.name, category="organized", path=target,
+                                rel_path=os.path.relpath(target, self.context["export_dir"]).replace(os.sep, '/')))
+        return outputs
+
+    def _load_mapping(self, path):
+        """
+        读取缓存映射文件
+        :param path: 映射文件路径，格式 {"files": {资源URL: {"url": 缓存文件名}}}
+        :return: dict {缓存文件名: 相对路径}
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            return parse_mapping(json.load(f), self.strip_prefixes)
+
+
+class KtxConvertStage(Stage):
+    """将 .ktx2 纹理转换为 png（调用 ktx extract），已是最新的输出直接跳过"""
+
+    name = "ktx2"
+    # 有整理阶段时只转换整理后的文件，避免同一纹理转换两次
+    subscribes = ("organize",)
+    workers = os.cpu_count() or 2
+
+    def accepts(self, event):
+        return event["path"].endswith(".ktx2")
+
+    def process(self, event):
+        source = event["path"]
+        target = source[:-5] + ".png"
+        if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+            return []
+
+        # 先写临时文件，成功后再替换：中断或失败时留下的半个 png 会因比源文件新而被当作最新
+        temp_target = temp_name(target[:-4], "tmp.png", unique=True)
+        try:
+            result = subprocess.run([KTX_TOOL, "extract", source, temp_target], capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip() or f"ktx 返回码 {result.returncode}")
+            os.replace(temp_target, target)
+        finally:
+            if os.path.exists(temp_target):
+                os.remove(temp_target)
+        return [dict(event, source=self.name, path=target, rel_path=event["rel_path"][:-5] + ".png")]
+
+
+# 内置阶段名 -> 阶段类
+BUILTIN_STAGES = {
+    "organize": OrganizeStage,
+    "ktx2": KtxConvertStage
+}
+
+
+def build_stages(names):
+    """
+    根据名称创建阶段实例
+    内置阶段直接用名称；自定义插件写作 "模块名:类名"（类继承 Stage）
+    只启用 ktx2 而没有 organize 时，ktx2 改为直接订阅提取事件
+    :param names: 阶段名列表
+    :return: list Stage实例
+    """
+    stages = []
+    for name in names:
+        if name in BUILTIN_STAGES:
+            stages.append(BUILTIN_STAGES[name]())
+            continue
+        module_name, sep, class_name = name.partition(":")
+        if not sep:
+            raise ValueError(f"未知的后处理阶段: {name}")
+        stages.append(getattr(importlib.import_module(module_name), class_name)())
+
+    stage_names = {stage.name for stage in stages}
+    for stage in stages:
+        if isinstance(stage, KtxConvertStage) and "organize" not in stage_names:
+            stage.subscribes = ("extract",)
+    return stages
@@ -0,0 +1,305 @@
+"""
+传输进度模块 - 以结构化事件报告传输进度
+每个传输（一次 adb pull、一个tar流、一个分块传输的文件）对应一个 TransferProgress，
+按固定间隔把 已完成文件数/字节数/当前速率/剩余时间 发给回调；只保存计数和固定长度的速率采样，
+内存占用与传输的文件数无关
+
+事件格式:
+    {"id": int 传输编号（进程内唯一）, "label": str, "files": int, "bytes": int, "total_files": int|None, "total_bytes": int|None,
+     "rate": float 字节/秒, "eta": float|None 秒, "current": str|None 当前文件, "elapsed": float,
+     "done": bool, "success": bool|None}
+"""
+
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from config import PROGRESS_INTERVAL, PROGRESS_RATE_WINDOW, PROGRESS_LOG_INTERVAL
+
+# 传输编号：同一设备路径可能同时有多个传输（分片、多设备），不能用标签区分
+_transfer_ids = itertools.count(1)
+
+# 本地目录采样一次耗时的倍数，采样间隔不小于它，避免大目录反复遍历占满磁盘
+SAMPLE_COST_FACTOR = 10
+
+
+def format_bytes(size):
+    """
+    :param size: 字节数
+    :return: str 如 12.3 MB
+    """
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_duration(seconds):
+    """
+    :param seconds: 秒数
+    :return: str 如 01:23 或 1:02:03
+    """
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60:02d}:{rest % 60:02d}"
+
+
+def display_width(text):
+    """
+    :param text: 字符串
+    :return: int 终端中占用的列数（中文等全角字符占两列）
+    """
+    return sum(2 if ord(ch) >= 0x2E80 else 1 for ch in text)
+
+
+class TransferProgress:
+    """单个传输的进度计数，可被多个线程同时更新"""
+
+    def __init__(self, label, callback, total_files=None, total_bytes=None, interval=PROGRESS_INTERVAL):
+        """
+        初始化
+        :param label: 传输名称（如设备路径）
+        :param callback: 进度事件回调，参数为事件dict
+        :param total_files: 总文件数，未知时为None
+        :param total_bytes: 总字节数，未知时为None
+        :param interval: 两次事件之间的最短间隔（秒），完成事件不受限制
+        """
+        self.id = next(_transfer_ids)
+        self.label = label
+        self.callback = callback
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.files = 0
+        self.bytes = 0
+        self.current = None
+        self._start = time.time()
+        self._last_emit = 0.0
+        # (时间, 字节数) 采样，速率按窗口首尾计算
+        self._samples = deque([(self._start, 0)], maxlen=PROGRESS_RATE_WINDOW)
+        self._lock = threading.Lock()
+        self._done = False
+
+    def advance(self, files=0, nbytes=0, current=None):
+        """
+        累加完成的文件数和字节数
+        :param files: 新完成的文件数
+        :param nbytes: 新传输的字节数
+        :param current: 当前文件
+        """
+        with self._lock:
+            self.files += files
+            self.bytes += nbytes
+            if current is not None:
+                self.current = current
+            event = self._poll()
+        if event is not None:
+            self.callback(event)
+
+    def update(self, files=None, nbytes=None, current=None):
+        """
+        设置当前的累计值（由外部采样得到进度时使用）
+        :param files: 已完成文件数
+        :param nbytes: 已传输字节数
+        :param current: 当前文件
+        """
+        with self._lock:
+            if files is not None:
+                self.files = files
+            if nbytes is not None:
+                self.bytes = nbytes
+            if current is not None:
+                self.current = current
+            event = self._poll()
+        if event is not None:
+            self.callback(event)
+
+    def finish(self, success=True, files=None, nbytes=None):
+        """
+        结束传输并发出完成事件，重复调用只生效一次
+        :param success: 传输是否成功
+        :param files: 最终文件数（如adb输出的汇总），None时沿用累计值
+        :param nbytes: 最终字节数，None时沿用累计值
+        """
+        with self._lock:
+            if self._done:
+                return
+            self._done = True
+            if files is not None:
+                self.files = files
+            if nbytes is not None:
+                self.bytes = nbytes
+            self._samples.append((time.time(), self.bytes))
+            event = self._event(success)
+        self.callback(event)
+
+    def _poll(self):
+        """距上次事件超过间隔时生成新事件（调用时持有锁）"""
+        now = time.time()
+        if self._done or now - self._last_emit < self.interval:
+            return None
+        self._last_emit = now
+        self._samples.append((now, self.bytes))
+        return self._event(None)
+
+    def _event(self, success):
+        """
+        生成进度事件（调用时持有锁）
+        :param success: 完成时的成功标志，进行中为None
+        :return: dict
+        """
+        (first_time, first_bytes), (last_time, last_bytes) = self._samples[0], self._samples[-1]
+        rate = (last_bytes - first_bytes) / (last_time - first_time) if last_time > first_time else 0.0
+        eta = None
+        elapsed = time.time() - self._start
+        if success is None and self.total_bytes and rate > 0:
+            eta = max(0.0, (self.total_bytes - self.bytes) / rate)
+        elif success is None and self.total_files and self.files:
+            # 只知道总文件数时按已完成文件的平均耗时估计
+            eta = max(0.0, (self.total_files - self.files) * elapsed / self.files)
+        return {
+            "id": self.id,
+            "label": self.label,
+            "files": self.files,
+            "bytes": self.bytes,
+            "total_files": self.total_files,
+            "total_bytes": self.total_bytes,
+            "rate": rate,
+            "eta": eta,
+            "current": self.current,
+            "elapsed": elapsed,
+            "done": success is not None,
+            "success": success
+        }
+
+
+class LocalTreeSampler:
+    """
+    后台统计本地目录中已写入的文件数和字节数，作为进度报告给 TransferProgress
+    用于自身不输出进度的传输：adb pull 的输出不是终端时不打印逐文件进度，只在结束时输出汇总
+    """
+
+    def __init__(self, progress, local_path, interval=PROGRESS_INTERVAL):
+        """
+        :param progress: TransferProgress实例
+        :param local_path: 传输写入的本地文件或目录
+        :param interval: 采样间隔（秒）
+        """
+        self.progress = progress
+        self.local_path = local_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        """周期性遍历目录，遍历较慢时相应拉长间隔；目录中原有的文件不计入进度"""
+        base_files, base_bytes = self._measure()
+        while not self._stop.wait(self.interval):
+            start_time = time.time()
+            files, nbytes = self._measure()
+            self.progress.update(max(0, files - base_files), max(0, nbytes - base_bytes))
+            self.interval = max(self.interval, (time.time() - start_time) * SAMPLE_COST_FACTOR)
+
+    def _measure(self):
+        """
+        :return: (int, int) 文件数和字节数
+        """
+        if os.path.isfile(self.local_path):
+            return 1, os.path.getsize(self.local_path)
+        files, nbytes = 0, 0
+        pending = [self.local_path]
+        while pending:
+            try:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                pending.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                files += 1
+                                nbytes += entry.stat(follow_symlinks=False).st_size
+                        except OSError:
+                            # 文件在遍历期间被替换（如 .part 改名）
+                            continue
+            except OSError:
+                continue
+        return files, nbytes
+
+
+class ConsoleProgress:
+    """
+    命令行实时进度显示，可作为 ADBManager.progress 回调
+    同时进行的多个传输（并发类别、分片、多设备）合并为一行；输出不是终端时每隔一段时间打印一行
+    """
+
+    def __init__(self, stream=None, log_interval=PROGRESS_LOG_INTERVAL):
+        """
+        :param stream: 输出流，默认 sys.stdout
+        :param log_interval: 非终端输出时两行进度之间的间隔（秒）
+        """
+        self.stream = stream or sys.stdout
+        self.log_interval = log_interval
+        self.interactive = hasattr(self.stream, "isatty") and self.stream.isatty()
+        # 进行中的传输 {传输编号: 最近一次事件}，传输完成即移除
+        self._active = {}
+        # 已完成传输的累计值
+        self._finished = {"transfers": 0, "files": 0, "bytes": 0}
+        self._lock = threading.Lock()
+        self._line_width = 0
+        self._last_log = 0.0
+
+    def __call__(self, event):
+        with self._lock:
+            if event["done"]:
+                self._active.pop(event["id"], None)
+                self._finished["transfers"] += 1
+                self._finished["files"] += event["files"]
+                self._finished["bytes"] += event["bytes"]
+            else:
+                self._active[event["id"]] = event
+            self._render(event)
+
+    def _render(self, event):
+        """输出合并后的进度行（调用时持有锁）"""
+        active = list(self._active.values())
+        if not active:
+            # 没有进行中的传输时清除进度行，不与其他输出混在一起
+            if self.interactive and self._line_width:
+                self.stream.write("\r" + " " * self._line_width + "\r")
+                self.stream.flush()
+                self._line_width = 0
+            return
+
+        now = time.time()
+        if not self.interactive and now - self._last_log < self.log_interval:
+            return
+        self._last_log = now
+
+        files = self._finished["files"] + sum(e["files"] for e in active)
+        nbytes = self._finished["bytes"] + sum(e["bytes"] for e in active)
+        rate = sum(e["rate"] for e in active)
+        line = f"传输中 [{len(active)}] {files} 个文件, {format_bytes(nbytes)}, {format_bytes(rate)}/s"
+        etas = [e["eta"] for e in active if e["eta"] is not None]
+        if etas and len(etas) == len(active):
+            line += f", 剩余 {format_duration(max(etas))}"
+        current = event.get("current") or event["label"]
+        if current:
+            line += f"  {current[-40:]}"
+
+        if self.interactive:
+            width = display_width(line)
+            self.stream.write("\r" + line + " " * max(0, self._line_width - width))
+            self._line_width = max(self._line_width, width)
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
@@ -0,0 +1,103 @@
+"""
+传输调度模块 - 类别级并发与分片并发拉取
+大目录按文件拆分为若干分片，每个分片使用独立的adb连接拉取，按从大到小的顺序调度
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from config import MAX_CONCURRENT_TRANSFERS, SHARD_TARGET_BYTES, SHARD_MAX_FILES
+
+
+def make_shards(file_sizes, target_bytes=SHARD_TARGET_BYTES, max_files=SHARD_MAX_FILES):
+    """
+    将文件拆分为分片，大文件单独成片，小文件按字节数和文件数打包
+    :param file_sizes: {相对路径: 大小}
+    :param target_bytes: 每个分片的目标字节数
+    :param max_files: 每个分片的最大文件数
+    :return: list 分片列表，每个分片为 (总字节数, [相对路径...])，按总字节数降序
+    """
+    shards = []
+    current, current_bytes = [], 0
+
+    for rel_path, size in sorted(file_sizes.items(), key=lambda item: item[1], reverse=True):
+        if size >= target_bytes:
+            shards.append((size, [rel_path]))
+            continue
+        if current and (current_bytes + size > target_bytes or len(current) >= max_files):
+            shards.append((current_bytes, current))
+            current, current_bytes = [], 0
+        current.append(rel_path)
+        current_bytes += size
+
+    if current:
+        shards.append((current_bytes, current))
+
+    shards.sort(key=lambda shard: shard[0], reverse=True)
+    return shards
+
+
+class TransferScheduler:
+    """传输调度器类"""
+
+    def __init__(self, adb_manager, max_workers=MAX_CONCURRENT_TRANSFERS):
+        """
+        初始化调度器
+        :param adb_manager: ADBManager实例
+        :param max_workers: 同时进行的分片传输数上限（所有类别共享）
+        """
+        self.adb = adb_manager
+        self.max_workers = max(1, max_workers)
+        self._shard_pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def run_categories(self, tasks):
+        """
+        并发执行各类别的提取任务
+        :param tasks: [(类别名, 无参函数)]，函数返回 {"success": bool, "message": str}
+        :return: dict {类别名: 提取结果}
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+            futures = [(name, pool.submit(func)) for name, func in tasks]
+            for name, future in futures:
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = {"success": False, "message": f"提取异常: {str(e)}"}
+        return results
+
+    def pull_sharded(self, remote_path, file_sizes, local_path, compress=False, on_file=None, remap=None,
+                     sink=None):
+        """
+        分片并发拉取目录下的指定文件
+        :param remote_path: 设备上的目录路径
+        :param file_sizes: {相对路径: 大小}
+        :param local_path: 本地保存路径
+        :param compress: 是否在设备端gzip压缩后传输
+        :param on_file: 每个文件落地后的回调，参数为本地文件路径
+        :param remap: 路径映射函数，见 tar_stream.extract_tar_stream
+        :param sink: 打包导出时的 ArchiveSink，见 tar_stream.extract_tar_stream
+        :return: (bool, str, list) 是否全部成功、消息、未能落地的相对路径
+        """
+        shards = make_shards(file_sizes)
+        if not shards:
+            return True, f"无需拉取: {remote_path}", []
+
+        futures = [
+            (paths, self._shard_pool.submit(self.adb.pull_files, remote_path, paths, local_path, compress,
+                                            on_file, remap, sink))
+            for _, paths in shards
+        ]
+
+        failed_paths, errors = [], []
+        for paths, future in futures:
+            try:
+                success, message, failed = future.result()
+            except Exception as e:
+                success, message, failed = False, f"分片拉取异常: {str(e)}", paths
+            if not success:
+                failed_paths.extend(failed)
+                errors.append(message)
+
+        total_bytes = sum(file_sizes.values())
+        if errors:
+            return False, f"{len(errors)}/{len(shards)} 个分片拉取失败: {errors[0]}", failed_paths
+        return True, f"拉取成功: {remote_path} ({len(file_sizes)} 个文件, {total_bytes} 字节, {len(shards)} 个分片)", []
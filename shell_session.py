@@ -0,0 +1,165 @@
+"""
+常驻Shell会话模块 - 复用单个 adb shell + su 进程执行多条命令
+每条命令后输出带随机标记的结束行，用于切分各命令的输出和退出码
+"""
+
+import queue
+import subprocess
+import threading
+import uuid
+
+
+class ShellSessionError(Exception):
+    """会话不可用（进程退出、管道断开或等待超时）"""
+
+    def __init__(self, message, command_sent=False):
+        """
+        :param message: 错误信息
+        :param command_sent: 命令是否已写入会话（可能已经执行），为True时不能再次执行
+        """
+        super().__init__(message)
+        self.command_sent = command_sent
+
+
+class ShellSession:
+    """常驻Shell会话类"""
+
+    def __init__(self, build_command, timeout=600):
+        """
+        初始化会话（不会立即启动进程）
+        :param build_command: 构建adb命令行的函数，参数为adb子命令列表
+        :param timeout: 单条命令等待输出的超时秒数
+        """
+        self._build_command = build_command
+        self.timeout = timeout
+        self.is_root = False
+        self._proc = None
+        self._lines = None
+        self._lock = threading.Lock()
+
+    def run(self, cmd):
+        """
+        在会话中执行一条命令
+        命令写入前会话已断开时自动重连并重试一次；命令已写入后超时或断开则直接抛出，
+        不重复执行（cp/mv/rm 等命令重复执行有副作用，耗时的 find/哈希也不应再跑一遍）
+        :param cmd: shell命令字符串
+        :return: (int, str) 退出码和命令输出（stdout与stderr合并）
+        """
+        with self._lock:
+            self._ensure_started()
+            try:
+                return self._execute(cmd)
+            except ShellSessionError as e:
+                # 会话已失效（超时的会话中命令可能仍在运行），下次使用时重建
+                self._stop()
+                if e.command_sent:
+                    raise
+                self._ensure_started()
+                return self._execute(cmd)
+
+    def start(self):
+        """
+        启动会话（已启动则直接返回）
+        :return: bool 会话是否已获得root权限
+        """
+        with self._lock:
+            self._ensure_started()
+            return self.is_root
+
+    def close(self):
+        """关闭会话进程"""
+        with self._lock:
+            self._stop()
+
+    def _ensure_started(self):
+        """确保会话进程存活，必要时启动并尝试su提权"""
+        if self._proc is not None and self._proc.poll() is None:
+            return
+
+        self._stop()
+        try:
+            self._proc = subprocess.Popen(
+                self._build_command(["shell"]),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT
+            )
+        except OSError as e:
+            raise ShellSessionError(f"无法启动shell会话: {e}")
+
+        self._lines = queue.Queue()
+        reader = threading.Thread(
+            target=self._read_lines,
+            args=(self._proc.stdout, self._lines),
+            daemon=True
+        )
+        reader.start()
+
+        # 提权后续命令都在root身份下执行；su不可用时保持普通shell
+        try:
+            self._write("su\n")
+            _, output = self._execute("id -u")
+        except ShellSessionError as e:
+            self._stop()
+            raise ShellSessionError(f"无法建立shell会话: {e}")
+        self.is_root = output.strip().splitlines()[-1:] == ["0"]
+
+    def _execute(self, cmd):
+        """
+        发送命令并读取到结束标记为止
+        :param cmd: shell命令字符串
+        :return: (int, str) 退出码和命令输出
+        """
+        marker = f"__ADB_END_{uuid.uuid4().hex}__"
+        # 花括号分组使重定向作用于整条命令；printf前置换行保证标记独占一行
+        script = f"{{ {cmd}\n}} < /dev/null 2>&1\nprintf '\\n{marker} %d\\n' $?\n"
+        self._write(script)
+
+        lines = []
+        while True:
+            try:
+                line = self._lines.get(timeout=self.timeout)
+            except queue.Empty:
+                raise ShellSessionError(f"命令超时: {cmd}", command_sent=True)
+            if line is None:
+                raise ShellSessionError("shell会话已断开", command_sent=True)
+
+            if line.startswith(marker):
+                exit_code = int(line[len(marker):].strip() or -1)
+                break
+            lines.append(line)
+
+        # 去掉printf补充的那个换行
+        output = "".join(lines)
+        if output.endswith("\n"):
+            output = output[:-1]
+        return exit_code, output
+
+    def _write(self, text):
+        """向会话stdin写入文本"""
+        try:
+            self._proc.stdin.write(text.encode('utf-8'))
+            self._proc.stdin.flush()
+        except (OSError, ValueError) as e:
+            raise ShellSessionError(f"写入shell会话失败: {e}")
+
+    def _stop(self):
+        """终止会话进程并清理状态"""
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+            except OSError:
+                pass
+            if self._proc.poll() is None:
+                self._proc.kill()
+            self._proc.wait()
+        self._proc = None
+        self._lines = None
+        self.is_root = False
+
+    @staticmethod
+    def _read_lines(stream, lines):
+        """后台线程：逐行读取会话输出，进程结束时放入None"""
+        for raw in iter(stream.readline, b""):
+            lines.put(raw.decode('utf-8', errors='ignore').replace('\r', ''))
+        lines.put(None)
@@ -0,0 +1,121 @@
+"""
+tar流解包模块 - 主机端边接收边解包
+用于 adb exec-out 输出的tar流，不需要先落地完整的tar文件
+"""
+
+import os
+import shutil
+import tarfile
+from temp_names import temp_name
+
+# 单次读写的缓冲区大小
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def safe_relpath(name):
+    """
+    规范化tar成员路径，拒绝绝对路径和越级路径
+    :param name: tar成员名
+    :return: str 相对路径，非法时返回None
+    """
+    name = name.replace('\\', '/')
+    parts = [p for p in name.split('/') if p not in ('', '.')]
+    if not parts or any(p == '..' for p in parts):
+        return None
+    return os.path.join(*parts)
+
+
+def _copy_with_progress(source, dest, progress):
+    """
+    复制文件内容，每写完一块即报告字节数（单个大文件也能看到进度）
+    :param source: 源文件对象
+    :param dest: 目标文件对象
+    :param progress: TransferProgress实例
+    """
+    while True:
+        chunk = source.read(COPY_BUFFER_SIZE)
+        if not chunk:
+            break
+        dest.write(chunk)
+        progress.advance(nbytes=len(chunk))
+
+
+def extract_tar_stream(fileobj, local_dir, compressed=False, on_file=None, remap=None, sink=None, progress=None,
+                       expected=None):
+    """
+    从流中逐个解出tar成员到本地目录
+    只处理普通文件和目录，符号链接和设备文件会被跳过
+    :param fileobj: 可读的二进制流（如子进程stdout）
+    :param local_dir: 本地保存目录
+    :param compressed: 流是否经过gzip压缩
+    :param on_file: 每个文件写入完成后的回调，参数为本地文件路径
+    :param remap: 路径映射函数，参数为成员相对路径（以 / 分隔），返回本地目标路径；返回None时按原路径保存
+    :param sink: 打包导出时的 ArchiveSink，文件写入ZIP而不在本地落地
+    :param progress: TransferProgress实例，每个文件（大文件每块）写入后报告进度
+    :param expected: 应当到达的文件相对路径（以 / 分隔）；设备端tar跳过的文件（无法读取、列出后被删除）
+                     只体现为tar的返回码，给出时按路径核对，未到达的记入 missing
+    :return: dict 统计信息 files/dirs/bytes/skipped/errors/failed（写入失败的成员相对路径，以 / 分隔）/
+             missing（expected 中未到达的路径）
+    """
+    stats = {"files": 0, "dirs": 0, "bytes": 0, "skipped": 0, "errors": [], "failed": [], "missing": []}
+    # 规范化路径 -> 调用方给出的原始路径
+    pending = {}
+    for path in expected or ():
+        normalized = safe_relpath(path)
+        if normalized is not None:
+            pending[normalized] = path
+
+    with tarfile.open(fileobj=fileobj, mode="r|gz" if compressed else "r|") as tar:
+        for member in tar:
+            rel_path = safe_relpath(member.name)
+            if rel_path is None:
+                # 根目录 "./" 本身或非法路径
+                if not member.isdir():
+                    stats["skipped"] += 1
+                continue
+
+            target = os.path.join(local_dir, rel_path)
+            if remap is not None and member.isfile():
+                target = remap(rel_path.replace(os.sep, '/')) or target
+            try:
+                if member.isdir():
+                    if sink is None:
+                        os.makedirs(target, exist_ok=True)
+                    stats["dirs"] += 1
+                elif member.isfile() and sink is not None:
+                    sink.add(target, tar.extractfile(member), member.mtime)
+                    pending.pop(rel_path, None)
+                    stats["files"] += 1
+                    stats["bytes"] += member.size
+                    if progress is not None:
+                        progress.advance(1, member.size, member.name)
+                elif member.isfile():
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    source = tar.extractfile(member)
+                    # 先写临时文件再替换：不会改写与去重仓库共享的硬链接内容
+                    temp_target = temp_name(target)
+                    with open(temp_target, 'wb') as f:
+                        if progress is None:
+                            shutil.copyfileobj(source, f, COPY_BUFFER_SIZE)
+                        else:
+                            progress.advance(current=member.name)
+                            _copy_with_progress(source, f, progress)
+                    os.utime(temp_target, (member.mtime, member.mtime))
+                    os.replace(temp_target, target)
+                    pending.pop(rel_path, None)
+                    stats["files"] += 1
+                    stats["bytes"] += member.size
+                    if progress is not None:
+                        progress.advance(files=1)
+                    if on_file is not None:
+                        on_file(target)
+                else:
+                    stats["skipped"] += 1
+            except OSError as e:
+                # 例如文件名在Windows上非法，记录后继续处理后续成员
+                stats["errors"].append(f"{member.name}: {e}")
+                if member.isfile():
+                    stats["failed"].append(pending.pop(rel_path, rel_path.replace(os.sep, '/')))
+
+    stats["missing"] = sorted(pending.values())
+    return stats
@@ -0,0 +1,30 @@
+"""
+临时文件命名模块 - 传输和导出过程中先写临时文件再改名，临时文件名统一带保留标记
+遍历导出目录（补发落地事件、去重入库、打包）时只跳过带标记的文件，
+设备上本来就叫 *.part、*.tmp 的文件照常导出
+"""
+
+import uuid
+
+# 临时文件名中的保留标记，不会出现在正常的设备文件名中
+TEMP_MARKER = ".~adbx"
+
+
+def temp_name(path, suffix="part", unique=False):
+    """
+    生成最终文件对应的临时文件路径
+    :param path: 最终文件路径
+    :param suffix: 临时文件后缀，便于辨认用途（如 part、part.json、tmp）
+    :param unique: 是否加入随机串（多个线程可能同时写同一目标时）
+    :return: str 临时文件路径
+    """
+    tag = uuid.uuid4().hex[:12] if unique else ""
+    return f"{path}{TEMP_MARKER}{tag}.{suffix}"
+
+
+def is_temp_name(filename):
+    """
+    :param filename: 文件名或路径
+    :return: bool 是否为 temp_name 生成的临时文件
+    """
+    return TEMP_MARKER in filename
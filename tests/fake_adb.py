@@ -0,0 +1,100 @@
+"""
+测试用的模拟设备 - 以本地目录充当设备文件系统，不需要adb和真实设备
+只模拟按文件列表拉取（push 清单 + exec-out tar -T）、/sdcard 中转复制和 find/stat 列表所用到的命令
+"""
+
+import io
+import os
+import re
+import shutil
+import subprocess
+import tarfile
+from contextlib import contextmanager
+
+from adb_manager import ADBManager
+
+
+class FakeADBManager(ADBManager):
+    """以本地目录模拟设备的ADB管理器"""
+
+    def __init__(self, root, drop=(), socket=False, su_stream=True):
+        """
+        :param root: 充当设备根目录的本地目录
+        :param drop: 设备端tar跳过的文件（相对于拉取目录），模拟无法读取或列出后被删除的文件
+        :param socket: 模拟socket后端，exec-out 不回传返回码
+        :param su_stream: 为False时 su 下的 exec-out tar 流不可用（如 su 不转发二进制输出）
+        """
+        super().__init__(device_address="fake:5555", backend="exe")
+        self.root = root
+        self.drop = set(drop)
+        self.socket = socket
+        self.su_stream = su_stream
+        # 推送到设备的文件 {设备路径: 内容}
+        self.pushed = {}
+        # 执行过的 shell 和 exec-out 命令
+        self.commands = []
+
+    def device_path(self, remote_path):
+        """:return: str 设备路径对应的本地路径"""
+        return os.path.join(self.root, remote_path.lstrip('/'))
+
+    def _run_adb_command(self, args):
+        if args[0] == "push":
+            with open(args[1], 'r', encoding='utf-8') as f:
+                self.pushed[args[2]] = f.read()
+        return ""
+
+    def pull(self, remote_path, local_path):
+        self.commands.append(f"pull {remote_path}")
+        return False, "模拟设备不支持 adb pull"
+
+    def _listed(self, remote_list):
+        """:return: list 推送的文件清单中的路径"""
+        return [line for line in self.pushed[remote_list].splitlines() if line]
+
+    def _shell(self, cmd):
+        self.commands.append(cmd)
+        if cmd.startswith("find "):
+            # 在本地目录上执行同一条 find/stat 命令，输出中的路径还原为设备路径
+            local_cmd = re.sub(r'"(/[^"]*)"', lambda m: f'"{self.device_path(m.group(1))}"', cmd)
+            output = subprocess.run(local_cmd, shell=True, capture_output=True, text=True).stdout
+            return output.replace(self.root.rstrip('/'), '').strip()
+
+        match = re.match(r'mkdir -p (\S+) && cd "([^"]*)" && tar -cf - -T (\S+) \| tar -xf - -C \S+$', cmd)
+        if match:
+            staging, base = self.device_path(match.group(1)), self.device_path(match.group(2))
+            for name in self._listed(match.group(3)):
+                if name not in self.drop and os.path.isfile(os.path.join(base, name)):
+                    os.makedirs(os.path.dirname(os.path.join(staging, name)), exist_ok=True)
+                    shutil.copy2(os.path.join(base, name), os.path.join(staging, name))
+            return ""
+
+        match = re.match(r'rm -rf (/sdcard/\S+)$', cmd)
+        if match:
+            shutil.rmtree(self.device_path(match.group(1)), ignore_errors=True)
+        return ""
+
+    @contextmanager
+    def _exec_out_stream(self, cmd_str):
+        self.commands.append(cmd_str)
+        status = {"returncode": None, "stderr": ""}
+        if cmd_str.startswith("su -c") and not self.su_stream:
+            yield io.BytesIO(), status
+            status.update(returncode=1, stderr="tar: unknown option -T")
+            return
+
+        match = re.search(r'-C "([^"]*)" -T (\S+)', cmd_str)
+        base = self.device_path(match.group(1))
+        buffer = io.BytesIO()
+        returncode = 0
+        with tarfile.open(fileobj=buffer, mode='w') as tar:
+            for name in self._listed(match.group(2).rstrip("'")):
+                if name in self.drop or not os.path.isfile(os.path.join(base, name)):
+                    # toybox tar 跳过无法读取的文件，只体现在返回码上
+                    returncode = 1
+                    continue
+                tar.add(os.path.join(base, name), arcname=name)
+        buffer.seek(0)
+        yield buffer, status
+        if not self.socket:
+            status["returncode"] = returncode
@@ -0,0 +1,84 @@
+"""
+受保护类别回退测试 - su tar 流不可用时经/sdcard中转重试，只拉取文件列表中的文件
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from extractor import ResourceExtractor
+from manifest import load_manifest
+from tests.fake_adb import FakeADBManager
+
+REMOTE_PATH = "/data/data/com.test.game"
+FILES = ["files/a.bin", "files/b.bin", "cache/skip.bin", "files/debug.log"]
+FILTERS = {"data": {"exclude": ["cache/", "*.log"]}}
+
+
+class ProtectedFallbackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.device_dir = os.path.join(self.temp_dir, "device")
+        self.local_path = os.path.join(self.temp_dir, "export", "data")
+        self.remote_dir = os.path.join(self.device_dir, REMOTE_PATH.lstrip('/'))
+        for rel_path in FILES:
+            os.makedirs(os.path.dirname(os.path.join(self.remote_dir, rel_path)), exist_ok=True)
+            with open(os.path.join(self.remote_dir, rel_path), 'wb') as f:
+                f.write(rel_path.encode())
+        os.makedirs(os.path.join(self.device_dir, "sdcard"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def pull(self, adb, manifest):
+        extractor = ResourceExtractor(adb, incremental=True, max_concurrent=1, dedup=False, device_hash=False,
+                                      compression="off", chunked_threshold=0, apk_globs=[], filters=FILTERS,
+                                      pipeline_stages=[], organize_rules={}, catalog=False, journal=False)
+        extractor._manifest = manifest
+        return extractor._pull_incremental("data", REMOTE_PATH, self.local_path)
+
+    def local_files(self):
+        return sorted(os.path.relpath(os.path.join(dirpath, name), self.local_path).replace(os.sep, '/')
+                      for dirpath, _, names in os.walk(self.local_path) for name in names)
+
+    def test_fallback_respects_filters(self):
+        adb = FakeADBManager(self.device_dir, su_stream=False)
+        manifest = load_manifest(self.temp_dir)
+        success, message = self.pull(adb, manifest)
+
+        self.assertTrue(success, message)
+        self.assertEqual(self.local_files(), ["files/a.bin", "files/b.bin"])
+        self.assertEqual(sorted(manifest["categories"]["data"]["files"]), ["files/a.bin", "files/b.bin"])
+        # 没有整目录中转，中转目录已清理
+        self.assertFalse([cmd for cmd in adb.commands if cmd.startswith("pull ")])
+        self.assertEqual(os.listdir(os.path.join(self.device_dir, "sdcard")), [])
+
+    def test_fallback_only_retries_pending_files(self):
+        manifest = load_manifest(self.temp_dir)
+        self.pull(FakeADBManager(self.device_dir), manifest)
+        with open(os.path.join(self.remote_dir, "files", "b.bin"), 'wb') as f:
+            f.write(b"changed")
+
+        adb = FakeADBManager(self.device_dir, su_stream=False)
+        success, message = self.pull(adb, manifest)
+
+        self.assertTrue(success, message)
+        self.assertEqual(set(adb.pushed.values()), {"files/b.bin\n"})
+        with open(os.path.join(self.local_path, "files", "b.bin"), 'rb') as f:
+            self.assertEqual(f.read(), b"changed")
+
+    def test_files_failing_staging_stay_out_of_manifest(self):
+        adb = FakeADBManager(self.device_dir, drop={"files/b.bin"}, su_stream=False)
+        manifest = load_manifest(self.temp_dir)
+        success, message = self.pull(adb, manifest)
+
+        self.assertFalse(success, message)
+        self.assertEqual(self.local_files(), ["files/a.bin"])
+        self.assertEqual(sorted(manifest["categories"]["data"]["files"]), ["files/a.bin"])
+        self.assertIn(f"pull {REMOTE_PATH}/files/b.bin", adb.commands)
+
+
+if __name__ == '__main__':
+    unittest.main()
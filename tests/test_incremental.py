@@ -0,0 +1,86 @@
+"""
+增量拉取测试 - 未能落地的文件不写入清单，下次运行时重新拉取
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from extractor import ResourceExtractor
+from manifest import load_manifest
+from tests.fake_adb import FakeADBManager
+
+REMOTE_PATH = "/sdcard/Android/data/com.test.game"
+
+
+def make_extractor(adb):
+    """:return: ResourceExtractor 只启用增量提取的提取器"""
+    return ResourceExtractor(adb, incremental=True, max_concurrent=1, dedup=False, device_hash=False,
+                             compression="off", chunked_threshold=0, apk_globs=[], filters={},
+                             pipeline_stages=[], organize_rules={}, catalog=False, journal=False)
+
+
+class IncrementalManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.device_dir = os.path.join(self.temp_dir, "device")
+        self.local_path = os.path.join(self.temp_dir, "export", "sdcard_data")
+        remote_dir = os.path.join(self.device_dir, REMOTE_PATH.lstrip('/'))
+        for rel_path in ("a.bin", "b.bin", "sub/c.bin"):
+            os.makedirs(os.path.dirname(os.path.join(remote_dir, rel_path)), exist_ok=True)
+            with open(os.path.join(remote_dir, rel_path), 'wb') as f:
+                f.write(rel_path.encode() * 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def pull(self, adb, manifest):
+        extractor = make_extractor(adb)
+        extractor._manifest = manifest
+        return extractor._pull_incremental("sdcard_data", REMOTE_PATH, self.local_path)
+
+    def test_missing_member_not_in_manifest(self):
+        manifest = load_manifest(self.temp_dir)
+        success, message = self.pull(FakeADBManager(self.device_dir, drop={"b.bin"}), manifest)
+
+        self.assertFalse(success, message)
+        self.assertEqual(sorted(manifest["categories"]["sdcard_data"]["files"]), ["a.bin", "sub/c.bin"])
+        self.assertFalse(os.path.exists(os.path.join(self.local_path, "b.bin")))
+
+    def test_missing_member_pulled_next_run(self):
+        manifest = load_manifest(self.temp_dir)
+        self.pull(FakeADBManager(self.device_dir, drop={"b.bin"}), manifest)
+
+        adb = FakeADBManager(self.device_dir)
+        success, message = self.pull(adb, manifest)
+
+        self.assertTrue(success, message)
+        self.assertEqual(list(adb.pushed.values()), ["b.bin\n"])
+        self.assertEqual(sorted(manifest["categories"]["sdcard_data"]["files"]), ["a.bin", "b.bin", "sub/c.bin"])
+        self.assertTrue(os.path.isfile(os.path.join(self.local_path, "b.bin")))
+
+    def test_changed_file_failing_is_pulled_again(self):
+        manifest = load_manifest(self.temp_dir)
+        self.pull(FakeADBManager(self.device_dir), manifest)
+        changed = os.path.join(self.device_dir, REMOTE_PATH.lstrip('/'), "b.bin")
+        with open(changed, 'wb') as f:
+            f.write(b"changed")
+
+        success, message = self.pull(FakeADBManager(self.device_dir, drop={"b.bin"}), manifest)
+        self.assertFalse(success, message)
+        entry = manifest["categories"]["sdcard_data"]
+        self.assertNotIn("b.bin", entry["files"])
+        self.assertNotIn("b.bin", entry["deleted"])
+
+        adb = FakeADBManager(self.device_dir)
+        success, message = self.pull(adb, manifest)
+        self.assertTrue(success, message)
+        self.assertEqual(list(adb.pushed.values()), ["b.bin\n"])
+        with open(os.path.join(self.local_path, "b.bin"), 'rb') as f:
+            self.assertEqual(f.read(), b"changed")
+
+
+if __name__ == '__main__':
+    unittest.main()
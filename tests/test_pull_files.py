@@ -0,0 +1,54 @@
+"""
+按文件列表拉取测试 - 设备端tar跳过的文件必须出现在失败列表中
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests.fake_adb import FakeADBManager
+
+REMOTE_PATH = "/sdcard/Android/data/com.test.game"
+FILES = ["a.bin", "b.bin", "sub/c.bin"]
+
+
+class PullFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.device_dir = os.path.join(self.temp_dir, "device")
+        self.local_path = os.path.join(self.temp_dir, "local")
+        remote_dir = os.path.join(self.device_dir, REMOTE_PATH.lstrip('/'))
+        for rel_path in FILES:
+            os.makedirs(os.path.dirname(os.path.join(remote_dir, rel_path)), exist_ok=True)
+            with open(os.path.join(remote_dir, rel_path), 'wb') as f:
+                f.write(rel_path.encode())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_all_files_arrive(self):
+        success, message, failed = FakeADBManager(self.device_dir).pull_files(REMOTE_PATH, FILES, self.local_path)
+
+        self.assertTrue(success, message)
+        self.assertEqual(failed, [])
+
+    def test_skipped_member_reported_failed(self):
+        adb = FakeADBManager(self.device_dir, drop={"a.bin"})
+        success, message, failed = adb.pull_files(REMOTE_PATH, FILES, self.local_path)
+
+        self.assertFalse(success, message)
+        self.assertEqual(failed, ["a.bin"])
+        self.assertTrue(os.path.isfile(os.path.join(self.local_path, "sub", "c.bin")))
+
+    def test_unknown_returncode_reports_missing_files(self):
+        adb = FakeADBManager(self.device_dir, drop={"sub/c.bin"}, socket=True)
+        success, message, failed = adb.pull_files(REMOTE_PATH, FILES, self.local_path)
+
+        self.assertFalse(success, message)
+        self.assertEqual(failed, ["sub/c.bin"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+临时文件识别测试 - 只跳过传输自己的临时文件，设备上名为 *.part/*.tmp 的文件照常入库
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from dedup_store import ObjectStore
+from temp_names import temp_name, is_temp_name
+
+
+class TempNamesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.pkg_dir = os.path.join(self.temp_dir, "com.test.game")
+        os.makedirs(os.path.join(self.pkg_dir, "data"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write(self, name, data=b"data"):
+        path = os.path.join(self.pkg_dir, "data", name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_device_files_with_temp_suffixes_are_not_temp(self):
+        for name in ("save.part", "save.part.json", "cache.tmp"):
+            self.assertFalse(is_temp_name(name))
+        self.assertTrue(is_temp_name(temp_name("save")))
+        self.assertTrue(is_temp_name(temp_name("save", "part.json")))
+        self.assertNotEqual(temp_name("save", unique=True), temp_name("save", unique=True))
+
+    def test_ingest_skips_only_own_temp_files(self):
+        self.write("save.part", b"a")
+        self.write("cache.tmp", b"b")
+        self.write(os.path.basename(temp_name("half")), b"c")
+
+        store = ObjectStore(root=os.path.join(self.temp_dir, ".objects"))
+        stats = store.ingest_package(self.pkg_dir)
+
+        self.assertEqual(stats["files"], 2)
+        self.assertEqual(sorted(store.load_refs(self.pkg_dir)), ["data/cache.tmp", "data/save.part"])
+
+
+if __name__ == '__main__':
+    unittest.main()
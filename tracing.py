@@ -0,0 +1,122 @@
+"""
+性能追踪模块 - 记录每次adb调用与提取阶段的耗时
+始终按名称累计次数/耗时/字节数（内存占用固定）；启用事件记录后可导出 Chrome Trace JSON，
+在 chrome://tracing 或 Perfetto 中加载查看
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Tracer:
+    """追踪器类"""
+
+    def __init__(self):
+        self.keep_events = False
+        self._events = []
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def reset(self, keep_events=False):
+        """
+        清空已记录的数据
+        :param keep_events: 是否保留逐条事件（用于导出trace文件）
+        """
+        with self._lock:
+            self.keep_events = keep_events
+            self._events = []
+            self._totals = {}
+            self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, category, **args):
+        """
+        记录一段操作的耗时
+        用法: with tracer.span("adb pull", "adb", cmd=...) as info: ... info["bytes"] = n
+        :param name: 操作名称（汇总时按名称聚合）
+        :param category: 类别，如 adb/session/phase
+        :param args: 附加参数，写入trace事件
+        :return: dict 可在操作过程中补充 exit_code、bytes 等字段
+        """
+        info = dict(args)
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self._record(name, category, start, time.perf_counter() - start, info)
+
+    def summary(self):
+        """
+        按名称汇总的统计数据，按总耗时降序
+        :return: list [{"name", "category", "count", "total", "avg", "max", "bytes", "errors"}]
+        """
+        with self._lock:
+            rows = [dict(row, name=name) for name, row in self._totals.items()]
+        for row in rows:
+            row["avg"] = row["total"] / row["count"] if row["count"] else 0.0
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return rows
+
+    def print_summary(self):
+        """打印汇总表"""
+        rows = self.summary()
+        if not rows:
+            return
+        print("\n耗时统计:")
+        print("-" * 96)
+        print(f"{'名称':32s} {'类别':8s} {'次数':>6s} {'总耗时(s)':>10s} {'平均(ms)':>10s} "
+              f"{'最大(ms)':>10s} {'字节数':>12s} {'失败':>5s}")
+        for row in rows:
+            print(f"{row['name'][:32]:32s} {row['category']:8s} {row['count']:6d} {row['total']:10.3f} "
+                  f"{row['avg'] * 1000:10.1f} {row['max'] * 1000:10.1f} {row['bytes']:12d} {row['errors']:5d}")
+
+    def write_chrome_trace(self, path):
+        """
+        写入 Chrome Trace Event 格式的JSON文件
+        :param path: 输出路径
+        """
+        with self._lock:
+            events = list(self._events)
+        trace = {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"summary": self.summary()}
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f, ensure_ascii=False)
+
+    def _record(self, name, category, start, duration, info):
+        """累计统计并按需保存事件"""
+        exit_code = info.get("exit_code")
+        transferred = info.get("bytes") or 0
+        with self._lock:
+            row = self._totals.setdefault(name, {
+                "category": category, "count": 0, "total": 0.0, "max": 0.0, "bytes": 0, "errors": 0
+            })
+            row["count"] += 1
+            row["total"] += duration
+            row["max"] = max(row["max"], duration)
+            row["bytes"] += transferred
+            if exit_code not in (None, 0):
+                row["errors"] += 1
+
+            if self.keep_events:
+                self._events.append({
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": round((start - self._origin) * 1e6),
+                    "dur": round(duration * 1e6),
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": info
+                })
+
+
+# 全局追踪器，ADBManager 与 ResourceExtractor 共用
+tracer = Tracer()